@@ -0,0 +1,39 @@
+"""Time repeated calls to a function, and count their queries."""
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, percent):
+    """Get the value `percent`% of the way through the sorted `values`."""
+    values = sorted(values)
+    index = round((len(values) - 1) * percent / 100)
+    return values[index]
+
+
+def measure(name, func, repeat, **details):
+    """
+    Call `func` `repeat` times, and summarise how long each call took.
+
+    Returns a dict for the benchmark results, including latencies in
+    milliseconds and the mean number of queries per call. Extra keyword
+    arguments are included in the dict, to describe the benchmark.
+    """
+    durations = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        'name': name,
+        'repeat': repeat,
+        'queries': len(queries) / repeat,
+        'p50_ms': percentile(durations, 50),
+        'p99_ms': percentile(durations, 99),
+        'mean_ms': sum(durations) / repeat,
+    }
+    result.update(details)
+    return result
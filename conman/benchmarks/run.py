@@ -0,0 +1,43 @@
+#! /usr/bin/env python
+"""
+Benchmark routing, tree moves and rendering against synthetic Route trees.
+
+Results are written as JSON, so that they can be compared between releases:
+
+    ./conman/benchmarks/run.py --output results.json
+"""
+import sys
+
+import dj_database_url
+import django
+from django.conf import settings
+
+
+settings.configure(
+    DATABASES={'default': dj_database_url.config(
+        default='postgres://localhost/conman',
+    )},
+    INSTALLED_APPS=(
+        'conman.routes',
+        'conman.pages',
+        'conman.redirects',
+
+        'mptt',
+        'polymorphic',
+        'polymorphic_tree',
+
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+    ),
+    ROOT_URLCONF='conman.tests.urls',
+    MIDDLEWARE_CLASSES=(),
+)
+
+
+django.setup()
+
+
+from conman.benchmarks.suite import main  # noqa: E402
+
+
+main(sys.argv[1:])
@@ -0,0 +1,191 @@
+"""Benchmarks of routing, tree moves and rendering."""
+import argparse
+import json
+import platform
+import sys
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+
+from conman.pages.models import Page
+from conman.routes.models import Route
+from conman.routes.utils import split_path
+from .measure import measure
+from .trees import (
+    build_deep_tree,
+    build_large_tree,
+    build_mixed_tree,
+    build_wide_tree,
+)
+
+
+# Database lookups for `best_match_for_path`. See `CONMAN_ROUTE_LOOKUP`.
+LOOKUPS = ('url', 'hash', 'prefix')
+
+
+def toggle_slug(route, first, second):
+    """Get a function that renames `route` back and forth, saving each time."""
+    def rename():
+        route.slug = second if route.slug == first else first
+        route.save()
+    return rename
+
+
+def bench_lookups(tree, url, repeat):
+    """Benchmark finding the best Route for `url`, with each lookup and the index."""
+    results = []
+    for lookup in LOOKUPS:
+        with override_settings(CONMAN_ROUTE_LOOKUP=lookup):
+            results.append(measure(
+                'best_match_for_path[{}]'.format(lookup),
+                lambda: Route.objects.best_match_for_path(url),
+                repeat, tree=tree, url=url,
+            ))
+    with override_settings(CONMAN_ROUTE_INDEX=True):
+        # Build the index before timing lookups.
+        Route.objects.best_match_for_path(url)
+        results.append(measure(
+            'best_match_for_path[index]',
+            lambda: Route.objects.best_match_for_path(url),
+            repeat, tree=tree, url=url,
+        ))
+    return results
+
+
+def bench_request(tree, url, repeat):
+    """Benchmark a full request for `url` through `route_router`."""
+    client = Client()
+    return measure(
+        'route_router', lambda: client.get(url), repeat, tree=tree, url=url,
+    )
+
+
+def bench_wide(width, repeat):
+    """Benchmark lookups among many siblings."""
+    tree = 'wide-{}'.format(width)
+    urls = build_wide_tree(width)
+    last = urls[-1]
+    missing = last + 'missing/'
+    results = bench_lookups(tree, last, repeat)
+    results.extend(bench_lookups(tree, missing, repeat))
+    results.append(bench_request(tree, last, repeat))
+    return results
+
+
+def bench_deep(depth, repeat):
+    """Benchmark lookups and moves in a long branch."""
+    tree = 'deep-{}'.format(depth)
+    urls = build_deep_tree(depth)
+    deepest = urls[-1]
+    top = Route.objects.get(url=urls[1])
+    return bench_lookups(tree, deepest, repeat) + [
+        measure(
+            'split_path', lambda: split_path(deepest), repeat,
+            tree=tree, url=deepest,
+        ),
+        bench_request(tree, deepest, repeat),
+        measure(
+            'Route.save', toggle_slug(top, top.slug, 'renamed'), repeat,
+            tree=tree, url=top.url, descendants=depth - 1,
+        ),
+    ]
+
+
+def bench_mixed(sections, pages_per_section, repeat):
+    """Benchmark rendering Pages and RouteRedirects, and moving sections."""
+    tree = 'mixed-{}x{}'.format(sections, pages_per_section)
+    urls = build_mixed_tree(sections, pages_per_section)
+    section = Route.objects.get(url=urls['sections'][0])
+    descendants = section.get_descendant_count()
+    return [
+        bench_request(tree, urls['pages'][-1], repeat),
+        bench_request(tree, urls['redirects'][-1], repeat),
+        measure(
+            'Route.save', toggle_slug(section, section.slug, 'renamed'), repeat,
+            tree=tree, url=section.url, descendants=descendants,
+        ),
+    ]
+
+
+def bench_bulk_create(width, repeat):
+    """Benchmark inserting a wide tree in bulk, and by saving each Page."""
+    tree = 'wide-{}'.format(width)
+
+    def rolled_back(build):
+        def run():
+            with transaction.atomic():
+                build()
+                transaction.set_rollback(True)
+        return run
+
+    def bulk_create():
+        children = [(Page(slug='page-{}'.format(i)), []) for i in range(width)]
+        Route.objects.bulk_create_tree([(Page(), children)])
+
+    return [
+        measure('bulk_create_tree', rolled_back(bulk_create), repeat, tree=tree),
+        measure(
+            'Route.save[tree]', rolled_back(lambda: build_wide_tree(width)), repeat,
+            tree=tree,
+        ),
+    ]
+
+
+def bench_large(size, repeat):
+    """Benchmark lookups in a bulk inserted tree of about `size` Routes."""
+    tree = 'large-{}'.format(size)
+    last = build_large_tree(size)
+    missing = last + 'missing/'
+    return bench_lookups(tree, last, repeat) + bench_lookups(tree, missing, repeat)
+
+
+def run_in_rollback(benchmark, *args):
+    """Run a benchmark, then roll back the tree it built."""
+    with transaction.atomic():
+        results = benchmark(*args)
+        transaction.set_rollback(True)
+    return results
+
+
+def main(argv):
+    """Run the benchmarks and write the results as JSON."""
+    parser = argparse.ArgumentParser(description='Benchmark django-conman.')
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--width', type=int, default=1000)
+    parser.add_argument('--depth', type=int, default=50)
+    parser.add_argument('--sections', type=int, default=10)
+    parser.add_argument('--pages-per-section', type=int, default=50)
+    parser.add_argument('--bulk-repeat', type=int, default=5)
+    parser.add_argument(
+        '--large-sizes', type=int, nargs='*', default=[10000],
+        help='Sizes of the large trees to benchmark lookups in, e.g. 10000 1000000.',
+    )
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    database_name = settings.DATABASES['default']['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        results = run_in_rollback(bench_wide, args.width, args.repeat)
+        results.extend(run_in_rollback(bench_deep, args.depth, args.repeat))
+        results.extend(run_in_rollback(
+            bench_mixed, args.sections, args.pages_per_section, args.repeat,
+        ))
+        results.extend(bench_bulk_create(args.width, args.bulk_repeat))
+        for size in args.large_sizes:
+            results.extend(run_in_rollback(bench_large, size, args.repeat))
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+
+    report = {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'results': results,
+    }
+    json.dump(report, args.output, indent=2, sort_keys=True)
+    args.output.write('\n')
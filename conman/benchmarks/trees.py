@@ -0,0 +1,80 @@
+"""Build synthetic Route trees to benchmark against."""
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+
+
+def build_wide_tree(width):
+    """
+    Build a root Page with `width` child Pages.
+
+    Returns the urls of the children.
+    """
+    root = PageFactory.create()
+    return [
+        PageFactory.create(parent=root, slug='page-{}'.format(i)).url
+        for i in range(width)
+    ]
+
+
+def build_deep_tree(depth):
+    """
+    Build a single branch of Pages, `depth` Pages below the root.
+
+    Returns the urls of each Page in the branch, from the root down.
+    """
+    route = PageFactory.create()
+    urls = [route.url]
+    for i in range(depth):
+        route = PageFactory.create(parent=route, slug='level-{}'.format(i))
+        urls.append(route.url)
+    return urls
+
+
+def build_mixed_tree(sections, pages_per_section):
+    """
+    Build sections of Pages, with a RouteRedirect for every other Page.
+
+    Each RouteRedirect sits next to the Page it redirects to.
+
+    Returns a dict of the urls of the `sections`, `pages` and `redirects`.
+    """
+    root = PageFactory.create()
+    urls = {'sections': [], 'pages': [], 'redirects': []}
+    for i in range(sections):
+        section = PageFactory.create(parent=root, slug='section-{}'.format(i))
+        urls['sections'].append(section.url)
+        for j in range(pages_per_section):
+            slug = 'page-{}'.format(j)
+            page = PageFactory.create(parent=section, slug=slug)
+            urls['pages'].append(page.url)
+            if j % 2:
+                continue
+            redirect = ChildRouteRedirectFactory.create(
+                parent=section,
+                slug='redirect-{}'.format(j),
+                target=page,
+            )
+            urls['redirects'].append(redirect.url)
+    return urls
+
+
+def build_large_tree(size, pages_per_section=100):
+    """
+    Bulk insert a root Page with sections of Pages, about `size` Pages in all.
+
+    Much faster to build than the other trees, so suited to trees of up to
+    millions of Routes. See `RouteManager.bulk_create_tree`.
+
+    Returns the url of the last Page.
+    """
+    sections = max(size // (pages_per_section + 1), 1)
+    tree = [
+        (Page(slug='section-{}'.format(i)), [
+            (Page(slug='page-{}'.format(j)), [])
+            for j in range(pages_per_section)
+        ])
+        for i in range(sections)
+    ]
+    routes = Page.objects.bulk_create_tree([(Page(), tree)])
+    return routes[-1].url
@@ -5,3 +5,4 @@ from . import views
 class PageHandler(SimpleHandler):
     """Pass a request to PageDetail."""
     view = views.PageDetail.as_view()
+    cacheable = True
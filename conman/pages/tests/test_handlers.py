@@ -17,3 +17,7 @@ class TestPageHandler(TestCase):
 
         self.assertEqual(view.__name__, expected.__name__)
         self.assertEqual(view.__module__, expected.__module__)
+
+    def test_cacheable(self):
+        """Test that responses from PageHandler can be cached."""
+        self.assertTrue(handlers.PageHandler.cacheable)
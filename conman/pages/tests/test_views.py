@@ -1,3 +1,5 @@
+from unittest import mock
+
 from conman.tests.utils import RequestTestCase
 from . import factories
 from .. import views
@@ -20,3 +22,36 @@ class TestPageDetail(RequestTestCase):
         page = factories.PageFactory.create(content='This is a test')
         response = self.client.get(page.url)
         self.assertIn(page.content, response.rendered_content)
+
+    def test_integration_queries(self):
+        """A page is rendered with a single query."""
+        page = factories.PageFactory.create()
+
+        with self.assertNumQueries(1):
+            # One query:
+            # * Get the best Route for the url, along with its Page.
+            self.client.get(page.url)
+
+    def test_integration_not_modified(self):
+        """A page that has not changed is not rendered again."""
+        page = factories.PageFactory.create()
+        etag = self.client.get(page.url)['ETag']
+
+        render_path = 'conman.pages.views.PageDetail.render_to_response'
+        with mock.patch(render_path) as render:
+            response = self.client.get(page.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(render.called)
+
+    def test_integration_modified(self):
+        """A page is rendered again once it has been saved."""
+        page = factories.PageFactory.create(content='Old')
+        etag = self.client.get(page.url)['ETag']
+
+        page.content = 'New'
+        page.save()
+        response = self.client.get(page.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('New', response.rendered_content)
@@ -0,0 +1 @@
+default_app_config = 'conman.redirects.apps.RedirectConfig'
@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+from conman.routes.signals import url_changed, urls_rewritten
+from . import receivers
+
+
+class RedirectConfig(AppConfig):
+    """The AppConfig for conman redirects."""
+    name = 'conman.redirects'
+
+    def ready(self):
+        """Keep the target urls of redirects up to date as Routes move."""
+        url_changed.connect(
+            receivers.update_target_urls,
+            dispatch_uid='conman.redirects.update_target_urls',
+        )
+        urls_rewritten.connect(
+            receivers.update_rewritten_target_urls,
+            dispatch_uid='conman.redirects.update_rewritten_target_urls',
+        )
@@ -3,5 +3,11 @@ from . import views
 
 
 class RouteRedirectHandler(SimpleHandler):
-    """Pass a request through to RouteRedirectView."""
+    """
+    Pass a request through to RouteRedirectView.
+
+    Not `conditional`, as the redirect depends on the url of the target, which
+    can change without the RouteRedirect being modified.
+    """
+    conditional = False
     view = views.RouteRedirectView.as_view()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def set_target_urls(apps, schema_editor):
+    """Follow the chain of each RouteRedirect, and store the url it ends at."""
+    Route = apps.get_model('routes', 'Route')
+    RouteRedirect = apps.get_model('redirects', 'RouteRedirect')
+
+    urls = dict(Route.objects.values_list('pk', 'url'))
+    targets = dict(RouteRedirect.objects.values_list('pk', 'target_id'))
+    for pk in targets:
+        target_id = targets[pk]
+        seen = {pk}
+        while target_id in targets and target_id not in seen:
+            seen.add(target_id)
+            target_id = targets[target_id]
+        RouteRedirect.objects.filter(pk=pk).update(target_url=urls[target_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('redirects', '0001_initial'),
+        ('routes', '0003_route_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routeredirect',
+            name='target_url',
+            field=models.TextField(editable=False, default=''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_target_urls, migrations.RunPython.noop),
+    ]
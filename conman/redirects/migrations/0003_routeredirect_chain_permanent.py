@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def set_chain_permanent(apps, schema_editor):
+    """Follow the chain of each RouteRedirect, and store if it is all permanent."""
+    RouteRedirect = apps.get_model('redirects', 'RouteRedirect')
+
+    redirects = {
+        pk: (target_id, permanent)
+        for pk, target_id, permanent in RouteRedirect.objects.values_list(
+            'pk', 'target_id', 'permanent',
+        )
+    }
+    for pk in redirects:
+        target_id, chain_permanent = redirects[pk]
+        seen = {pk}
+        while target_id in redirects and target_id not in seen:
+            seen.add(target_id)
+            target_id, permanent = redirects[target_id]
+            chain_permanent = chain_permanent and permanent
+        if chain_permanent:
+            RouteRedirect.objects.filter(pk=pk).update(chain_permanent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('redirects', '0002_routeredirect_target_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routeredirect',
+            name='chain_permanent',
+            field=models.BooleanField(editable=False, default=False),
+        ),
+        migrations.RunPython(set_chain_permanent, migrations.RunPython.noop),
+    ]
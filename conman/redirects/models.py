@@ -2,7 +2,10 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
+from conman.routes.conf import get_setting
 from conman.routes.models import Route
+from conman.routes.replicas import reading_from_primary
+from conman.routes.transactions import atomic
 from . import handlers
 
 
@@ -11,18 +14,119 @@ class RouteRedirect(Route):
     When `route` is browsed to, browser should be redirected to `target`.
 
     This model holds the data required to make that connection.
+
+    If `target` is itself a RouteRedirect, the chain of redirects is followed
+    when this is saved, and the url at the end of it is kept in `target_url`.
+    Clients are sent straight there, and serving the redirect costs no queries
+    beyond finding the Route. The redirect is only permanent if every redirect
+    in the chain is, as browsers keep permanent redirects for good. That is
+    kept in `chain_permanent`.
     """
     handler = handlers.RouteRedirectHandler.path()
+    # Sitemaps should only list the urls that are redirected to.
+    in_sitemap = False
     target = models.ForeignKey('routes.Route', related_name='+')
     permanent = models.BooleanField(default=False, blank=True)
+    # Cached url at the end of the chain of redirects that starts at `target`.
+    target_url = models.TextField(editable=False)
+    # Cached: whether this and every RouteRedirect in its chain are permanent.
+    chain_permanent = models.BooleanField(default=False, editable=False)
 
     def clean(self):
-        """Forbid setting target equal to self."""
+        """
+        Forbid loops of redirects, and find the url at the end of the chain.
+
+        Also works out if the redirect is permanent all the way there.
+
+        A RouteRedirect may not redirect to itself, or to another RouteRedirect
+        that leads back to it. With `CONMAN_MULTIPLE_HOSTS`, its chain must end
+        on its own host, as `target_url` is only a path.
+        """
+        if self.target_id is None:
+            # Missing targets are reported by the validation of the field.
+            return
         if self.target_id == self.route_ptr_id:
             error = {'target': _('A RouteRedirect cannot redirect to itself.')}
             raise ValidationError(error)
+        target_url, target_host, chain_permanent = self.resolve_target()
+        if get_setting('MULTIPLE_HOSTS'):
+            host = self.parent.host if self.parent_id is not None else self.host
+            if target_host != host:
+                msg = _('A RouteRedirect cannot redirect to a Route on another host.')
+                raise ValidationError({'target': msg})
+        self.target_url, self.chain_permanent = target_url, chain_permanent
+
+    def resolve_target(self):
+        """
+        Follow the chain of redirects from `target`, to its final url.
+
+        Returns the url and host of the Route at the end of the chain, and
+        whether this and every redirect on the way to it are permanent.
+
+        Raises `ValidationError` if the chain loops back to this RouteRedirect.
+        """
+        redirects = RouteRedirect.objects.non_polymorphic()
+        target_id = self.target_id
+        permanent = self.permanent
+        seen = {self.pk, target_id}
+        while True:
+            try:
+                target_id, hop_permanent = redirects.values_list(
+                    'target_id',
+                    'permanent',
+                ).get(pk=target_id)
+            except RouteRedirect.DoesNotExist:
+                break
+            if target_id in seen:
+                msg = _('A RouteRedirect cannot be part of a loop of redirects.')
+                raise ValidationError({'target': msg})
+            seen.add(target_id)
+            permanent = permanent and hop_permanent
 
+        routes = Route.objects.non_polymorphic().values_list('url', 'host')
+        url, host = routes.get(pk=target_id)
+        return url, host, permanent
+
+    def update_redirects_here(self):
+        """
+        Update the RouteRedirects whose chain passes through this one.
+
+        They are given its `target_url`, and their `chain_permanent` is worked
+        out again from the redirects between them and this one. Each step back
+        along the chains costs up to three queries, however many RouteRedirects
+        it updates: one to find them, and one to update each of those that are
+        permanent all the way, and those that are not.
+        """
+        redirects = RouteRedirect.objects.non_polymorphic()
+        pks = {self.pk}
+        permanent_pks = pks if self.chain_permanent else set()
+        while pks:
+            steps = redirects.filter(target_id__in=pks)
+            steps = list(steps.values_list('pk', 'target_id', 'permanent'))
+            pks = {pk for pk, target_id, permanent in steps}
+            permanent_pks = {
+                pk for pk, target_id, permanent in steps
+                if permanent and target_id in permanent_pks
+            }
+
+            redirects.filter(pk__in=permanent_pks).update(
+                target_url=self.target_url,
+                chain_permanent=True,
+            )
+            redirects.filter(pk__in=pks - permanent_pks).update(
+                target_url=self.target_url,
+                chain_permanent=False,
+            )
+
+    @reading_from_primary()
     def save(self, *args, **kwargs):
-        """Validate the Redirect before saving."""
+        """
+        Validate the Redirect, and update redirects to it, when saving.
+
+        Always reads from the primary database, so the chain of redirects is
+        followed as it is now.
+        """
         self.clean()
-        return super().save(*args, **kwargs)
+        with atomic():
+            super().save(*args, **kwargs)
+            self.update_redirects_here()
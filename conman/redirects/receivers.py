@@ -0,0 +1,32 @@
+from django.apps import apps
+
+from conman.routes.utils import replace_url_prefix
+
+
+def update_target_urls(sender, route, old_url, **kwargs):
+    """
+    Update the `target_url` of RouteRedirects to Routes that have moved.
+
+    Urls are built from the slugs of ancestors, so the moved Routes are those
+    with urls that start with `old_url`. All their redirects are updated in a
+    single UPDATE. Only redirects on the same host are updated, as their
+    `target_url`s are paths on that host.
+    """
+    RouteRedirect = apps.get_model('redirects', 'RouteRedirect')
+    redirects = RouteRedirect.objects.non_polymorphic()
+    redirects = redirects.filter(host=route.host, target_url__startswith=old_url)
+    redirects.update(target_url=replace_url_prefix('target_url', old_url, route.url))
+
+
+def update_rewritten_target_urls(sender, route, old_url, new_url, urls, **kwargs):
+    """
+    Update the `target_url` of RouteRedirects to Routes whose urls were rewritten.
+
+    Sent bit by bit with `CONMAN_DEFER_URL_REWRITES`, so only redirects to the
+    `urls` just rewritten are updated, rather than all those that start with
+    `old_url`. Redirects to the rest keep working until they are rewritten.
+    """
+    RouteRedirect = apps.get_model('redirects', 'RouteRedirect')
+    redirects = RouteRedirect.objects.non_polymorphic()
+    redirects = redirects.filter(host=route.host, target_url__in=urls)
+    redirects.update(target_url=replace_url_prefix('target_url', old_url, new_url))
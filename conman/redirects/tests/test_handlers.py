@@ -18,3 +18,7 @@ class TestRouteRedirectHandler(TestCase):
 
         self.assertEqual(view.__name__, expected.__name__)
         self.assertEqual(view.__module__, expected.__module__)
+
+    def test_not_conditional(self):
+        """RouteRedirectHandler does not answer conditional GETs by itself."""
+        self.assertFalse(RouteRedirectHandler.conditional)
@@ -1,7 +1,10 @@
 from django.core.exceptions import ValidationError
 from django.forms import ModelForm
-from django.test import TestCase
+from django.test import override_settings, TestCase
 
+from conman.routes import transactions
+from conman.routes.rewrites import run_pending_rewrites
+from conman.routes.tests.factories import ChildRouteFactory
 from conman.routes.tests.test_models import NODE_BASE_FIELDS
 from .factories import ChildRouteRedirectFactory
 from ..models import RouteRedirect
@@ -18,6 +21,8 @@ class RouteRedirectTest(TestCase):
             'target',
             'target_id',
             'permanent',
+            'target_url',
+            'chain_permanent',
         ) + NODE_BASE_FIELDS
         fields = RouteRedirect._meta.get_all_field_names()
         self.assertCountEqual(fields, expected)
@@ -46,6 +51,211 @@ class RouteRedirectTest(TestCase):
 
         self.assertIn('target', form.errors)
 
+    def test_loop(self):
+        """A RouteRedirect cannot redirect to a chain that leads back to it."""
+        first = ChildRouteRedirectFactory.create()
+        second = ChildRouteRedirectFactory.create(target=first)
+
+        first.target = second
+
+        with self.assertRaises(ValidationError):
+            first.save()
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_other_host(self):
+        """With CONMAN_MULTIPLE_HOSTS, a RouteRedirect cannot leave its host."""
+        target = ChildRouteFactory.create(parent__host='example.com')
+        redirect = ChildRouteRedirectFactory.create()
+
+        redirect.target = target
+
+        with self.assertRaises(ValidationError):
+            redirect.save()
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_other_host_chain(self):
+        """The end of a RouteRedirect's chain must be on its host too."""
+        target = ChildRouteFactory.create(parent__host='example.com')
+        middle = ChildRouteRedirectFactory.create(
+            parent__host='example.com',
+            target=target,
+        )
+        redirect = ChildRouteRedirectFactory.create()
+
+        redirect.target = middle
+
+        with self.assertRaises(ValidationError):
+            redirect.save()
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_same_host(self):
+        """A RouteRedirect can redirect to a Route on its own host."""
+        redirect = ChildRouteRedirectFactory.create(
+            parent__host='example.com',
+            target__parent__host='example.com',
+        )
+
+        self.assertEqual(redirect.target_url, redirect.target.url)
+
+    def test_other_host_ignored(self):
+        """Without CONMAN_MULTIPLE_HOSTS, hosts are ignored."""
+        target = ChildRouteFactory.create(parent__host='example.com')
+
+        redirect = ChildRouteRedirectFactory.create(target=target)
+
+        self.assertEqual(redirect.target_url, target.url)
+
+    def test_no_target_with_form(self):
+        """A form for RouteRedirect is invalid without a target."""
+        class RouteRedirectForm(ModelForm):
+            class Meta:
+                model = RouteRedirect
+                exclude = []
+
+        form = RouteRedirectForm({})
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('target', form.errors)
+
+
+class RouteRedirectTargetURLTest(TestCase):
+    """Test RouteRedirect keeps the url at the end of its chain in target_url."""
+    def test_target(self):
+        """The target_url of a RouteRedirect is the url of its target."""
+        target = ChildRouteFactory.create()
+        redirect = ChildRouteRedirectFactory.create(target=target)
+
+        self.assertEqual(redirect.target_url, target.url)
+
+    def test_chain(self):
+        """A chain of RouteRedirects is collapsed to the url at its end."""
+        target = ChildRouteFactory.create()
+        middle = ChildRouteRedirectFactory.create(target=target)
+        first = ChildRouteRedirectFactory.create(target=middle)
+
+        self.assertEqual(first.target_url, target.url)
+
+    def test_retarget_chain(self):
+        """Test that redirects leading to a retargeted RouteRedirect are updated."""
+        middle = ChildRouteRedirectFactory.create()
+        first = ChildRouteRedirectFactory.create(target=middle)
+        second = ChildRouteRedirectFactory.create(target=first)
+        new_target = ChildRouteFactory.create()
+
+        middle.target = new_target
+        middle.save()
+
+        for redirect in (first, second):
+            redirect = RouteRedirect.objects.get(pk=redirect.pk)
+            self.assertEqual(redirect.target_url, new_target.url)
+
+    def test_target_moved(self):
+        """Test that redirects to a Route and its descendants follow it."""
+        branch = ChildRouteFactory.create(slug='branch')
+        leaf = ChildRouteFactory.create(parent=branch, slug='leaf')
+        to_branch = ChildRouteRedirectFactory.create(target=branch)
+        to_leaf = ChildRouteRedirectFactory.create(target=leaf)
+        other = ChildRouteRedirectFactory.create()
+
+        branch.slug = 'moved'
+        branch.save()
+
+        to_branch = RouteRedirect.objects.get(pk=to_branch.pk)
+        self.assertEqual(to_branch.target_url, '/moved/')
+        to_leaf = RouteRedirect.objects.get(pk=to_leaf.pk)
+        self.assertEqual(to_leaf.target_url, '/moved/leaf/')
+        other_url = RouteRedirect.objects.get(pk=other.pk).target_url
+        self.assertEqual(other_url, other.target_url)
+
+    @override_settings(CONMAN_DEFER_URL_REWRITES=True)
+    def test_target_moved_deferred(self):
+        """Test that redirects to descendants follow them as urls are rewritten."""
+        self.addCleanup(transactions._local.__dict__.pop, 'pending', None)
+        branch = ChildRouteFactory.create(slug='branch')
+        leaf = ChildRouteFactory.create(parent=branch, slug='leaf')
+        to_branch = ChildRouteRedirectFactory.create(target=branch)
+        to_leaf = ChildRouteRedirectFactory.create(target=leaf)
+
+        branch.slug = 'moved'
+        branch.save()
+
+        to_branch = RouteRedirect.objects.get(pk=to_branch.pk)
+        self.assertEqual(to_branch.target_url, '/moved/')
+        # The leaf hasn't moved yet, so neither have redirects to it.
+        to_leaf_url = RouteRedirect.objects.get(pk=to_leaf.pk).target_url
+        self.assertEqual(to_leaf_url, '/branch/leaf/')
+
+        run_pending_rewrites()
+
+        to_leaf = RouteRedirect.objects.get(pk=to_leaf.pk)
+        self.assertEqual(to_leaf.target_url, '/moved/leaf/')
+
+    def test_target_moved_other_host(self):
+        """Test that RouteRedirects on other hosts keep their target urls."""
+        branch = ChildRouteFactory.create(slug='branch')
+        other = ChildRouteRedirectFactory.create(
+            parent__host='example.com',
+            target__parent__host='example.com',
+            target__slug='branch',
+        )
+
+        branch.slug = 'moved'
+        branch.save()
+
+        other = RouteRedirect.objects.get(pk=other.pk)
+        self.assertEqual(other.target_url, '/branch/')
+
+
+class RouteRedirectChainPermanentTest(TestCase):
+    """Test RouteRedirect keeps whether its whole chain is permanent."""
+    def test_permanent(self):
+        """A permanent RouteRedirect to a Route is permanent all the way."""
+        redirect = ChildRouteRedirectFactory.create(permanent=True)
+
+        self.assertTrue(redirect.chain_permanent)
+
+    def test_temporary(self):
+        """A temporary RouteRedirect is not."""
+        redirect = ChildRouteRedirectFactory.create(permanent=False)
+
+        self.assertFalse(redirect.chain_permanent)
+
+    def test_chain(self):
+        """A chain is permanent if every RouteRedirect in it is."""
+        middle = ChildRouteRedirectFactory.create(permanent=True)
+        first = ChildRouteRedirectFactory.create(target=middle, permanent=True)
+
+        self.assertTrue(first.chain_permanent)
+
+    def test_temporary_hop(self):
+        """A permanent RouteRedirect to a temporary one is not permanent."""
+        middle = ChildRouteRedirectFactory.create(permanent=False)
+        first = ChildRouteRedirectFactory.create(target=middle, permanent=True)
+
+        self.assertFalse(first.chain_permanent)
+
+    def test_hop_changed(self):
+        """Test that RouteRedirects that lead to one made temporary are updated."""
+        middle = ChildRouteRedirectFactory.create(permanent=True)
+        first = ChildRouteRedirectFactory.create(target=middle, permanent=True)
+        second = ChildRouteRedirectFactory.create(target=first, permanent=True)
+        temporary = ChildRouteRedirectFactory.create(target=first, permanent=False)
+
+        middle.permanent = False
+        middle.save()
+
+        for redirect in (first, second, temporary):
+            redirect = RouteRedirect.objects.get(pk=redirect.pk)
+            self.assertFalse(redirect.chain_permanent)
+
+        middle.permanent = True
+        middle.save()
+
+        chain_permanent = dict(RouteRedirect.objects.values_list('pk', 'chain_permanent'))
+        self.assertTrue(chain_permanent[first.pk])
+        self.assertTrue(chain_permanent[second.pk])
+        self.assertFalse(chain_permanent[temporary.pk])
+
 
 class RouteRedirectUnicodeMethodTest(TestCase):
     """We should get something nice when RedirectRoute is cast to string."""
@@ -27,6 +27,15 @@ class TestRouteRedirectView(RequestTestCase):
 
         self.assertEqual(response.status_code, 301)
 
+    def test_temporary_chain(self):
+        """A permanent redirect to a temporary one has status_code 302."""
+        middle = ChildRouteRedirectFactory.create(permanent=False)
+        route = ChildRouteRedirectFactory.create(target=middle, permanent=True)
+        view = self.get_view()
+        response = view(self.create_request(), route=route)
+
+        self.assertEqual(response.status_code, 302)
+
     def test_temporary(self):
         """A temporary redirect has status_code 302."""
         route = ChildRouteRedirectFactory.create(permanent=False)
@@ -46,3 +55,22 @@ class TestRouteRedirectViewIntegration(TestCase):
 
         expected = 'http://testserver' + target.url
         self.assertEqual(response['Location'], expected)
+
+    def test_access_chain(self):
+        """Accessing a chain of RouteRedirects redirects to the end of the chain."""
+        target = ChildRouteFactory.create()
+        middle = ChildRouteRedirectFactory.create(target=target)
+        route = ChildRouteRedirectFactory.create(target=middle)
+        response = self.client.get(route.url)
+
+        expected = 'http://testserver' + target.url
+        self.assertEqual(response['Location'], expected)
+
+    def test_access_redirect_queries(self):
+        """Accessing a RouteRedirect's url costs a single query."""
+        route = ChildRouteRedirectFactory.create()
+
+        with self.assertNumQueries(1):
+            # One query:
+            # * Get the best Route for the url, along with its RouteRedirect.
+            self.client.get(route.url)
@@ -5,10 +5,11 @@ class RouteRedirectView(RedirectView):
     """Redirect to the target Route."""
     def get_redirect_url(self, *args, **kwargs):
         """
-        Return the route's target url.
+        Return the url at the end of the route's chain of redirects.
 
-        Save the route's redirect type for use by RedirectView.
+        Save the redirect type for use by RedirectView. It is only permanent if
+        every redirect in the chain is.
         """
         redirect = kwargs['route']
-        self.permanent = redirect.permanent
-        return redirect.target.url
+        self.permanent = redirect.chain_permanent
+        return redirect.target_url
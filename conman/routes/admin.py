@@ -0,0 +1,179 @@
+from django.conf.urls import url
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.core.urlresolvers import NoReverseMatch, reverse
+from django.db import connections
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.template.response import TemplateResponse
+
+from .models import Route
+
+
+# The fields of each Route listed by `RouteAdmin.nodes_view`.
+NODE_FIELDS = ('pk', 'url', 'slug', 'host', 'polymorphic_ctype_id', 'tree_id', 'lft')
+# Counts the children of each Route, using the index on the parent column.
+CHILD_COUNT_SQL = (
+    'SELECT COUNT(*) FROM {table} AS children WHERE children.{parent} = {table}.{pk}'
+)
+
+
+def parse_cursor(cursor):
+    """
+    Parse a `tree_id-lft` cursor, as made by `make_cursor`.
+
+    Raises `ValueError` if it is malformed.
+    """
+    tree_id, lft = cursor.split('-')
+    return int(tree_id), int(lft)
+
+
+def make_cursor(node):
+    """Make a cursor to fetch the nodes after `node`, in tree order."""
+    return '{}-{}'.format(node['tree_id'], node['lft'])
+
+
+class RouteAdmin(admin.ModelAdmin):
+    """
+    An admin for Routes that scales to very large trees.
+
+    Rather than render (and downcast) every Route, the changelist starts with
+    the Root Routes, and fetches children over AJAX as each is expanded. See
+    `nodes_view`. Routes can also be searched for by the start of their url.
+
+    Parents are picked by pk, as a select of every Route would be too long.
+
+    Routes are added in the admins of their concrete models, as a bare Route
+    has no handler.
+    """
+    change_list_template = 'admin/routes/route/change_list.html'
+    raw_id_fields = ('parent',)
+
+    def has_add_permission(self, request):
+        """Forbid adding bare Routes, which could not handle requests."""
+        return False
+
+    def get_urls(self):
+        """Add the url of `nodes_view`."""
+        info = self.model._meta.app_label, self.model._meta.model_name
+        urls = [
+            url(
+                r'^nodes/$',
+                self.admin_site.admin_view(self.nodes_view),
+                name='{}_{}_nodes'.format(*info),
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def get_nodes(self, parent=None, prefix=None, after=None):
+        """
+        Get a page of `list_per_page` Routes, as dicts of their `NODE_FIELDS`.
+
+        Lists the children of the Route with the pk `parent` (or Root Routes if
+        None), or with `prefix`, the Routes whose urls start with it (which can
+        use the index on `url`). Routes are in tree order, and each page starts
+        after the `(tree_id, lft)` of the last Route of the page before, so all
+        pages cost the same, however far in. Each Route also has the number of
+        its `children`, counted by a subquery.
+
+        One more Route than the page holds is fetched, to tell if there are more.
+        """
+        routes = self.model.objects.non_polymorphic()
+        if prefix is not None:
+            routes = routes.filter(url__startswith=prefix)
+        else:
+            routes = routes.filter(parent_id=parent)
+        if after is not None:
+            tree_id, lft = after
+            later = Q(tree_id__gt=tree_id) | Q(tree_id=tree_id, lft__gt=lft)
+            routes = routes.filter(later)
+
+        routes = routes.extra(select={'children': self.child_count_sql()})
+        routes = routes.order_by('tree_id', 'lft').values('children', *NODE_FIELDS)
+        return list(routes[:self.list_per_page + 1])
+
+    def child_count_sql(self):
+        """Get the SQL of a subquery of the number of children of each Route."""
+        opts = self.model._meta
+        quote_name = connections[self.model.objects.db].ops.quote_name
+        table = quote_name(opts.db_table)
+        parent_column = quote_name(opts.get_field('parent').column)
+        pk_column = quote_name(opts.pk.column)
+        return CHILD_COUNT_SQL.format(table=table, parent=parent_column, pk=pk_column)
+
+    def get_change_url(self, content_type, pk):
+        """
+        Get the url to change a Route, in the admin of its concrete model.
+
+        Falls back to this admin if its model isn't registered.
+        """
+        info = self.admin_site.name, content_type.app_label, content_type.model
+        try:
+            return reverse('{}:{}_{}_change'.format(*info), args=[pk])
+        except NoReverseMatch:
+            opts = self.model._meta
+            info = self.admin_site.name, opts.app_label, opts.model_name
+            return reverse('{}:{}_{}_change'.format(*info), args=[pk])
+
+    def nodes_view(self, request):
+        """
+        List a page of Routes as JSON, for the changelist to show.
+
+        Takes the pk of a `parent` (or lists Root Routes), or a url `prefix` to
+        search for, and the `after` cursor from the `next` of the last page.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        parent = request.GET.get('parent') or None
+        prefix = request.GET.get('prefix') or None
+        if prefix is not None and not prefix.startswith('/'):
+            prefix = '/' + prefix
+        try:
+            if parent is not None:
+                parent = int(parent)
+            after = request.GET.get('after')
+            if after is not None:
+                after = parse_cursor(after)
+        except ValueError:
+            return HttpResponseBadRequest('Invalid parent or cursor.')
+
+        nodes = self.get_nodes(parent=parent, prefix=prefix, after=after)
+        next_cursor = None
+        if len(nodes) > self.list_per_page:
+            nodes = nodes[:self.list_per_page]
+            next_cursor = make_cursor(nodes[-1])
+
+        for node in nodes:
+            # Content types are cached by Django, so this costs no queries.
+            ctype_id = node.pop('polymorphic_ctype_id')
+            content_type = ContentType.objects.get_for_id(ctype_id)
+            # The name of the model, or of the content type if it is stale.
+            node['type'] = content_type.name
+            node['change_url'] = self.get_change_url(content_type, node['pk'])
+            del node['tree_id'], node['lft']
+        return JsonResponse({'nodes': nodes, 'next': next_cursor})
+
+    def changelist_view(self, request, extra_context=None):
+        """
+        Show the Route tree, whose nodes are loaded as they are needed.
+
+        Unlike the usual changelist, no Routes are fetched to render the page.
+        """
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        opts = self.model._meta
+        info = self.admin_site.name, opts.app_label, opts.model_name
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=opts,
+            title=opts.verbose_name_plural.capitalize(),
+            has_add_permission=self.has_add_permission(request),
+            nodes_url=reverse('{}:{}_{}_nodes'.format(*info)),
+            prefix=request.GET.get('prefix', ''),
+        )
+        context.update(extra_context or {})
+        return TemplateResponse(request, self.change_list_template, context)
+
+
+admin.site.register(Route, RouteAdmin)
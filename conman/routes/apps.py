@@ -1,14 +1,66 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
 from django.core.checks import register
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from mptt.signals import node_moved
 
-from . import checks
+from . import checks, receivers
+from .handlers import registry
 
 
 class RouteConfig(AppConfig):
     """The AppConfig for conman routes."""
     name = 'conman.routes'
+    routes_prepared = False
 
     def ready(self):
-        """Register checks for conman routes."""
+        """
+        Register checks and signal receivers, and prepare Route subclasses.
+
+        Finds the subclasses of Route, and loads the handler of each of them.
+        This is only done once, as `ready` can be called again when tests
+        override INSTALLED_APPS.
+        """
         register(checks.polymorphic_installed)
         register(checks.subclasses_available)
+
+        post_delete.connect(
+            receivers.bump_route_generation,
+            dispatch_uid='conman.routes.bump_route_generation',
+        )
+        post_save.connect(
+            receivers.bump_route_version,
+            dispatch_uid='conman.routes.bump_route_version',
+        )
+        for signal in (post_save, post_delete, node_moved):
+            signal.connect(
+                receivers.bump_navigation_generation,
+                dispatch_uid='conman.routes.bump_navigation_generation',
+            )
+        for signal in (post_save, post_delete):
+            signal.connect(
+                receivers.pin_to_primary,
+                dispatch_uid='conman.routes.pin_to_primary',
+            )
+        connection_created.connect(
+            receivers.register_url_hash,
+            dispatch_uid='conman.routes.register_url_hash',
+        )
+        request_started.connect(
+            receivers.note_request_started,
+            dispatch_uid='conman.routes.note_request_started',
+        )
+        request_finished.connect(
+            receivers.run_on_commit,
+            dispatch_uid='conman.routes.run_on_commit',
+        )
+
+        if RouteConfig.routes_prepared:
+            return
+        RouteConfig.routes_prepared = True
+
+        Route = self.get_model('Route')
+        Route.discover_subclasses()
+        models = apps.get_models()
+        registry.load(model for model in models if issubclass(model, Route))
@@ -0,0 +1,220 @@
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from .utils import url_hash
+
+
+ROOT_ERROR = 'Route can be a root, or have a slug, not both.'
+# Takes the next values from the pk sequence of a table, on PostgreSQL.
+SEQUENCE_PKS_SQL = (
+    'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)'
+)
+
+
+def set_pk(route, pk):
+    """Set the pk of `route`, and the pks of the tables of all its parent models."""
+    setattr(route, route._meta.pk.attname, pk)
+    for parent in route._meta.get_parent_list():
+        setattr(route, parent._meta.pk.attname, pk)
+
+
+def insert_rows(model, routes, using, batch_size=None, raw=False):
+    """
+    Insert the rows of `model`'s own table for `routes`, in batches.
+
+    With `raw`, values are inserted as they are, without `pre_save` (so fields
+    like `auto_now` keep their values).
+    """
+    fields = model._meta.local_concrete_fields
+    if batch_size is None:
+        batch_size = max(connections[using].ops.bulk_batch_size(fields, routes), 1)
+    for start in range(0, len(routes), batch_size):
+        batch = routes[start:start + batch_size]
+        model._base_manager._insert(batch, fields=fields, using=using, raw=raw)
+
+
+def insert_routes(routes, using, batch_size=None, raw=False):
+    """
+    Insert Routes that already have pks into the tables of all their models.
+
+    The tables of parent models are filled before those of their subclasses.
+    """
+    tables = {}
+    for route in routes:
+        route.pre_save_polymorphic()
+        lineage = [type(route)] + route._meta.get_parent_list()
+        for model in {model._meta.concrete_model for model in lineage}:
+            tables.setdefault(model, []).append(route)
+
+    models = sorted(tables, key=lambda model: len(model._meta.get_parent_list()))
+    for model in models:
+        insert_rows(model, tables[model], using, batch_size=batch_size, raw=raw)
+
+
+def pk_model(model):
+    """Get the model whose table allocates the pks of `model` and its parents."""
+    for model in [model] + model._meta.get_parent_list():
+        if not model._meta.pk.rel:
+            return model
+
+
+def uses_sequence(using):
+    """Check if pks can be reserved from a sequence. See `reserve_pks`."""
+    return connections[using].vendor == 'postgresql'
+
+
+def reserve_pks(model, count, using):
+    """
+    Reserve `count` new pks for rows of `model`, and return them.
+
+    On PostgreSQL, they are taken from the table's pk sequence, as a normal
+    INSERT would, so they are safe from other inserts, however many run at
+    once. Elsewhere, they follow the largest pk in use. Its row is locked (on
+    databases that support `select_for_update`), so that other inserts of
+    this kind wait for the transaction, but rows saved as usual may still take
+    the same pks in the meantime.
+    """
+    model = pk_model(model)
+    if uses_sequence(using):
+        opts = model._meta
+        params = [opts.db_table, opts.pk.column, count]
+        with connections[using].cursor() as cursor:
+            cursor.execute(SEQUENCE_PKS_SQL, params)
+            return [pk for pk, in cursor.fetchall()]
+
+    rows = model._base_manager.using(using).select_for_update().order_by('-pk')
+    max_pk = rows.values_list('pk', flat=True).first() or 0
+    return list(range(max_pk + 1, max_pk + 1 + count))
+
+
+def reset_sequence(model, using):
+    """Move the database's pk sequence for `model` past the pks in use."""
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def mark_saved(routes, using):
+    """
+    Leave inserted Routes as if they had been saved.
+
+    Saving them again then doesn't look like a move to MPTT, or a change of
+    url to `Route.save`. (See `MPTTModel.save`.)
+    """
+    for route in routes:
+        route._state.adding = False
+        route._state.db = using
+        route._mptt_saved = True
+        route._mptt_meta.update_mptt_cached_fields(route)
+        route.reset_originals()
+
+
+class TreeInsert:
+    """
+    Insert a tree of new Routes using batched INSERTs.
+
+    Django's `bulk_create` refuses models with parent models, because it can't
+    get the pks of the parent rows back to link the child rows to them. So pks
+    are reserved here in advance (see `reserve_pks`), and each table of each
+    model is filled in turn.
+
+    The url, host and MPTT fields of each Route are worked out in Python, in
+    a walk over the tree.
+    """
+    def __init__(self, manager, parent=None, batch_size=None):
+        """Prepare to insert Routes below `parent`, or as new trees if None."""
+        self.manager = manager
+        self.parent = parent
+        self.batch_size = batch_size
+        self.routes = []
+
+    def walk(self, tree):
+        """
+        Set up the url, host and tree fields of each Route in `tree`.
+
+        The tree is walked depth-first with a stack, rather than recursively,
+        so that it can be as deep as it likes.
+        """
+        next_tree_id = self.manager._get_next_tree_id()
+        parent = self.parent
+        if parent is not None:
+            position = parent.rght
+            tree_id = parent.tree_id
+
+        stack = [(parent, iter(tree))]
+        while stack:
+            parent, children = stack[-1]
+            try:
+                route, grandchildren = next(children)
+            except StopIteration:
+                stack.pop()
+                # The last stack entry is the parent of the whole tree.
+                if stack:
+                    parent.rght = position
+                    position += 1
+                continue
+
+            if parent is None:
+                if route.slug:
+                    raise ValueError(ROOT_ERROR)
+                route.url = '/'
+                route.level = 0
+                # Each root starts a tree of its own.
+                tree_id = next_tree_id
+                next_tree_id += 1
+                position = 1
+            else:
+                if not route.slug:
+                    raise ValueError(ROOT_ERROR)
+                route.url = '{}{}/'.format(parent.url, route.slug)
+                route.host = parent.host
+                route.level = parent.level + 1
+
+            route.url_hash = url_hash(route.url)
+            route.parent = parent
+            route.tree_id = tree_id
+            route.lft = position
+            position += 1
+            self.routes.append(route)
+            stack.append((route, iter(grandchildren)))
+
+    def allocate_pks(self):
+        """Give each Route one of the reserved pks, and its children its pk."""
+        pks = reserve_pks(self.manager.model, len(self.routes), self.manager.db)
+        # Parents come before their children in `routes`.
+        for route, pk in zip(self.routes, pks):
+            set_pk(route, pk)
+            if route.parent is not None:
+                route.parent_id = route.parent.pk
+
+    def run(self, tree):
+        """Insert the Routes in `tree`, and return them in tree order."""
+        with transaction.atomic(using=self.manager.db):
+            if self.parent is not None:
+                # Use fresh tree fields, as other Routes may have moved them.
+                self.parent = self.manager.non_polymorphic().get(pk=self.parent.pk)
+            self.walk(tree)
+            if not self.routes:
+                return []
+
+            self.allocate_pks()
+            for route in self.routes:
+                route.clean()
+
+            if self.parent is not None:
+                # Make room in the parent's tree, as `TreeManager.insert_node` does.
+                size = 2 * len(self.routes)
+                target = self.parent.rght - 1
+                self.manager._create_space(size, target, self.parent.tree_id)
+
+            using = self.manager.db
+            insert_routes(self.routes, using, batch_size=self.batch_size)
+            if not uses_sequence(using):
+                # Other databases may keep a sequence of their own (Oracle).
+                reset_sequence(self.manager.model, using)
+
+        mark_saved(self.routes, self.manager.db)
+        return self.routes
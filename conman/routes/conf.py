@@ -0,0 +1,39 @@
+from django.conf import settings
+
+
+DEFAULTS = {
+    # Alias of the cache shared by all processes serving Routes.
+    'CACHE': 'default',
+    # Rewrite descendants' urls in the background after a Route's url changes.
+    'DEFER_URL_REWRITES': False,
+    # How often (in milliseconds) each process checks for changes to Routes.
+    'GENERATION_CHECK_MS': 100,
+    # Serve a tree of Routes on each host, found by the request's hostname.
+    'MULTIPLE_HOSTS': False,
+    # How many unresolvable paths each process remembers, to 404 them quickly.
+    'NOT_FOUND_CACHE_SIZE': 0,
+    # Alias of a replica database to read Routes from while serving requests.
+    'READ_DATABASE': None,
+    # How long an editor reads from the primary after changing Routes.
+    'REPLICA_PIN_SECONDS': 10,
+    # Dotted path to a callable that has pending url rewrites run.
+    'REWRITE_EXECUTOR': None,
+    # Cache the responses of handlers that are `cacheable`.
+    'RESPONSE_CACHE': False,
+    # Default number of seconds to cache responses for.
+    'RESPONSE_CACHE_TIMEOUT': 300,
+    # Resolve Routes from an in-memory index of urls instead of the database.
+    'ROUTE_INDEX': False,
+    # How Routes are looked up in the database: 'url', 'hash', 'prefix' or 'auto'.
+    'ROUTE_LOOKUP': 'auto',
+}
+
+
+def get_setting(name):
+    """
+    Get a conman setting from the django settings, falling back to a default.
+
+    Settings are looked up with a `CONMAN_` prefix, so `get_setting('FOO')`
+    will return the value of `settings.CONMAN_FOO` if it has been set.
+    """
+    return getattr(settings, 'CONMAN_' + name, DEFAULTS[name])
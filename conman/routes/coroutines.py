@@ -0,0 +1,73 @@
+"""
+Helpers for routing requests with `asyncio` coroutines.
+
+Django's ORM is synchronous, so blocking work (such as database queries and
+synchronous views) is run in a thread pool, leaving the event loop free to
+serve other requests in the meantime.
+"""
+import asyncio
+import functools
+
+from django.db import close_old_connections
+
+
+# The `concurrent.futures.Executor` that blocking work is run in. None uses the
+# event loop's default `ThreadPoolExecutor`.
+executor = None
+
+
+def call_in_thread(func, *args, **kwargs):
+    """
+    Call `func` in a worker thread of the executor.
+
+    Each worker thread keeps its own database connection, so old connections
+    are closed around each call, as Django does around each request.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+@asyncio.coroutine
+def run_sync(func, *args, **kwargs):
+    """Run the blocking `func` in the executor, and wait for its result."""
+    loop = asyncio.get_event_loop()
+    call = functools.partial(call_in_thread, func, *args, **kwargs)
+    return (yield from loop.run_in_executor(executor, call))
+
+
+@asyncio.coroutine
+def call_view(view, *args, **kwargs):
+    """
+    Call a view, and wait for its response.
+
+    Views that are coroutine functions are run on the event loop. Others are
+    run in the executor. See `run_sync`.
+    """
+    if asyncio.iscoroutinefunction(view):
+        return (yield from view(*args, **kwargs))
+    return (yield from run_sync(view, *args, **kwargs))
+
+
+def run_coroutine(coroutine):
+    """
+    Run `coroutine` to completion from synchronous code, and return its result.
+
+    Lets the synchronous request path call views that are coroutine functions.
+    The coroutine runs in an event loop of its own, which is current while it
+    runs, as the calling thread may not have one. The thread's own loop (if
+    any) is current again afterwards.
+    """
+    try:
+        previous = asyncio.get_event_loop()
+    except RuntimeError:
+        previous = None
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(previous)
+        loop.close()
@@ -0,0 +1,170 @@
+import datetime
+import json
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from .bulk import insert_routes, reset_sequence, set_pk
+from .generation import route_generation
+
+
+CHUNK_SIZE = 1000
+
+
+class TreeEncoder(DjangoJSONEncoder):
+    """
+    Encode the values of fields as JSON.
+
+    Unlike `DjangoJSONEncoder`, datetimes keep their microseconds, so that the
+    ETags built from `Route.modified` are the same after a dump and load.
+    """
+    def default(self, o):
+        """Encode datetimes in full."""
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def model_label(model):
+    """Get the `app_label.model_name` label of a model."""
+    return '{}.{}'.format(model._meta.app_label, model._meta.model_name)
+
+
+def dumped_fields(model):
+    """
+    Get the fields of `model`, and all its parent models, that are dumped.
+
+    Pks and parent links are left out, as they are all equal to the `pk` of
+    the row. So is `polymorphic_ctype`, as content type ids vary between
+    databases. The model's label is dumped instead.
+    """
+    fields = []
+    for model in [model] + model._meta.get_parent_list():
+        for field in model._meta.local_concrete_fields:
+            if field.primary_key or field.name == 'polymorphic_ctype':
+                continue
+            fields.append(field)
+    return fields
+
+
+def check_dumpable(model):
+    """
+    Raise `ValueError` if `model` has fields that a dump would lose.
+
+    Only the model's own tables are dumped, so the many-to-many fields of a
+    Route subclass (or its parents) can't be.
+    """
+    fields = []
+    for model_class in [model] + model._meta.get_parent_list():
+        fields.extend(model_class._meta.local_many_to_many)
+    if fields:
+        msg = 'Routes of {} have many-to-many fields, which cannot be dumped: {}.'
+        names = ', '.join(sorted(field.name for field in fields))
+        raise ValueError(msg.format(model_label(model), names))
+
+
+def check_tree_dumpable():
+    """Raise `ValueError` if any Route in the tree can't be dumped."""
+    Route = apps.get_model('routes', 'Route')
+    routes = Route.objects.non_polymorphic().order_by()
+    ctype_ids = routes.values_list('polymorphic_ctype_id', flat=True).distinct()
+    for ctype_id in ctype_ids:
+        content_type = ContentType.objects.get_for_id(ctype_id)
+        check_dumpable(content_type.model_class())
+
+
+def iter_routes(chunk_size=CHUNK_SIZE):
+    """
+    Iterate over all Routes, as their subclasses, in tree order.
+
+    Routes are fetched `chunk_size` at a time, each chunk starting after the
+    tree position of the last, so memory use stays constant however large the
+    tree is. Each chunk is one query. See `RouteManager.select_subclasses`.
+    """
+    Route = apps.get_model('routes', 'Route')
+    routes = Route.objects.select_subclasses().order_by('tree_id', 'lft')
+    after = Q()
+    while True:
+        last = None
+        for last in routes.filter(after)[:chunk_size].iterator():
+            yield last.downcast()
+        if last is None:
+            return
+        same_tree = Q(tree_id=last.tree_id, lft__gt=last.lft)
+        after = Q(tree_id__gt=last.tree_id) | same_tree
+
+
+def dump_route(route):
+    """Get a JSON-friendly dict of the values of a Route's fields."""
+    fields = {}
+    for field in dumped_fields(type(route)):
+        fields[field.attname] = field.value_from_object(route)
+    return {'model': model_label(type(route)), 'pk': route.pk, 'fields': fields}
+
+
+def dump_tree(stream, chunk_size=CHUNK_SIZE):
+    """
+    Write all Routes to `stream` as newline-delimited JSON, in tree order.
+
+    Each line holds one Route, with the values of the fields of its subclass
+    and all their parents. Returns the number of Routes written.
+
+    Raises `ValueError`, before anything is written, if any Route can't be
+    dumped. See `check_dumpable`.
+    """
+    check_tree_dumpable()
+    count = 0
+    for route in iter_routes(chunk_size):
+        stream.write(json.dumps(dump_route(route), cls=TreeEncoder) + '\n')
+        count += 1
+    return count
+
+
+def load_route(row):
+    """Build an unsaved Route (subclass) from a row written by `dump_route`."""
+    model = apps.get_model(row['model'])
+    check_dumpable(model)
+    values = row['fields']
+    kwargs = {}
+    for field in dumped_fields(model):
+        kwargs[field.attname] = field.to_python(values[field.attname])
+    route = model(**kwargs)
+    set_pk(route, row['pk'])
+    return route
+
+
+def load_tree(stream, batch_size=CHUNK_SIZE, using=DEFAULT_DB_ALIAS):
+    """
+    Load Routes written by `dump_tree` from `stream`, in batches.
+
+    Rows are inserted as they were dumped, keeping their pks, urls and tree
+    fields, so Routes can only be loaded while there are no Routes at all.
+    Each batch of `batch_size` Routes is inserted into each of its models'
+    tables with one INSERT (or a few, for databases that limit their size).
+
+    Returns the number of Routes loaded.
+    """
+    Route = apps.get_model('routes', 'Route')
+    count = 0
+    with transaction.atomic(using=using):
+        if Route.objects.using(using).exists():
+            raise ValueError('Routes can only be loaded when there are none.')
+
+        batch = []
+        for line in stream:
+            if not line.strip():
+                continue
+            batch.append(load_route(json.loads(line)))
+            if len(batch) == batch_size:
+                insert_routes(batch, using, raw=True)
+                count += len(batch)
+                batch = []
+        insert_routes(batch, using, raw=True)
+        count += len(batch)
+        reset_sequence(Route, using)
+
+    route_generation.bump_on_commit(using)
+    return count
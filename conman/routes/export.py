@@ -0,0 +1,216 @@
+import functools
+import json
+import os
+from multiprocessing import Pool
+
+from django.apps import apps
+from django.db import connections
+from django.http import HttpRequest
+
+from .conf import get_setting
+
+
+# Records what was exported for each Route, for incremental re-exports.
+MANIFEST_NAME = '.conman-export.json'
+# nginx `map` files of redirected urls to their targets, one per status code.
+REDIRECT_MAP_NAME = 'redirects.{}.map'
+REDIRECT_STATUSES = (301, 302)
+
+
+def url_to_file(url):
+    """Get the path, relative to the output directory, of the file for `url`."""
+    return os.path.join(url.strip('/'), 'index.html')
+
+
+def make_request(url, host):
+    """Make a GET request for `url`, as if it were sent to `host`."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = url
+    request.META = {
+        'PATH_INFO': url,
+        'REQUEST_METHOD': 'GET',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+    }
+    return request
+
+
+def render_route(pk, host):
+    """
+    Render the Route with this pk, as it would be served to a GET request.
+
+    The Route handles a synthetic request for its own url, from `host`.
+    Returns the Route and its response, rendered if it is rendered lazily.
+    """
+    Route = apps.get_model('routes', 'Route')
+    route = Route.objects.select_subclasses().get(pk=pk).downcast()
+    request = make_request(route.url, host)
+    response = route.handle(request, route.url)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return route, response
+
+
+def export_route(output_dir, host, pk):
+    """
+    Render the Route with this pk, and write it to `output_dir`.
+
+    Successful responses are written to `index.html` in the directory of the
+    Route's url. Redirects are not written, but their target is kept in the
+    entry for the manifest that this returns.
+    """
+    route, response = render_route(pk, host)
+    entry = {
+        'url': route.url,
+        'modified': route.modified.isoformat(),
+        'status': response.status_code,
+    }
+    if response.status_code in REDIRECT_STATUSES:
+        entry['location'] = response['Location']
+    elif response.status_code == 200:
+        entry['file'] = url_to_file(route.url)
+        path = os.path.join(output_dir, entry['file'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            if response.streaming:
+                f.writelines(response.streaming_content)
+            else:
+                f.write(response.content)
+    return pk, entry
+
+
+def make_pool(processes):
+    """Start a pool of processes to export Routes with."""
+    # Forked processes must not share the database connections of this one.
+    for connection in connections.all():
+        connection.close()
+    return Pool(processes)
+
+
+class StaticExport:
+    """
+    Export the Route tree to a directory of static files.
+
+    Routes are exported in tree (`lft`) order, by rendering a synthetic GET
+    request for each url through `Route.handle`. Pages are written to
+    `<url>/index.html`, and redirects to nginx `map` files of url to target,
+    one for each redirect status code.
+
+    With `processes` greater than one, Routes are rendered in parallel by a
+    pool of that many processes.
+
+    With `incremental` set, a Route is only rendered again if its `modified`
+    time or url has changed since the last export. Routes with handlers that
+    are not `conditional` (like `RouteRedirect`) depend on more than their own
+    `modified` time, so they are always rendered again. Files of Routes that
+    have moved or been deleted are removed.
+
+    With `CONMAN_MULTIPLE_HOSTS`, only the Routes on `host` are exported.
+    """
+    def __init__(self, output_dir, host='localhost', processes=1, incremental=False):
+        """Set up an export to `output_dir`."""
+        self.output_dir = output_dir
+        self.host = host
+        self.processes = processes
+        self.incremental = incremental
+
+    @property
+    def manifest_path(self):
+        """The path of the manifest of the last export."""
+        return os.path.join(self.output_dir, MANIFEST_NAME)
+
+    def load_manifest(self):
+        """Load the manifest of the last export, or an empty one if there is none."""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_manifest(self, manifest):
+        """Save the manifest of this export."""
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def is_unchanged(self, route, entry):
+        """Check if `route` is unchanged since it was exported as `entry`."""
+        if entry is None or not route.get_handler().conditional:
+            return False
+        exported = (entry['url'], entry['modified'])
+        return exported == (route.url, route.modified.isoformat())
+
+    def render(self, pks):
+        """Export the Routes with these pks, and yield their manifest entries."""
+        export = functools.partial(export_route, self.output_dir, self.host)
+        if self.processes <= 1:
+            yield from map(export, pks)
+            return
+
+        with make_pool(self.processes) as pool:
+            yield from pool.imap(export, pks, chunksize=16)
+
+    def remove_file(self, entry):
+        """Remove the file written for a manifest entry, if any."""
+        try:
+            os.remove(os.path.join(self.output_dir, entry['file']))
+        except (KeyError, FileNotFoundError):
+            pass
+
+    def write_redirect_maps(self, manifest):
+        """Write the nginx `map` files of redirects from the manifest."""
+        for status in REDIRECT_STATUSES:
+            lines = []
+            for entry in manifest.values():
+                if entry['status'] == status:
+                    lines.append('{} {};\n'.format(entry['url'], entry['location']))
+            path = os.path.join(self.output_dir, REDIRECT_MAP_NAME.format(status))
+            with open(path, 'w') as f:
+                f.writelines(sorted(lines))
+
+    def run(self):
+        """
+        Export the Route tree.
+
+        Returns a dict of counts of Routes: `rendered`, `unchanged`, `removed`,
+        and `skipped` (those that responded with neither a page nor a redirect).
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        old_manifest = self.load_manifest() if self.incremental else {}
+        manifest = {}
+        pks = []
+
+        Route = apps.get_model('routes', 'Route')
+        routes = Route.objects.select_subclasses().order_by('tree_id', 'lft')
+        if get_setting('MULTIPLE_HOSTS'):
+            routes = routes.filter(host=self.host)
+        for route in routes.iterator():
+            route = route.downcast()
+            pk = str(route.pk)
+            entry = old_manifest.pop(pk, None)
+            if self.is_unchanged(route, entry):
+                manifest[pk] = entry
+                continue
+            if entry is not None and entry.get('file') != url_to_file(route.url):
+                self.remove_file(entry)
+            pks.append(route.pk)
+
+        # Anything left in the old manifest is no longer in the tree. Remove
+        # these files before rendering, in case another Route now has the url.
+        for entry in old_manifest.values():
+            self.remove_file(entry)
+
+        for pk, entry in self.render(pks):
+            manifest[str(pk)] = entry
+
+        self.write_redirect_maps(manifest)
+        self.save_manifest(manifest)
+
+        exported_statuses = (200,) + REDIRECT_STATUSES
+        skipped = [e for e in manifest.values() if e['status'] not in exported_statuses]
+        return {
+            'rendered': len(pks),
+            'unchanged': len(manifest) - len(pks),
+            'removed': len(old_manifest),
+            'skipped': len(skipped),
+        }
@@ -0,0 +1,97 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .conf import get_setting
+from .transactions import on_commit
+
+
+CACHE_KEY = 'conman.routes.generation'
+
+
+def new_generation():
+    """
+    Create a value to start counting generations from.
+
+    Based on the time, so that a counter that has been evicted from the cache
+    does not restart from a value that a process has already seen.
+    """
+    return int(time.time() * 1000)
+
+
+class Generation:
+    """
+    A counter of changes to the Route tree, shared between processes.
+
+    The counter is kept in the `CONMAN_CACHE` cache, so all processes using
+    that cache see the same value. Anything built from the Route tree can be
+    versioned by the counter's value, and rebuilt when the value changes.
+
+    Reading the counter from the cache is cheap but not free, so each process
+    only checks it once every `CONMAN_GENERATION_CHECK_MS` milliseconds at most.
+
+    Other counters can be kept under other cache `key`s.
+    """
+    def __init__(self, key=CACHE_KEY):
+        """Start with no known value, so that the cache is checked on first use."""
+        self.key = key
+        self.value = None
+        self.checked_at = None
+
+    def get_cache(self):
+        """Get the cache that the counter is kept in."""
+        return caches[get_setting('CACHE')]
+
+    def get(self):
+        """Return the current generation, checking the cache if it is due."""
+        now = time.monotonic()
+        interval = get_setting('GENERATION_CHECK_MS') / 1000
+        if self.checked_at is None or now - self.checked_at >= interval:
+            self.value = self.fetch()
+            self.checked_at = now
+        return self.value
+
+    def fetch(self):
+        """Read the current generation from the cache, creating it if missing."""
+        cache = self.get_cache()
+        value = cache.get(self.key)
+        if value is None:
+            value = new_generation()
+            cache.add(self.key, value, timeout=None)
+        return value
+
+    def bump(self):
+        """
+        Start a new generation.
+
+        This process sees the new generation immediately. Other processes see
+        it the next time they check the cache.
+        """
+        cache = self.get_cache()
+        try:
+            value = cache.incr(self.key)
+        except ValueError:
+            # The counter is not in the cache. Start it again.
+            value = new_generation()
+            cache.set(self.key, value, timeout=None)
+
+        self.value = value
+        self.checked_at = time.monotonic()
+        return value
+
+    def bump_on_commit(self, using=None):
+        """
+        Start a new generation now, and another once the transaction commits.
+
+        Until the transaction on the `using` database commits, other processes
+        that see the first bump may rebuild from the Route tree as it was. The
+        second makes them rebuild again once the changes can be seen. See
+        `transactions.on_commit`.
+        """
+        self.bump()
+        if transaction.get_connection(using).in_atomic_block:
+            on_commit(self.bump, using)
+
+
+route_generation = Generation()
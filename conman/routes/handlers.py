@@ -1,4 +1,21 @@
-from django.core.urlresolvers import resolve
+import asyncio
+
+from django.core.urlresolvers import RegexURLResolver, Resolver404
+from django.views.decorators.http import condition
+
+from .coroutines import call_view, run_coroutine
+from .instrumentation import timed
+from .utils import import_from_dotted_path
+
+
+def route_etag(request, route, **kwargs):
+    """Get an ETag for the content of `route`, from its pk and `modified` time."""
+    return '{}-{}'.format(route.pk, route.modified.isoformat())
+
+
+def route_last_modified(request, route, **kwargs):
+    """Get the time that `route` was last modified."""
+    return route.modified
 
 
 class BaseHandler:
@@ -6,21 +23,63 @@ class BaseHandler:
     Abstract base class for `Route` handlers.
 
     Subclasses should define a `urlconf` property as a dotted path. This will
-    be used to resolve a view when handling requests.
+    be used to resolve a view when handling requests. The resolver for it is
+    built along with the handler, at startup, rather than on each request.
 
     Views referenced in the `urlconf` will receive `route` as a kwarg, as
     well as the other args and kwargs they would expect given their urlpattern.
+
+    One instance of each handler is shared by every Route that uses it (see
+    `HandlerRegistry`), so the Route is passed in with each request rather
+    than stored on the handler.
+
+    Subclasses can set `cacheable` to allow their responses to be cached when
+    the `CONMAN_RESPONSE_CACHE` setting is enabled. Responses are cached for
+    `cache_timeout` seconds (or `CONMAN_RESPONSE_CACHE_TIMEOUT` if None), and
+    vary on the request headers named in `cache_vary`, as well as those in the
+    response's `Vary` header. Responses are cached before middleware sees
+    them, so `cache_vary` should list any headers that middleware adds to
+    `Vary`. See `ResponseCache`.
+
+    Handlers with `conditional` set answer conditional GETs themselves, from
+    the Route's `modified` time, so these requests skip the response cache.
+
+    Subclasses can set `route_records` if their views only need the `pk` and
+    `url` of the Route, to be passed a `RouteRecord` instead of the Route when
+    the `CONMAN_ROUTE_INDEX` setting is enabled. They can call `get_route()`
+    on it to fetch the Route if they need it after all. Records have no
+    `modified` time, so `conditional` is turned off for these handlers.
+
+    Views may be `asyncio` coroutine functions. `handle_async` waits for them
+    on the event loop, and runs other views in a thread pool. `handle` runs
+    them to completion in an event loop of their own.
     """
+    cacheable = False
+    cache_timeout = None
+    cache_vary = ()
+    conditional = False
+    route_records = False
+
     @classmethod
     def path(cls):
         """Get dotted-path of this class."""
         return '{}.{}'.format(cls.__module__, cls.__name__)
 
-    def __init__(self, route):
-        """Store the Route so that we know what we're handling."""
-        self.route = route
+    def __init__(self):
+        """Build the resolver for `urlconf`, and check `route_records`."""
+        if self.route_records:
+            self.conditional = False
+        self.resolver = self.build_resolver()
+
+    def build_resolver(self):
+        """Build a resolver for `urlconf`, and import its urlpatterns."""
+        resolver = RegexURLResolver(r'^/', self.urlconf)
+        # Accessing the urlpatterns is enough to import the urlconf.
+        resolver.url_patterns
+        return resolver
 
-    def handle(self, request, path):
+    @timed('handle')
+    def handle(self, route, request, path):
         """
         Resolve `path` to a view, and get it to handle the `request`.
 
@@ -28,8 +87,21 @@ class BaseHandler:
 
         Raises `django.core.urlresolvers.Resolver404` if `path` isn't found.
         """
-        view, args, kwargs = resolve(path, urlconf=self.urlconf)
-        return view(request, *args, route=self.route, **kwargs)
+        view, args, kwargs = self.resolver.resolve(path)
+        with timed('view'):
+            if asyncio.iscoroutinefunction(view):
+                return run_coroutine(view(request, *args, route=route, **kwargs))
+            return view(request, *args, route=route, **kwargs)
+
+    @asyncio.coroutine
+    def handle_async(self, route, request, path):
+        """
+        Resolve `path` to a view, and wait for it to handle the `request`.
+
+        A coroutine version of `handle`. See `coroutines.call_view`.
+        """
+        view, args, kwargs = self.resolver.resolve(path)
+        return (yield from call_view(view, request, *args, route=route, **kwargs))
 
 
 class UnboundViewMeta(type):
@@ -52,5 +124,85 @@ class SimpleHandler(BaseHandler, metaclass=UnboundViewMeta):
 
     Subclasses should define a view on the class as `view`. This will be
     called if the `path` passed to `handle` is `/`.
+
+    With only one path to match, no urlconf is needed to resolve it.
+
+    The response of `view` depends only on the Route, so conditional GETs are
+    answered with `304 Not Modified` from the Route's `modified` time, without
+    calling `view`. Subclasses whose response depends on other objects should
+    set `conditional` to False. Views that are coroutine functions are never
+    wrapped this way, as Django's `condition` decorator expects a response.
     """
-    urlconf = 'conman.routes.simple.urls'
+    conditional = True
+    view = None
+
+    def __init__(self):
+        """Wrap `view` to answer conditional GETs, if `conditional` is set."""
+        super().__init__()
+        self.conditional_view = self.view
+        if self.conditional and self.view is not None and not self.is_async():
+            wrap = condition(etag_func=route_etag, last_modified_func=route_last_modified)
+            self.conditional_view = wrap(self.view)
+
+    def build_resolver(self):
+        """Skip building a resolver, as `handle` does not need one."""
+        return None
+
+    def is_async(self):
+        """Check whether `view` is a coroutine function."""
+        return asyncio.iscoroutinefunction(self.view)
+
+    @timed('handle')
+    def handle(self, route, request, path):
+        """
+        Pass the `request` to `view` if `path` is `/`.
+
+        Raises `django.core.urlresolvers.Resolver404` for any other `path`.
+        """
+        if path != '/':
+            raise Resolver404({'path': path})
+        with timed('view'):
+            if self.is_async():
+                return run_coroutine(self.view(request, route=route))
+            return self.conditional_view(request, route=route)
+
+    @asyncio.coroutine
+    def handle_async(self, route, request, path):
+        """
+        Pass the `request` to `view` if `path` is `/`, and wait for the response.
+
+        A coroutine version of `handle`. See `coroutines.call_view`.
+        """
+        if path != '/':
+            raise Resolver404({'path': path})
+        return (yield from call_view(self.conditional_view, request, route=route))
+
+
+class HandlerRegistry:
+    """
+    Shares one instance of each handler class within the process.
+
+    Handlers are looked up by the dotted paths that Routes keep in `handler`.
+    Each path is imported and instantiated only once.
+    """
+    def __init__(self):
+        """Start with no handlers. They are loaded as they are needed."""
+        self.handlers = {}
+
+    def get(self, path):
+        """Get the instance of the handler class at the dotted `path`."""
+        try:
+            return self.handlers[path]
+        except KeyError:
+            handler = self.handlers[path] = import_from_dotted_path(path)()
+            return handler
+
+    def load(self, models):
+        """Load the handlers of the Route subclasses in `models` in advance."""
+        for model in models:
+            path = getattr(model, 'handler', None)
+            if path is not None:
+                self.get(path)
+
+
+registry = HandlerRegistry()
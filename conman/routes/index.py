@@ -0,0 +1,110 @@
+from django.apps import apps
+
+from .conf import get_setting
+from .generation import route_generation
+from .replicas import reading_from_primary
+
+
+# Key used to store a Route's details on the trie node for its url. Url
+# components are strings, so this can never clash with a child node.
+ROUTE = None
+
+
+def url_components(path):
+    """
+    Split a url path into its components.
+
+    Leading and trailing slashes are ignored, so '/a/b/' and '/a/b' both have
+    the components ['a', 'b']. The root path has no components.
+    """
+    path = path.strip('/')
+    if not path:
+        return []
+    return path.split('/')
+
+
+class RouteIndex:
+    """
+    A trie of Route urls, for finding the best match for a path without SQL.
+
+    Each node in the trie is a dict of url component to child node. A node
+    whose url belongs to a Route also stores a `(pk, url, polymorphic_ctype_id)`
+    tuple for that Route under the `ROUTE` key.
+
+    Matches are the same as those of `RouteManager.best_match_for_path`, which
+    looks for the longest of the urls returned by `split_path`.
+
+    With `CONMAN_MULTIPLE_HOSTS`, there is a separate trie for each host, so
+    a path only matches Routes on the host it was requested from.
+    """
+    def __init__(self, routes=(), version=None):
+        """Build the tries from `(pk, url, polymorphic_ctype_id[, host])` tuples."""
+        self.version = version
+        self.roots = {}
+        for route in routes:
+            self.add(*route)
+
+    @classmethod
+    def build(cls, version=None):
+        """Build an index of all Routes currently in the database."""
+        Route = apps.get_model('routes', 'Route')
+        fields = ['pk', 'url', 'polymorphic_ctype_id']
+        if get_setting('MULTIPLE_HOSTS'):
+            fields.append('host')
+        routes = Route.objects.values_list(*fields)
+        return cls(routes.iterator(), version=version)
+
+    def add(self, pk, url, polymorphic_ctype_id, host=None):
+        """Add the details of a Route to the trie for its host, at its url."""
+        node = self.roots.setdefault(host, {})
+        for component in url_components(url):
+            node = node.setdefault(component, {})
+        node[ROUTE] = (pk, url, polymorphic_ctype_id)
+
+    def best_match_for_path(self, path, host=None):
+        """
+        Return `(pk, url, polymorphic_ctype_id)` of the best match for a path.
+
+        Walks down the trie for `host` as far as the path allows, remembering
+        the last Route passed on the way.
+
+        Raises `LookupError` if no Route matches.
+        """
+        node = self.roots.get(host, {})
+        match = node.get(ROUTE)
+        for component in url_components(path):
+            try:
+                node = node[component]
+            except KeyError:
+                break
+            match = node.get(ROUTE, match)
+
+        if match is None:
+            raise LookupError(path)
+        return match
+
+
+class IndexCache:
+    """
+    Hold a `RouteIndex` for this process, and rebuild it when it is stale.
+
+    The index is stale when the generation of the Route tree has moved on
+    since it was built. It is always built from the primary database, as a
+    replica may not have caught up with the changes that moved it on.
+    """
+    def __init__(self, generation):
+        """Start with no index, so that one is built on first use."""
+        self.generation = generation
+        self.index = None
+
+    def get(self):
+        """Return an up-to-date `RouteIndex`, building it if necessary."""
+        version = self.generation.get()
+        index = self.index
+        if index is None or index.version != version:
+            with reading_from_primary():
+                index = self.index = RouteIndex.build(version=version)
+        return index
+
+
+route_index = IndexCache(route_generation)
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import ContextDecorator
+
+from django.db import connections
+
+from .signals import phase_timed
+
+
+Phase = namedtuple('Phase', ['name', 'duration', 'queries'])
+
+_local = threading.local()
+
+
+def count_queries():
+    """Count the queries logged so far by every database connection."""
+    return sum(len(connection.queries_log) for connection in connections.all())
+
+
+class Recorder:
+    """
+    Record the time taken, and queries made, by each phase of handling a request.
+
+    Phases are marked out with `timed`. Durations are in seconds. Queries are
+    counted on every database connection (such as the replica that Routes are
+    read from, see `replicas`), which log their queries while the Recorder is
+    active.
+    """
+    def __init__(self):
+        """Start with no phases."""
+        self.phases = []
+        self.stack = []
+        self.started = (time.perf_counter(), count_queries())
+
+    def begin(self, name):
+        """Note the time and query count at the start of a phase."""
+        self.stack.append((name, time.perf_counter(), count_queries()))
+
+    def end(self):
+        """Record the phase that began last, and send `phase_timed` for it."""
+        name, start, queries = self.stack.pop()
+        duration = time.perf_counter() - start
+        queries = count_queries() - queries
+        phase = Phase(name, duration, queries)
+        self.phases.append(phase)
+        phase_timed.send(sender=Recorder, phase=phase)
+
+    def total(self):
+        """Get a `total` Phase, covering all the time since the Recorder started."""
+        start, queries = self.started
+        duration = time.perf_counter() - start
+        return Phase('total', duration, count_queries() - queries)
+
+
+def start():
+    """Start recording phases on this thread, and return the new Recorder."""
+    # Drop any Recorder left over from a request that was never finished.
+    stop()
+    recorder = _local.recorder = Recorder()
+    _local.force_debug_cursor = []
+    for connection in connections.all():
+        _local.force_debug_cursor.append((connection, connection.force_debug_cursor))
+        connection.force_debug_cursor = True
+    return recorder
+
+
+def stop():
+    """Stop recording phases on this thread, and return the Recorder, if any."""
+    recorder = get_recorder()
+    if recorder is not None:
+        del _local.recorder
+        for connection, force_debug_cursor in _local.force_debug_cursor:
+            connection.force_debug_cursor = force_debug_cursor
+    return recorder
+
+
+def get_recorder():
+    """Get the active Recorder on this thread, if any."""
+    return getattr(_local, 'recorder', None)
+
+
+class timed(ContextDecorator):
+    """
+    Mark out a phase of handling a request, as a context manager or decorator.
+
+    Does nothing unless a Recorder has been started on this thread, such as by
+    `ServerTimingMiddleware`, so instrumented code costs next to nothing when
+    not being measured.
+    """
+    def __init__(self, name):
+        """Name the phase."""
+        self.name = name
+
+    def __enter__(self):
+        """Begin the phase, if recording."""
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.begin(self.name)
+
+    def __exit__(self, *exc_info):
+        """End the phase, if recording."""
+        recorder = get_recorder()
+        if recorder is not None:
+            recorder.end()
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...dump import dump_tree
+
+
+class Command(BaseCommand):
+    """Dump the Route tree as newline-delimited JSON."""
+    help = 'Write every Route, in tree order, as one line of JSON each.'
+
+    def add_arguments(self, parser):
+        """Add the output file."""
+        parser.add_argument(
+            'output',
+            nargs='?',
+            help='File to write to. Defaults to stdout.',
+        )
+
+    def dump_to_file(self, path):
+        """
+        Dump the tree to the file at `path`, and return the number of Routes.
+
+        The dump is written beside it, and only moved into its place once it is
+        complete, so a dump that fails leaves any earlier one at `path` intact.
+        """
+        partial = path + '.partial'
+        try:
+            with open(partial, 'w') as f:
+                count = dump_tree(f)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return count
+
+    def handle(self, *args, **options):
+        """Dump the tree to the output file, or stdout."""
+        try:
+            if options['output'] is None:
+                count = dump_tree(self.stdout)
+            else:
+                count = self.dump_to_file(options['output'])
+        except ValueError as e:
+            raise CommandError(e) from e
+        self.stderr.write('Dumped {} Routes.'.format(count))
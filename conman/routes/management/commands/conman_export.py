@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from ...export import StaticExport
+
+
+class Command(BaseCommand):
+    """Export the Route tree to a directory of static files."""
+    help = 'Render every Route to static files that can be served by nginx.'
+
+    def add_arguments(self, parser):
+        """Add the output directory, and options for the export."""
+        parser.add_argument('output_dir', help='Directory to write the files to.')
+        parser.add_argument(
+            '--host',
+            default='localhost',
+            help='Host name to render the Routes for.',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of processes to render Routes with.',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            default=False,
+            help='Only render Routes that have changed since the last export.',
+        )
+
+    def handle(self, *args, **options):
+        """Run the export, and report what it did."""
+        export = StaticExport(
+            options['output_dir'],
+            host=options['host'],
+            processes=options['processes'],
+            incremental=options['incremental'],
+        )
+        counts = export.run()
+        msg = 'Rendered {rendered}, unchanged {unchanged}, removed {removed}.'
+        self.stdout.write(msg.format(**counts))
+        if counts['skipped']:
+            msg = 'Skipped {skipped} Routes that were neither pages nor redirects.'
+            self.stderr.write(msg.format(**counts))
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...dump import load_tree
+
+
+class Command(BaseCommand):
+    """Load a Route tree written by `conman_dump`."""
+    help = 'Load Routes from newline-delimited JSON into an empty database.'
+
+    def add_arguments(self, parser):
+        """Add the input file."""
+        parser.add_argument(
+            'input',
+            nargs='?',
+            help='File to read from. Defaults to stdin.',
+        )
+
+    def handle(self, *args, **options):
+        """Load the tree from the input file, or stdin."""
+        try:
+            if options['input'] is None:
+                count = load_tree(sys.stdin)
+            else:
+                with open(options['input']) as f:
+                    count = load_tree(f)
+        except ValueError as e:
+            raise CommandError(e) from e
+        self.stdout.write('Loaded {} Routes.'.format(count))
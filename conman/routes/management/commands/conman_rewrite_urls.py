@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from ...rewrites import pending_rewrites, run_rewrite
+
+
+class Command(BaseCommand):
+    """Run the url rewrites that haven't finished, such as after a crash."""
+    help = 'Rewrite the urls of descendants of Routes whose urls have changed.'
+
+    def add_arguments(self, parser):
+        """Add an option to only report progress."""
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            default=False,
+            help='Report the progress of unfinished rewrites, without running them.',
+        )
+
+    def handle(self, *args, **options):
+        """Run (or report on) each unfinished rewrite, oldest first."""
+        rewrites = list(pending_rewrites())
+        if not rewrites:
+            self.stdout.write('No url rewrites to run.')
+        for rewrite in rewrites:
+            if options['status']:
+                self.stdout.write(str(rewrite))
+                continue
+            run_rewrite(rewrite)
+            self.stdout.write('Rewrote {} urls: {} -> {}'.format(
+                rewrite.done,
+                rewrite.old_url,
+                rewrite.new_url,
+            ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...sitemaps import SitemapWriter, URLS_PER_SITEMAP
+
+
+class Command(BaseCommand):
+    """Write sitemaps of the Route tree to a directory."""
+    help = 'Write sitemaps of every Route, and a sitemap index, to static files.'
+
+    def add_arguments(self, parser):
+        """Add the output directory, base url, and options for the sitemaps."""
+        parser.add_argument('output_dir', help='Directory to write the sitemaps to.')
+        parser.add_argument(
+            'base_url',
+            help='Scheme and host to make urls absolute with, e.g. https://example.com.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            default=False,
+            help='Compress the sitemaps (but not the index) with gzip.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=URLS_PER_SITEMAP,
+            help='Most urls to write to each sitemap, from 1 to {}.'.format(
+                URLS_PER_SITEMAP,
+            ),
+        )
+
+    def handle(self, *args, **options):
+        """Write the sitemaps, and report how many urls they hold."""
+        try:
+            writer = SitemapWriter(
+                options['output_dir'],
+                base_url=options['base_url'],
+                compress=options['gzip'],
+                limit=options['limit'],
+            )
+        except ValueError as e:
+            raise CommandError(e) from e
+        counts = writer.run()
+        self.stdout.write('Wrote {urls} urls to {sitemaps} sitemaps.'.format(**counts))
@@ -0,0 +1,67 @@
+import logging
+
+from . import instrumentation, replicas
+from .conf import get_setting
+
+
+logger = logging.getLogger('conman.routes.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Report the time taken by each phase of routing a request.
+
+    Phases are the Route lookup (`route`), getting its handler (`handler`), the
+    handler handling the request (`handle`), the view call within that (`view`),
+    and the `total` since this middleware saw the request (which includes the
+    rendering of any `TemplateResponse`). Each is added to the `Server-Timing`
+    header of the response, with its duration in milliseconds and the number of
+    queries it made, and logged to the `conman.routes.timing` logger at DEBUG.
+
+    The timings show how the server spends its time, so only install this
+    where that is not a concern.
+    """
+    def process_request(self, request):
+        """Start recording phases for this request."""
+        instrumentation.start()
+
+    def process_response(self, request, response):
+        """Add the recorded phases to the response, and log them."""
+        recorder = instrumentation.stop()
+        if recorder is None or not recorder.phases:
+            return response
+
+        timings = []
+        for phase in recorder.phases + [recorder.total()]:
+            timings.append('{};dur={:.3f};desc="{} queries"'.format(
+                phase.name, phase.duration * 1000, phase.queries,
+            ))
+            logger.debug(
+                '%s %s: %s took %.3fms with %d queries', request.method,
+                request.path, phase.name, phase.duration * 1000, phase.queries,
+            )
+        response['Server-Timing'] = ', '.join(timings)
+        return response
+
+
+class PinPrimaryMiddleware:
+    """
+    Keep an editor's reads on the primary database for a while after a write.
+
+    When a request saves or deletes Routes, a cookie is set on its response
+    for `CONMAN_REPLICA_PIN_SECONDS`. Requests that carry the cookie read from
+    the primary, so editors see their changes before they reach the replica.
+    See `replicas.ReplicaRouter`.
+    """
+    def process_request(self, request):
+        """Pin this request to the primary if the cookie is set."""
+        replicas.pop_write()
+        replicas.pin_to_primary(replicas.PIN_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        """Set the cookie if Routes were written, and stop pinning this thread."""
+        if replicas.pop_write():
+            max_age = get_setting('REPLICA_PIN_SECONDS')
+            response.set_cookie(replicas.PIN_COOKIE, '1', max_age=max_age)
+        replicas.pin_to_primary(False)
+        return response
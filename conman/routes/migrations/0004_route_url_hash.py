@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import models, migrations
+
+
+def set_url_hashes(apps, schema_editor):
+    """Hash the url of each Route, as `conman.routes.utils.url_hash` does."""
+    Route = apps.get_model('routes', 'Route')
+    for pk, url in Route.objects.values_list('pk', 'url'):
+        digest = hashlib.md5(url.encode('utf-8')).digest()
+        url_hash = int.from_bytes(digest[:8], 'big', signed=True)
+        Route.objects.filter(pk=pk).update(url_hash=url_hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0003_route_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='url_hash',
+            field=models.BigIntegerField(db_index=True, editable=False, default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_url_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0004_route_url_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UrlRewrite',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('old_url', models.TextField()),
+                ('new_url', models.TextField()),
+                ('total', models.PositiveIntegerField()),
+                ('done', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('route', models.ForeignKey(related_name='url_rewrites', to='routes.Route')),
+            ],
+        ),
+    ]
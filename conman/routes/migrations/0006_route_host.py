@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0005_urlrewrite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='host',
+            field=models.CharField(max_length=255, blank=True, default='', help_text='The hostname to serve this tree of Routes on, with CONMAN_MULTIPLE_HOSTS. Only set on Root Routes.'),
+        ),
+        migrations.AlterField(
+            model_name='route',
+            name='url',
+            field=models.TextField(db_index=True, editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='route',
+            unique_together=set([('parent', 'slug'), ('host', 'url')]),
+        ),
+    ]
@@ -1,5 +1,8 @@
+import asyncio
+
 from django.core import checks
-from django.db import models
+from django.db import connections, models
+from django.db.models import Case, Value, When
 from django.db.models.functions import Length
 from django.utils.translation import ugettext_lazy as _
 from polymorphic_tree.managers import PolymorphicMPTTModelManager
@@ -8,12 +11,59 @@ from polymorphic_tree.models import (
     PolymorphicTreeForeignKey,
 )
 
-from .utils import import_from_dotted_path, split_path
+from . import signals
+from .bulk import TreeInsert
+from .conf import get_setting
+from .coroutines import run_sync
+from .generation import route_generation
+from .handlers import registry
+from .index import route_index
+from .instrumentation import timed
+from .navigation import build_tree, navigation_cache
+from .records import RouteRecord
+from .replicas import reading_from_primary
+from .response_cache import response_cache
+from .rewrites import schedule_rewrites, start_rewrite
+from .transactions import atomic
+from .utils import (
+    can_hash_urls,
+    import_from_dotted_path,
+    replace_url_prefix,
+    split_path,
+    url_hash,
+    UrlHash,
+)
+
+
+# Selects every sub-path of the path parameter: each prefix ending in a slash.
+# A recursive CTE, rather than `generate_series`, so that SQLite can run it too.
+SUB_PATHS_SQL = '''
+    WITH RECURSIVE positions(i) AS (
+        SELECT 1
+        UNION ALL
+        SELECT i + 1 FROM positions WHERE i < LENGTH(CAST(%s AS TEXT))
+    )
+    SELECT SUBSTR(CAST(%s AS TEXT), 1, i) FROM positions
+    WHERE SUBSTR(CAST(%s AS TEXT), i, 1) = '/'
+'''
+
+
+def filter_host(routes, host):
+    """Filter a QuerySet of Routes to those on `host`, unless it is None."""
+    if host is None:
+        return routes
+    return routes.filter(host=host)
+
+
+# How many Routes to rehash with each UPDATE, where the database can't hash urls.
+# See `RouteManager.rewrite_urls`.
+REHASH_BATCH_SIZE = 500
 
 
 class RouteManager(PolymorphicMPTTModelManager):
     """Helpful methods for working with Routes."""
-    def best_match_for_path(self, path):
+    @timed('route')
+    def best_match_for_path(self, path, host=None):
         """
         Return the best match for a path.
 
@@ -27,17 +77,284 @@ class RouteManager(PolymorphicMPTTModelManager):
         the Route with url '/photos/album/'.
 
         Adapted from feincms/module/page/models.py:71 in FeinCMS v1.9.5.
+
+        Only Routes on `host` are matched, or those on any host if it is None.
+        See `utils.request_host`.
+
+        The Route is returned as an instance of its concrete subclass, fetched
+        in the same query. See `select_subclasses`.
+
+        When the `CONMAN_ROUTE_INDEX` setting is enabled, the match is found in
+        an in-memory index of Route urls instead. See `best_match_from_index`.
+        The `CONMAN_ROUTE_LOOKUP` setting picks how the database is searched
+        otherwise. See `get_lookup`.
         """
+        if get_setting('ROUTE_INDEX'):
+            return self.best_match_from_index(path, host)
+        lookup = self.get_lookup()
+        if lookup == 'hash':
+            return self.best_match_from_hashes(path, host)
+        if lookup == 'prefix':
+            return self.best_match_from_prefixes(path, host)
+
         paths = split_path(path)
 
-        qs = self.filter(url__in=paths)
+        qs = filter_host(self.select_subclasses(), host).filter(url__in=paths)
         qs = qs.annotate(length=Length('url')).order_by('-length')
         try:
-            return qs[0]
+            return qs[0].downcast()
+        except IndexError:
+            msg = 'No matching Route for URL. (Have you made a root Route?)'
+            raise self.model.DoesNotExist(msg)
+
+    @asyncio.coroutine
+    def best_match_for_path_async(self, path, host=None):
+        """
+        Return the best match for a path, without blocking the event loop.
+
+        A coroutine version of `best_match_for_path`, whose query is run in a
+        thread pool. See `coroutines.run_sync`.
+        """
+        return (yield from run_sync(self.best_match_for_path, path, host))
+
+    def get_lookup(self):
+        """
+        Get the name of the database lookup `best_match_for_path` should use.
+
+        `'auto'` (the default) picks `'prefix'` on PostgreSQL, whose planner
+        copes well with the subquery in `best_match_from_prefixes`, and `'url'`
+        everywhere else.
+        """
+        lookup = get_setting('ROUTE_LOOKUP')
+        if lookup != 'auto':
+            return lookup
+        if connections[self.db].vendor == 'postgresql':
+            return 'prefix'
+        return 'url'
+
+    def best_match_from_prefixes(self, path, host=None):
+        """
+        Return the best match for a path, letting the database split the path.
+
+        See `filter_sub_paths`.
+        """
+        qs = self.filter_sub_paths(filter_host(self.select_subclasses(), host), path)
+        try:
+            return qs[0].downcast()
         except IndexError:
             msg = 'No matching Route for URL. (Have you made a root Route?)'
             raise self.model.DoesNotExist(msg)
 
+    def filter_sub_paths(self, routes, path):
+        """
+        Filter `routes` to those at sub-paths of a path, the longest url first.
+
+        Rather than sending each sub-path from `split_path` as a parameter, the
+        path is sent once, and the database works out its sub-paths itself
+        (see `SUB_PATHS_SQL`), probing the `url` index for each. Paths must
+        start with a slash, as request paths do.
+        """
+        path = path.rstrip('/') + '/'
+        url_field = self.model._meta.get_field('url')
+        quote_name = connections[self.db].ops.quote_name
+        url_column = '{}.{}'.format(
+            quote_name(url_field.model._meta.db_table),
+            quote_name(url_field.column),
+        )
+
+        routes = routes.extra(
+            where=['{} IN ({})'.format(url_column, SUB_PATHS_SQL)],
+            params=[path, path, path],
+        )
+        return routes.annotate(length=Length('url')).order_by('-length')
+
+    def best_match_from_hashes(self, path, host=None):
+        """
+        Return the best match for a path, looked up by the hashes of its sub-paths.
+
+        Each candidate is a fixed-size integer probe of the `url_hash` index,
+        rather than a comparison of whole urls, and the longest match is the
+        deepest in the tree, so there is no need to sort by url length either.
+        The urls of the matches are checked, in case of a hash collision.
+        """
+        paths = split_path(path)
+        hashes = [url_hash(sub_path) for sub_path in paths]
+
+        qs = filter_host(self.select_subclasses(), host).filter(url_hash__in=hashes)
+        qs = qs.order_by('-level')
+        for route in qs:
+            if route.url in paths:
+                return route.downcast()
+        msg = 'No matching Route for URL. (Have you made a root Route?)'
+        raise self.model.DoesNotExist(msg)
+
+    def best_match_from_index(self, path, host=None):
+        """
+        Return the best match for a path, found using the in-memory Route index.
+
+        The index holds the pk and content type of each Route, so the only query
+        needed is to fetch the Route from its concrete model's table. (The first
+        lookup after the Route tree changes also rebuilds the index.)
+        """
+        return self.record_from_index(path, host).get_route()
+
+    @timed('route')
+    def best_record_for_path(self, path, host=None):
+        """
+        Return a RouteRecord for the best match for a path.
+
+        Like `best_match_for_path`, but without creating a Route. With the
+        `CONMAN_ROUTE_INDEX` setting enabled, no queries are needed at all.
+        Otherwise, the database is searched with the `CONMAN_ROUTE_LOOKUP`.
+        """
+        if get_setting('ROUTE_INDEX'):
+            return self.record_from_index(path, host)
+
+        routes = filter_host(self.non_polymorphic(), host)
+        fields = ('pk', 'url', 'polymorphic_ctype_id')
+        lookup = self.get_lookup()
+        if lookup == 'hash':
+            paths = split_path(path)
+            hashes = [url_hash(sub_path) for sub_path in paths]
+            qs = routes.filter(url_hash__in=hashes).order_by('-level')
+            # Check the urls, in case of a hash collision.
+            rows = [row for row in qs.values_list(*fields) if row[1] in paths]
+        else:
+            if lookup == 'prefix':
+                qs = self.filter_sub_paths(routes, path)
+            else:
+                qs = routes.filter(url__in=split_path(path))
+                qs = qs.annotate(length=Length('url')).order_by('-length')
+            rows = qs.values_list(*fields)[:1]
+        try:
+            return RouteRecord(*rows[0])
+        except IndexError:
+            msg = 'No matching Route for URL. (Have you made a root Route?)'
+            raise self.model.DoesNotExist(msg) from None
+
+    def record_from_index(self, path, host=None):
+        """Return a RouteRecord for the best match for a path in the Route index."""
+        try:
+            return RouteRecord(*route_index.get().best_match_for_path(path, host))
+        except LookupError:
+            msg = 'No matching Route for URL. (Have you made a root Route?)'
+            raise self.model.DoesNotExist(msg) from None
+
+    def bulk_create_tree(self, tree, parent=None, batch_size=None):
+        """
+        Insert a tree of new Routes, with far fewer queries than saving each.
+
+        `tree` is a nested structure of `(route, children)` pairs, where `route`
+        is an unsaved Route (or subclass), and `children` is another structure
+        like `tree`. Its roots become the last children of `parent`, or new
+        trees (and so Root Routes) if `parent` is None:
+
+            Route.objects.bulk_create_tree([
+                (Page(content='Home'), [
+                    (Page(slug='about', content='About'), []),
+                ]),
+            ])
+
+        The url and MPTT fields of each Route are worked out in Python, and each
+        model's table is filled with batched INSERTs. See `TreeInsert`.
+
+        Like `bulk_create`, this skips `save()` and the `post_save` signal,
+        though each Route is still passed through `clean()`. Pks are reserved
+        from the pk sequence on PostgreSQL, so other Routes can be created
+        while this runs. See `bulk.reserve_pks`.
+
+        Returns the new Routes in tree order.
+        """
+        routes = TreeInsert(self, parent=parent, batch_size=batch_size).run(tree)
+        if routes:
+            route_generation.bump_on_commit(self.db)
+        return routes
+
+    def rewrite_urls(self, routes, old_url, new_url, **values):
+        """
+        Replace `old_url` with `new_url` at the start of the urls of `routes`.
+
+        `routes` is a QuerySet of Routes whose urls all start with `old_url`.
+        Their `url_hash` is brought up to date, and any other field `values`
+        are set at the same time. Returns how many Routes were rewritten.
+
+        Where the database can hash urls (see `utils.can_hash_urls`), this is
+        a single UPDATE, which costs the same however many Routes there are.
+        Elsewhere, the urls are read, hashed in Python, and written
+        `REHASH_BATCH_SIZE` at a time, one UPDATE per batch.
+        """
+        new_urls = replace_url_prefix('url', old_url, new_url)
+        if can_hash_urls(connections[routes.db]):
+            return routes.update(url=new_urls, url_hash=UrlHash(new_urls), **values)
+
+        rows = list(routes.order_by('pk').values_list('pk', 'url'))
+        count = 0
+        for start in range(0, len(rows), REHASH_BATCH_SIZE):
+            batch = rows[start:start + REHASH_BATCH_SIZE]
+            hashes = Case(
+                *[
+                    When(pk=pk, then=Value(url_hash(new_url + url[len(old_url):])))
+                    for pk, url in batch
+                ],
+                output_field=models.BigIntegerField(),
+            )
+            pks = [pk for pk, url in batch]
+            batch_routes = routes.filter(pk__in=pks)
+            count += batch_routes.update(url=new_urls, url_hash=hashes, **values)
+        return count
+
+    def navigation(self, root, depth=None):
+        """
+        Get a tree of NavNodes for `root` and its descendants, for menus.
+
+        Only descendants up to `depth` levels below `root` are included, or all
+        of them if `depth` is None. The Routes are fetched in one query (see
+        `select_subclasses`), so each can give its own title (see
+        `Route.get_navigation_title`) without a query per level or subclass.
+
+        Trees are cached until the Route tree next changes. See
+        `NavigationCache`.
+        """
+        def build():
+            routes = self.select_subclasses().filter(
+                tree_id=root.tree_id,
+                lft__gte=root.lft,
+                rght__lte=root.rght,
+            )
+            if depth is not None:
+                routes = routes.filter(level__lte=root.level + depth)
+            routes = [route.downcast() for route in routes.order_by('lft')]
+            return build_tree(routes)
+        return navigation_cache.get(root, depth, build)
+
+    def select_subclasses(self):
+        """
+        Get a non-polymorphic QuerySet that also fetches the subclass of each Route.
+
+        Instead of the extra query per subclass that django-polymorphic uses,
+        the tables of all concrete subclasses are joined with `select_related`.
+        The lookups in each subclass's `routing_select_related` are followed too.
+
+        Call `downcast()` on the Routes this returns to get the subclass instances.
+        """
+        relations = self.model.get_subclass_relations()
+        return self.non_polymorphic().select_related(*relations)
+
+    def get_or_create(self, *args, **kwargs):
+        """
+        Get a Route, or create it, in a transaction of conman's own.
+
+        Django creates it in a transaction, so without this, the generation
+        bumps of the save would wait for a request. See `transactions.atomic`.
+        """
+        with atomic(using=self.db):
+            return super().get_or_create(*args, **kwargs)
+
+    def update_or_create(self, *args, **kwargs):
+        """Update a Route, or create it, in a transaction of conman's own."""
+        with atomic(using=self.db):
+            return super().update_or_create(*args, **kwargs)
+
 
 class Route(PolymorphicMPTTModel):
     """
@@ -47,6 +364,7 @@ class Route(PolymorphicMPTTModel):
     A Root Route has no parent and has an empty slug.
     A Child Route has a parent Route and a slug unique with the parent.
     A Child Route's url is built from its slug and its parent's url.
+    Each tree of Routes is served on the host of its Root Route.
     """
     parent = PolymorphicTreeForeignKey(
         'self',
@@ -60,12 +378,33 @@ class Route(PolymorphicMPTTModel):
         help_text=_('The url fragment at this point in the Route hierarchy.'),
     )
     # Cached location in tree. Reflects parent and slug on self and ancestors.
-    url = models.TextField(db_index=True, editable=False, unique=True)
+    url = models.TextField(db_index=True, editable=False)
+    # Set on Root Routes, and copied from them to their descendants.
+    host = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text=_(
+            'The hostname to serve this tree of Routes on, with '
+            'CONMAN_MULTIPLE_HOSTS. Only set on Root Routes.'
+        ),
+    )
+    # Hash of `url`, for looking Routes up by a small, fixed-size index key.
+    url_hash = models.BigIntegerField(db_index=True, editable=False)
+    # When this Route (or its url) last changed. Used for conditional requests.
+    modified = models.DateTimeField(auto_now=True)
 
     objects = RouteManager()
 
+    # Relations to fetch along with instances of this class when routing
+    # requests. Override on subclasses to save queries in their handlers.
+    routing_select_related = ()
+    # Whether instances of this class are listed by `conman_sitemap`.
+    in_sitemap = True
+
     class Meta:
-        unique_together = ('parent', 'slug')
+        # Urls only need to be unique on each host.
+        unique_together = (('parent', 'slug'), ('host', 'url'))
 
     def __init__(self, *args, **kwargs):
         """Cache the Route's parent_id and slug."""
@@ -76,22 +415,89 @@ class Route(PolymorphicMPTTModel):
         """Display a Route's class and url."""
         return '{} @ {}'.format(self.__class__.__name__, self.url)
 
+    @classmethod
+    def discover_subclasses(cls):
+        """
+        Find the concrete subclasses of this model and each of its subclasses.
+
+        Stores the name of the reverse relation from each model to each of its
+        direct subclasses as `subclass_links`, for use by `downcast`.
+
+        Called when the app is ready, once all models have been loaded.
+        """
+        links = []
+        for subclass in cls.__subclasses__():
+            if subclass._meta.proxy:
+                continue
+            parent_link = subclass._meta.parents[cls]
+            links.append(parent_link.related_query_name())
+            subclass.discover_subclasses()
+        cls.subclass_links = links
+
+    @classmethod
+    def get_subclass_links(cls):
+        """
+        Get the reverse relations from this model to its direct subclasses.
+
+        Models that have not been through `discover_subclasses` have none.
+        """
+        return vars(cls).get('subclass_links', [])
+
+    @classmethod
+    def get_subclass_relations(cls):
+        """Get `select_related` lookups that fetch all subclasses of this model."""
+        relations = []
+        for name in cls.get_subclass_links():
+            subclass = cls._meta.get_field(name).related_model
+            relations.append(name)
+            for relation in subclass.routing_select_related:
+                relations.append('{}__{}'.format(name, relation))
+            for relation in subclass.get_subclass_relations():
+                relations.append('{}__{}'.format(name, relation))
+        return relations
+
+    def downcast(self):
+        """
+        Get this Route as an instance of its concrete subclass.
+
+        Free of queries for Routes from `RouteManager.select_subclasses`. Other
+        Routes are downcast by django-polymorphic instead.
+        """
+        for name in self.get_subclass_links():
+            # django-polymorphic replaces the subclass accessors with ones that
+            # always query, so look in the cache `select_related` fills instead.
+            cache_name = self._meta.get_field(name).get_cache_name()
+            if not hasattr(self, cache_name):
+                return self.get_real_instance()
+            subclass_instance = getattr(self, cache_name)
+            if subclass_instance is not None:
+                return subclass_instance.downcast()
+        return self
+
     def get_handler_class(self):
         """Import a class from the python path string in `self.handler`."""
         return import_from_dotted_path(self.handler)
 
+    def get_navigation_title(self):
+        """
+        Get the title to show for this Route in navigation. See `navigation`.
+
+        Defaults to the slug. Override on subclasses to use a field of their own.
+        """
+        return self.slug
+
+    def for_handler(self, handler):
+        """Get this Route, to pass to `handler`. See `RouteRecord.for_handler`."""
+        return self
+
+    @timed('handler')
     def get_handler(self):
         """
-        Get an instance of the handler for this Route instance.
+        Get the instance of the handler for this Route's class.
 
-        Multiple calls to this method (on the same instance of Route) will
-        return the same instance of handler.
+        The same instance is shared by all Routes with the same `handler`.
         """
-        try:
-            return self._handler
-        except AttributeError:
-            self._handler = self.get_handler_class()(self)
-            return self._handler
+        return registry.get(self.handler)
 
     def handle(self, request, path):
         """
@@ -99,13 +505,33 @@ class Route(PolymorphicMPTTModel):
 
         The path of this route is chopped off the url to save the handler from
         needing to deal with it. If it really needs it, it will be able to
-        derive it from the route (self) that is passed to it on instantiation.
+        derive it from the route (self) that is passed to it with the request.
+
+        Responses from `cacheable` handlers may come from the response cache.
         """
         handler = self.get_handler()
         # Strip the route url from the rest of the path
         path = path[len(self.url) - 1:]
         # Deal with the request
-        return handler.handle(request, path)
+        if response_cache.can_cache(handler, request):
+            return response_cache.handle(handler, self, request, path)
+        return handler.handle(self, request, path)
+
+    @asyncio.coroutine
+    def handle_async(self, request, path):
+        """
+        Delegate handling the request to the handler, and wait for the response.
+
+        A coroutine version of `handle`. Handlers without a `handle_async`
+        method, and responses from the response cache, are handled by `handle`
+        in a thread pool. See `coroutines.run_sync`.
+        """
+        handler = self.get_handler()
+        handle_async = getattr(handler, 'handle_async', None)
+        if handle_async is None or response_cache.can_cache(handler, request):
+            return (yield from run_sync(self.handle, request, path))
+        path = path[len(self.url) - 1:]
+        return (yield from handle_async(self, request, path))
 
     def reset_originals(self):
         """
@@ -115,14 +541,42 @@ class Route(PolymorphicMPTTModel):
         """
         self._original_parent_id = self.parent_id
         self._original_slug = self.slug
+        self._original_host = self.host
+
+    def rewrite_descendant_urls(self, old_url):
+        """
+        Replace `old_url` with this Route's url at the start of descendants' urls.
+
+        Rewrites all descendants in a single UPDATE, rather than saving each in
+        turn. A descendant's url is always made of its ancestors' slugs, so this
+        gives the same urls as rebuilding them from the slugs would.
 
+        The descendants are marked as modified at the same time as this Route,
+        moved to its host, and their `url_hash` is brought up to date. See
+        `RouteManager.rewrite_urls`.
+        """
+        Route.objects.rewrite_urls(
+            self.get_descendants(),
+            old_url,
+            self.url,
+            host=self.host,
+            modified=self.modified,
+        )
+
+    @reading_from_primary()
     def save(self, *args, **kwargs):
         """
         Update the `url` attribute of this route and all descendants.
 
-        Quite expensive when called with a route high up in the tree.
+        Quite expensive when called with a route high up in the tree, though
+        the descendants are all updated in one query. See
+        `rewrite_descendant_urls`. With `CONMAN_DEFER_URL_REWRITES`, they are
+        updated in the background instead. See `rewrites`.
 
         Adapted from feincms/module/page/models.py:248 in FeinCMS v1.9.5.
+
+        Always reads from the primary database, as the urls of the parent and
+        descendants must be up to date. See `replicas`.
         """
         is_root = self.parent_id is None
         has_slug = bool(self.slug)
@@ -131,37 +585,80 @@ class Route(PolymorphicMPTTModel):
         if is_root == has_slug:
             raise ValueError('Route can be a root, or have a slug, not both.')
 
-        def make_url(parent_url, slug):
-            return '{}{}/'.format(parent_url, slug)
-
         parent_changed = self._original_parent_id != self.parent_id
         slug_changed = self._original_slug != self.slug
-        url_changed = parent_changed or slug_changed or not self.url
-
-        if url_changed:
-            self.url = '/' if is_root else make_url(self.parent.url, self.slug)
-
-        super().save(*args, **kwargs)
-        self.reset_originals()
-
-        # If the URL changed we need to update all descendants to
-        # reflect the changes. Since this is a very expensive operation
-        # on large sites we'll check whether our `url` actually changed
-        # or if the updates weren't navigation related:
+        host_changed = self._original_host != self.host
+
+        # Only Root Routes choose their host. Others take their parent's, which
+        # is only fetched if the Route is new or has moved (or its host was set).
+        if not is_root and (parent_changed or host_changed or not self.url):
+            self.host = self.parent.host
+            host_changed = self._original_host != self.host
+        url_changed = parent_changed or slug_changed or host_changed or not self.url
+
+        # If the URL changed we need to update all descendants to reflect the
+        # changes. Since this is an expensive operation on large sites we'll
+        # check whether our `url` actually changed or if the updates weren't
+        # navigation related:
         if not url_changed:
+            super().save(*args, **kwargs)
+            self.reset_originals()
             return
 
-        routes = self.get_descendants().order_by('lft')
-
-        cached_urls = {self.id: self.url}
-        for route in routes:
-            parent_path = cached_urls[route.parent_id]
-            route.url = cached_urls[route.id] = make_url(parent_path, route.slug)
+        old_url = self.url
+        if is_root:
+            self.url = '/'
+        else:
+            self.url = '{}{}/'.format(self.parent.url, self.slug)
+        self.url_hash = url_hash(self.url)
+
+        rewrite = None
+        # Post-save receivers bump generations on commit. See `transactions`.
+        with atomic():
+            super().save(*args, **kwargs)
+            # A new Route has no descendants to update.
+            if old_url:
+                # A Root Route moved to another host keeps its url, but
+                # deferred rewrites find descendants by their old url, so
+                # that is always done here.
+                defer = get_setting('DEFER_URL_REWRITES') and old_url != self.url
+                if defer and not self.is_leaf_node():
+                    # Redirects to the descendants follow them as they are
+                    # rewritten. See `rewrites.rewrite_chunk`.
+                    rewrite = start_rewrite(self, old_url)
+                    signals.urls_rewritten.send(
+                        sender=type(self),
+                        route=self,
+                        old_url=old_url,
+                        new_url=self.url,
+                        urls=[old_url],
+                    )
+                else:
+                    self.rewrite_descendant_urls(old_url)
+                    signals.url_changed.send(
+                        sender=type(self),
+                        route=self,
+                        old_url=old_url,
+                    )
+        self.reset_originals()
 
-            # Skip this logic on save so we do not recurse.
-            super(Route, route).save()
+        # Let every process know that the Route tree has changed.
+        route_generation.bump_on_commit(self._state.db)
+        if rewrite is not None:
+            schedule_rewrites()
     save.alters_data = True
 
+    def delete(self, *args, **kwargs):
+        """
+        Delete the Route and its descendants, in a transaction of conman's own.
+
+        So the post-delete receivers' second generation bumps happen as soon as
+        it commits, even outside a request. See `transactions.atomic`.
+        """
+        with atomic():
+            super().delete(*args, **kwargs)
+    delete.alters_data = True
+
     @classmethod
     def check(cls, **kwargs):
         """Check that the `handler` attribute exists."""
@@ -173,3 +670,38 @@ class Route(PolymorphicMPTTModel):
                 obj=cls,
             ))
         return errors
+
+
+class UrlRewrite(models.Model):
+    """
+    A rewrite of the urls of a Route's descendants, run in the background.
+
+    Records the url the descendants' urls start with, and what to replace it
+    with, and how far the rewrite has got. See `conman.routes.rewrites`.
+    """
+    route = models.ForeignKey(Route, related_name='url_rewrites')
+    old_url = models.TextField()
+    new_url = models.TextField()
+    # How many descendants there were to rewrite, and how many have been.
+    total = models.PositiveIntegerField()
+    done = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        """Display the urls being rewritten, and the progress made."""
+        return '{} -> {} ({:.0%})'.format(self.old_url, self.new_url, self.progress)
+
+    @property
+    def progress(self):
+        """How much of the rewrite is done, from 0 to 1."""
+        if self.finished is not None or not self.total:
+            return 1
+        # Descendants added since the rewrite started may take it past `total`.
+        return min(self.done / self.total, 1)
+
+    def rewrite_url(self, url):
+        """Get `url` as it will be once this rewrite has run."""
+        if url.startswith(self.old_url):
+            return self.new_url + url[len(self.old_url):]
+        return url
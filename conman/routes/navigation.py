@@ -0,0 +1,82 @@
+from collections import defaultdict, namedtuple
+
+from django.apps import apps
+from django.core.cache import caches
+
+from .conf import get_setting
+from .generation import Generation, route_generation
+
+
+NAVIGATION_KEY = 'conman.routes.navigation.{}.{}.{}.{}'
+
+# Counts changes to any Route, such as to its title or its place among its
+# siblings, which change navigation trees but not urls.
+navigation_generation = Generation('conman.routes.navigation.generation')
+
+NavNode = namedtuple('NavNode', ['url', 'title', 'level', 'children'])
+NavNode.__doc__ = """
+A Route in a navigation tree, as built by `RouteManager.navigation`.
+
+`children` is a tuple of the NavNodes below this one, in tree order.
+"""
+
+
+def build_tree(routes):
+    """
+    Build a tree of NavNodes from a subtree of Routes in tree order.
+
+    The first Route is the root of the subtree, and its NavNode is returned.
+    Working back from the last Route, each Route's children are complete by
+    the time it is reached, so each NavNode can be built whole.
+
+    Raises `Route.DoesNotExist` if there are no Routes, as when the root has
+    been deleted.
+    """
+    if not routes:
+        Route = apps.get_model('routes', 'Route')
+        raise Route.DoesNotExist('No Routes to build a navigation tree from.')
+    children = defaultdict(list)
+    for route in reversed(routes):
+        node = NavNode(
+            url=route.url,
+            title=route.get_navigation_title(),
+            level=route.level,
+            children=tuple(reversed(children.pop(route.pk, []))),
+        )
+        children[route.parent_id].append(node)
+    return node
+
+
+class NavigationCache:
+    """
+    Cache navigation trees, keyed by their root, depth and the generations.
+
+    Navigation trees are rebuilt once the Route tree has changed, such as when
+    `Route.save` changes urls (see `route_generation`), and once any Route is
+    saved, moved or deleted (see `navigation_generation`).
+    """
+    def get_cache(self):
+        """Get the cache that navigation trees are kept in."""
+        return caches[get_setting('CACHE')]
+
+    def make_key(self, root, depth):
+        """Make the key to cache the tree below `root` under."""
+        return NAVIGATION_KEY.format(
+            route_generation.get(),
+            navigation_generation.get(),
+            root.pk,
+            depth,
+        )
+
+    def get(self, root, depth, build):
+        """Get the tree below `root` from the cache, or from `build()`."""
+        cache = self.get_cache()
+        key = self.make_key(root, depth)
+        tree = cache.get(key)
+        if tree is None:
+            tree = build()
+            cache.set(key, tree)
+        return tree
+
+
+navigation_cache = NavigationCache()
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+from .conf import get_setting
+from .generation import route_generation
+
+
+class NotFoundCache:
+    """
+    Remember, in this process, the paths that no Route could handle.
+
+    Requests for these paths can then be answered with a 404 straight away,
+    without finding a Route or resolving the path in its handler, so junk
+    requests (such as from bots) cost no queries.
+
+    Paths are kept along with the host they were requested on (see
+    `route_router`), as another host's Routes may handle them.
+
+    Holds the `CONMAN_NOT_FOUND_CACHE_SIZE` most recently used paths at most,
+    and is disabled when that is 0. Cleared whenever the generation of the
+    Route tree moves on, as new Routes may handle any of the paths.
+    """
+    def __init__(self, generation):
+        """Start with no paths."""
+        self.generation = generation
+        self.version = None
+        self.paths = OrderedDict()
+
+    def get_paths(self):
+        """Get the remembered paths, forgetting them if the Route tree has changed."""
+        version = self.generation.get()
+        if version != self.version:
+            self.paths = OrderedDict()
+            self.version = version
+        return self.paths
+
+    def __contains__(self, path):
+        """Check whether `path` is known to be not found."""
+        if not get_setting('NOT_FOUND_CACHE_SIZE'):
+            return False
+        paths = self.get_paths()
+        try:
+            paths.move_to_end(path)
+        except KeyError:
+            # Not remembered, or forgotten by another thread meanwhile.
+            return False
+        return True
+
+    def add(self, path):
+        """Remember that `path` was not found, forgetting the oldest path if full."""
+        size = get_setting('NOT_FOUND_CACHE_SIZE')
+        if not size:
+            return
+        paths = self.get_paths()
+        paths[path] = True
+        while len(paths) > size:
+            try:
+                paths.popitem(last=False)
+            except KeyError:
+                # Emptied by another thread meanwhile.
+                break
+
+
+not_found_cache = NotFoundCache(route_generation)
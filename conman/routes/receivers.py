@@ -0,0 +1,52 @@
+from django.apps import apps
+
+from .generation import route_generation
+from .navigation import navigation_generation
+from .replicas import record_write
+from .response_cache import response_cache
+from .transactions import finish_request, start_request
+from .utils import url_hash
+
+
+def bump_route_generation(sender, instance, using, **kwargs):
+    """Start a new generation of the Route tree when a Route is deleted."""
+    Route = apps.get_model('routes', 'Route')
+    if isinstance(instance, Route):
+        route_generation.bump_on_commit(using)
+
+
+def bump_navigation_generation(sender, instance, **kwargs):
+    """Rebuild navigation trees when a Route is saved, moved or deleted."""
+    Route = apps.get_model('routes', 'Route')
+    if isinstance(instance, Route):
+        navigation_generation.bump_on_commit(instance._state.db)
+
+
+def bump_route_version(sender, instance, **kwargs):
+    """Start a new content version of a Route when it is saved."""
+    Route = apps.get_model('routes', 'Route')
+    if isinstance(instance, Route):
+        response_cache.bump_version(instance.pk)
+
+
+def pin_to_primary(sender, instance, **kwargs):
+    """Read from the primary after a Route is saved or deleted. See `replicas`."""
+    Route = apps.get_model('routes', 'Route')
+    if isinstance(instance, Route):
+        record_write()
+
+
+def register_url_hash(sender, connection, **kwargs):
+    """Let SQLite compute url hashes, with `utils.UrlHash`."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('conman_url_hash', 1, url_hash)
+
+
+def note_request_started(sender, **kwargs):
+    """Note that a request has started. See `transactions`."""
+    start_request()
+
+
+def run_on_commit(sender, **kwargs):
+    """Run what was waiting on the request's transactions, now it has finished."""
+    finish_request()
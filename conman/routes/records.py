@@ -0,0 +1,90 @@
+import asyncio
+
+from django.contrib.contenttypes.models import ContentType
+
+from .coroutines import run_sync
+from .handlers import registry
+from .instrumentation import timed
+from .response_cache import response_cache
+
+
+class RouteRecord:
+    """
+    The few details of a Route needed to route a request to it.
+
+    Far cheaper to create than a Route, which is a polymorphic MPTT model, so
+    used when routing requests with the `CONMAN_ROUTE_INDEX` setting enabled.
+    The Route itself is only fetched if its handler needs it. See `handle`.
+
+    Has the same `handle`, `handle_async` and `get_handler` methods as Route.
+    """
+    __slots__ = ('pk', 'url', 'polymorphic_ctype_id', '_route')
+
+    def __init__(self, pk, url, polymorphic_ctype_id):
+        """Store the details of the Route."""
+        self.pk = pk
+        self.url = url
+        self.polymorphic_ctype_id = polymorphic_ctype_id
+        self._route = None
+
+    def __repr__(self):
+        """Display the record's pk and url."""
+        return '<RouteRecord {} @ {}>'.format(self.pk, self.url)
+
+    def get_model(self):
+        """Get the concrete model of the Route. Content types are cached by Django."""
+        return ContentType.objects.get_for_id(self.polymorphic_ctype_id).model_class()
+
+    def get_route(self):
+        """
+        Get the Route, as an instance of its concrete model.
+
+        Fetched with one query the first time, then kept on the record.
+        """
+        if self._route is None:
+            manager = self.get_model()._default_manager
+            self._route = manager.select_subclasses().get(pk=self.pk).downcast()
+        return self._route
+
+    def for_handler(self, handler):
+        """Get this record, or the Route if `handler` does not take records."""
+        if handler.route_records:
+            return self
+        return self.get_route()
+
+    @timed('handler')
+    def get_handler(self):
+        """Get the instance of the handler for the Route's model."""
+        return registry.get(self.get_model().handler)
+
+    def handle(self, request, path):
+        """
+        Delegate handling the request to the handler, as `Route.handle` does.
+
+        Handlers that set `route_records` are passed this record. Others are
+        passed the Route, unless the response comes from the response cache.
+        """
+        handler = self.get_handler()
+        path = path[len(self.url) - 1:]
+        if response_cache.can_cache(handler, request):
+            return response_cache.handle(handler, self, request, path)
+        return handler.handle(self.for_handler(handler), request, path)
+
+    @asyncio.coroutine
+    def handle_async(self, request, path):
+        """
+        Delegate handling the request to the handler, as `Route.handle_async` does.
+
+        If the handler doesn't take records, the Route is fetched in the thread
+        pool, before it is passed to the handler's `handle_async`.
+        """
+        handler = self.get_handler()
+        handle_async = getattr(handler, 'handle_async', None)
+        if handle_async is None or response_cache.can_cache(handler, request):
+            return (yield from run_sync(self.handle, request, path))
+        if handler.route_records:
+            route = self
+        else:
+            route = yield from run_sync(self.get_route)
+        path = path[len(self.url) - 1:]
+        return (yield from handle_async(route, request, path))
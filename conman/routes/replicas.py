@@ -0,0 +1,96 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .conf import get_setting
+
+
+# Set on responses to requests that changed Routes. See `PinPrimaryMiddleware`.
+PIN_COOKIE = 'conman_pin_primary'
+
+_local = threading.local()
+
+
+@contextmanager
+def reading_from_replica():
+    """
+    Send reads on this thread to the `CONMAN_READ_DATABASE` replica, if set.
+
+    Used by `route_router` while it finds a Route and renders its response.
+    Reads go to the primary as usual outside this, and whenever the thread is
+    pinned to the primary. See `ReplicaRouter`.
+    """
+    previous = getattr(_local, 'replica', False)
+    _local.replica = True
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+@contextmanager
+def reading_from_primary():
+    """Send reads on this thread to the primary, even within `reading_from_replica`."""
+    previous = getattr(_local, 'replica', False)
+    _local.replica = False
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def pin_to_primary(pinned=True):
+    """Send all reads on this thread to the primary (or stop, if not `pinned`)."""
+    _local.pinned = pinned
+
+
+def record_write():
+    """
+    Note that Routes were written on this thread, and pin it to the primary.
+
+    Called when Routes are saved or deleted, so that reads that follow the
+    write see it, even before it reaches the replica.
+    """
+    _local.written = True
+    pin_to_primary()
+
+
+def pop_write():
+    """Check whether Routes were written on this thread, and forget that they were."""
+    written = getattr(_local, 'written', False)
+    _local.written = False
+    return written
+
+
+def get_read_database():
+    """Get the alias of the database to read from, or None for the primary."""
+    if getattr(_local, 'pinned', False) or not getattr(_local, 'replica', False):
+        return None
+    return get_setting('READ_DATABASE')
+
+
+class ReplicaRouter:
+    """
+    Route reads within `reading_from_replica` to the `CONMAN_READ_DATABASE`.
+
+    Add to `DATABASE_ROUTERS` to read Routes from a replica while serving
+    requests. Writes of instances read from the replica go to the default
+    database. Other writes, and everything else, are left to the other routers
+    (or the default database).
+    """
+    def db_for_read(self, model, **hints):
+        """Read from the replica while serving requests, unless pinned."""
+        return get_read_database()
+
+    def db_for_write(self, model, **hints):
+        """
+        Write instances read from the replica to the primary instead.
+
+        Django would otherwise save them back to the database they came from.
+        """
+        instance = hints.get('instance')
+        replica = get_setting('READ_DATABASE')
+        if replica is not None and instance is not None and instance._state.db == replica:
+            return DEFAULT_DB_ALIAS
+        return None
@@ -0,0 +1,152 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, router
+from django.utils.cache import get_cache_key, learn_cache_key, patch_vary_headers
+
+from .conf import get_setting
+from .generation import new_generation, route_generation
+from .replicas import get_read_database, reading_from_primary
+
+
+VERSION_KEY = 'conman.routes.version.{}'
+RESPONSE_PREFIX = 'conman.routes.response.{}.{}.{}.{}'
+CONDITIONAL_HEADERS = ('HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_NONE_MATCH')
+
+
+class ResponseCache:
+    """
+    Cache the responses of handlers that declare themselves `cacheable`.
+
+    Responses are cached by the pk of their Route, the path within it, the
+    request's url, and its values for the headers the response varies on. Keys
+    also include a version for the Route, bumped whenever it is saved, and the
+    generation of the Route tree, so cached responses are never served after
+    either changes.
+
+    Requests from people with a session, or who are logged in, are not cached,
+    nor are responses that used the session or a CSRF token.
+
+    Only used when the `CONMAN_RESPONSE_CACHE` setting is enabled.
+    """
+    def get_cache(self):
+        """Get the cache that responses are kept in."""
+        return caches[get_setting('CACHE')]
+
+    def can_cache(self, handler, request):
+        """
+        Check if responses from `handler` to `request` can be cached.
+
+        Conditional requests to `conditional` handlers are left to the handler,
+        which can answer them without rendering a response at all.
+        """
+        if not get_setting('RESPONSE_CACHE'):
+            return False
+        if handler.conditional and any(h in request.META for h in CONDITIONAL_HEADERS):
+            return False
+        if not handler.cacheable or request.method not in ('GET', 'HEAD'):
+            return False
+        return not self.is_private(request)
+
+    def get_version(self, cache, pk):
+        """Get the content version of the Route with this pk."""
+        key = VERSION_KEY.format(pk)
+        version = cache.get(key)
+        if version is None:
+            version = new_generation()
+            cache.add(key, version, timeout=None)
+        return version
+
+    def bump_version(self, pk):
+        """Start a new content version for the Route with this pk."""
+        cache = self.get_cache()
+        key = VERSION_KEY.format(pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The version is not in the cache. Start it again.
+            cache.set(key, new_generation(), timeout=None)
+
+    def make_key_prefix(self, route, path, version):
+        """Make the prefix of the keys responses for `path` of `route` are under."""
+        digest = hashlib.md5(path.encode()).hexdigest()
+        return RESPONSE_PREFIX.format(route_generation.get(), route.pk, version, digest)
+
+    def is_private(self, request):
+        """
+        Check if `request` is from someone with a session, or who is logged in.
+
+        Their responses may be personal, so are not cached.
+        """
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated()
+
+    def used_private(self, request):
+        """
+        Check if responding to `request` used its session or CSRF token.
+
+        Middleware will add cookies and `Vary: Cookie` to the response, after
+        it has been cached, so it must not be cached at all.
+        """
+        if request.META.get('CSRF_COOKIE_USED'):
+            return True
+        session = getattr(request, 'session', None)
+        return session is not None and session.accessed
+
+    def handle(self, handler, route, request, path):
+        """
+        Get the response to `request` from the cache, or from `handler`.
+
+        Responses from `handler` are cached if they are successful, and set no
+        cookies, and responding used no session or CSRF token. Responses that
+        are rendered lazily are cached once rendered.
+
+        Like Django's cache middleware, the headers each response varies on
+        (the handler's `cache_vary`, and any others in its `Vary` header) are
+        cached too, so that its key can be made from their values in requests.
+
+        Responses are cached under the current generation, so they are rendered
+        from the primary database. A Route read from a replica, which may be
+        behind the primary, is read again first.
+        """
+        cache = self.get_cache()
+        version = self.get_version(cache, route.pk)
+        prefix = self.make_key_prefix(route, path, version)
+        key = get_cache_key(request, prefix, request.method, cache)
+        if key is not None:
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+        from_replica = get_read_database() is not None
+        with reading_from_primary():
+            # Only fetch the Route from a RouteRecord if the response isn't cached.
+            route = route.for_handler(handler)
+            if from_replica and isinstance(route, models.Model):
+                route.refresh_from_db(using=router.db_for_read(type(route)))
+            response = handler.handle(route, request, path)
+        patch_vary_headers(response, handler.cache_vary)
+        if response.status_code != 200 or response.streaming:
+            return response
+
+        timeout = handler.cache_timeout
+        if timeout is None:
+            timeout = get_setting('RESPONSE_CACHE_TIMEOUT')
+
+        def store(response):
+            if response.cookies or self.used_private(request):
+                return
+            key = learn_cache_key(request, response, timeout, prefix, cache)
+            cache.set(key, response, timeout)
+
+        if callable(getattr(response, 'render', None)):
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,175 @@
+"""
+Rewrite the urls of a Route's descendants in the background.
+
+With `CONMAN_DEFER_URL_REWRITES`, saving a Route with a new url only updates
+the Route itself. The urls of its descendants are left to a `UrlRewrite`,
+which rewrites them `CHUNK_SIZE` at a time, each chunk in a transaction of its
+own, once the save has committed.
+
+Each chunk rewrites the descendants whose urls still start with the old url,
+so a rewrite can be stopped and run again at any point: descendants that have
+already been rewritten are left alone. Rewrites run oldest first, so that a
+later rewrite of the same urls finds them where the earlier one left them.
+
+Other apps can follow each chunk with the `urls_rewritten` signal, and the
+whole rewrite with `url_changed`, which is sent once it has finished.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import signals
+from .conf import get_setting
+from .coroutines import call_in_thread
+from .generation import route_generation
+from .transactions import on_commit
+from .utils import import_from_dotted_path
+
+
+# How many descendants to rewrite in each transaction.
+CHUNK_SIZE = 500
+
+# Runs rewrites when `CONMAN_REWRITE_EXECUTOR` is not set. See `get_thread_pool`.
+_thread_pool = None
+
+
+def get_thread_pool():
+    """
+    Get the thread pool that runs rewrites in this process.
+
+    It has a single thread, so rewrites run one at a time, in order.
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=1)
+    return _thread_pool
+
+
+def pending_rewrites():
+    """Get the unfinished UrlRewrites, oldest first."""
+    UrlRewrite = apps.get_model('routes', 'UrlRewrite')
+    return UrlRewrite.objects.filter(finished=None).order_by('pk')
+
+
+def start_rewrite(route, old_url):
+    """
+    Record that the descendants of `route` need their urls rewriting.
+
+    `old_url` and the Route's url may themselves be waiting on an earlier
+    rewrite (of an ancestor's descendants). If so, they are recorded as that
+    rewrite will leave them, as it runs first. Only rewrites on the Route's
+    host are considered, as urls on other hosts are unrelated.
+    """
+    UrlRewrite = apps.get_model('routes', 'UrlRewrite')
+    new_url = route.url
+    for earlier in pending_rewrites().filter(route__host=route.host):
+        old_url = earlier.rewrite_url(old_url)
+        new_url = earlier.rewrite_url(new_url)
+    return UrlRewrite.objects.create(
+        route=route,
+        old_url=old_url,
+        new_url=new_url,
+        total=route.get_descendant_count(),
+    )
+
+
+def rewrite_chunk(rewrite, chunk_size=CHUNK_SIZE):
+    """
+    Rewrite the urls of up to `chunk_size` descendants, in one transaction.
+
+    The descendants are locked until the transaction ends, and only those
+    whose urls still start with the old url are rewritten, should the tree
+    have changed since they were found. Returns how many were rewritten,
+    which is 0 once they all have been.
+    """
+    Route = apps.get_model('routes', 'Route')
+    with transaction.atomic():
+        # Fetched each time, as the tree may have changed since the last chunk.
+        route = Route.objects.non_polymorphic().get(pk=rewrite.route_id)
+        descendants = route.get_descendants().filter(url__startswith=rewrite.old_url)
+        rows = descendants.select_for_update().order_by('pk').values_list('pk', 'url')
+        rows = list(rows[:chunk_size])
+        count = 0
+        if rows:
+            count = Route.objects.rewrite_urls(
+                descendants.filter(pk__in=[pk for pk, url in rows]),
+                rewrite.old_url,
+                rewrite.new_url,
+                host=route.host,
+                modified=route.modified,
+            )
+            signals.urls_rewritten.send(
+                sender=type(route),
+                route=route,
+                old_url=rewrite.old_url,
+                new_url=rewrite.new_url,
+                urls=[url for pk, url in rows],
+            )
+            type(rewrite).objects.filter(pk=rewrite.pk).update(done=F('done') + count)
+            rewrite.done += count
+    if count:
+        route_generation.bump_on_commit(rewrite._state.db)
+    return count
+
+
+def run_rewrite(rewrite, chunk_size=CHUNK_SIZE):
+    """
+    Rewrite the urls of all the descendants, chunk by chunk, then finish.
+
+    Finishing sends `url_changed` for the Route, as `Route.save` does when
+    urls are rewritten straight away. If the Route has been deleted meanwhile,
+    so have its descendants, so there is nothing left to do.
+    """
+    Route = apps.get_model('routes', 'Route')
+    try:
+        while rewrite_chunk(rewrite, chunk_size):
+            pass
+        route = Route.objects.get(pk=rewrite.route_id)
+    except Route.DoesNotExist:
+        type(rewrite).objects.filter(pk=rewrite.pk).delete()
+        return
+    with transaction.atomic():
+        rewrite.finished = timezone.now()
+        rewrite.save(update_fields=['finished'])
+        signals.url_changed.send(sender=type(route), route=route, old_url=rewrite.old_url)
+
+
+def run_pending_rewrites(chunk_size=CHUNK_SIZE):
+    """Run every unfinished UrlRewrite, oldest first, and return how many ran."""
+    count = 0
+    while True:
+        rewrite = pending_rewrites().first()
+        if rewrite is None:
+            return count
+        run_rewrite(rewrite, chunk_size)
+        count += 1
+
+
+def submit_rewrites():
+    """
+    Have the pending rewrites run.
+
+    They are passed to the `CONMAN_REWRITE_EXECUTOR`, a dotted path to a
+    callable that takes no arguments, such as a function that queues a task
+    to call `run_pending_rewrites`. If that isn't set, they are run in a
+    thread in this process.
+    """
+    executor = get_setting('REWRITE_EXECUTOR')
+    if executor is None:
+        get_thread_pool().submit(call_in_thread, run_pending_rewrites)
+    else:
+        import_from_dotted_path(executor)()
+
+
+def schedule_rewrites():
+    """
+    Have the pending rewrites run once the current transaction has committed.
+
+    Until then, they can't be seen from other connections. Outside a
+    transaction, they are submitted straight away. Within one, they wait for
+    the end of the request, or for `transactions.run_on_commit()` to be called
+    outside a request (which is warned of). See `transactions.on_commit`.
+    """
+    on_commit(submit_rewrites)
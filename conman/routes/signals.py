@@ -0,0 +1,21 @@
+from django.dispatch import Signal
+
+
+# Sent by `Route.save` when the url of a Route changes, once the urls of its
+# descendants have been rewritten too. Sent inside the transaction that saves
+# the Route, with the Route as `route` and its previous url as `old_url`. With
+# `CONMAN_DEFER_URL_REWRITES`, sent by `rewrites.run_rewrite` instead, inside
+# the transaction that finishes the rewrite.
+url_changed = Signal(providing_args=['route', 'old_url'])
+
+# Sent with `CONMAN_DEFER_URL_REWRITES` as the urls of a Route and its
+# descendants are rewritten, bit by bit: by `Route.save` for the Route itself,
+# then by `rewrites.rewrite_chunk` for each chunk of descendants. Sent inside
+# the transaction that rewrites them, with the Route as `route`, the start of
+# the urls that was replaced as `old_url` and its replacement as `new_url`,
+# and the previous urls of the Routes rewritten as `urls`.
+urls_rewritten = Signal(providing_args=['route', 'old_url', 'new_url', 'urls'])
+
+# Sent by `instrumentation.Recorder` when a phase of handling a request ends,
+# with the `instrumentation.Phase` as `phase`. Only sent while recording.
+phase_timed = Signal(providing_args=['phase'])
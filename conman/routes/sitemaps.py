@@ -0,0 +1,165 @@
+import gzip
+import itertools
+import os
+import re
+from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+
+from .conf import get_setting
+
+
+CHUNK_SIZE = 1000
+# The most urls a sitemap may hold, by the sitemap protocol.
+URLS_PER_SITEMAP = 50000
+INDEX_NAME = 'sitemap.xml'
+SITEMAP_NAME = 'sitemap-{}.xml'
+# Matches the names of sitemaps, compressed or not.
+SITEMAP_PATTERN = re.compile(r'^sitemap-\d+\.xml(\.gz)?$')
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def excluded_content_types():
+    """Get the ids of the content types of Route models that set `in_sitemap` False."""
+    Route = apps.get_model('routes', 'Route')
+    models = [
+        model for model in apps.get_models()
+        if issubclass(model, Route) and not model.in_sitemap
+    ]
+    content_types = ContentType.objects.get_for_models(*models)
+    return [content_type.pk for content_type in content_types.values()]
+
+
+def iter_entries(chunk_size=CHUNK_SIZE, host=None):
+    """
+    Iterate over the `(url, modified)` of each Route that belongs in a sitemap.
+
+    Values are read straight from the Route table, `chunk_size` rows at a
+    time, each chunk starting after the pk of the last, so memory use stays
+    constant however many Routes there are. Only Routes on `host` are
+    included, unless it is None.
+    """
+    Route = apps.get_model('routes', 'Route')
+    routes = Route.objects.non_polymorphic().exclude(
+        polymorphic_ctype_id__in=excluded_content_types(),
+    )
+    if host is not None:
+        routes = routes.filter(host=host)
+    routes = routes.order_by('pk').values_list('pk', 'url', 'modified')
+    after = 0
+    while True:
+        last = None
+        for last, url, modified in routes.filter(pk__gt=after)[:chunk_size].iterator():
+            yield url, modified
+        if last is None:
+            return
+        after = last
+
+
+def format_date(value):
+    """Format a `lastmod` date, as `django.contrib.sitemaps` does."""
+    return value.strftime('%Y-%m-%d')
+
+
+class SitemapWriter:
+    """
+    Write sitemaps of all Routes to files, along with a sitemap index.
+
+    Routes are streamed from the database (see `iter_entries`) and written
+    `limit` (at most `URLS_PER_SITEMAP`) to a file, as `sitemap-1.xml`,
+    `sitemap-2.xml` and so on. The index, `sitemap.xml`, lists each sitemap.
+    Urls are made absolute with `base_url`, such as `https://example.com`.
+
+    With `compress`, the sitemaps are written gzipped, as `sitemap-1.xml.gz`
+    and so on. The index is always written uncompressed.
+
+    With `CONMAN_MULTIPLE_HOSTS`, only the Routes on the host of `base_url`
+    are listed.
+
+    Sitemaps left in the output directory by an earlier run, but not written
+    by this one, are removed once the index no longer lists them.
+    """
+    def __init__(self, output_dir, base_url, compress=False, limit=URLS_PER_SITEMAP):
+        """
+        Prepare to write sitemaps to `output_dir`.
+
+        Raises `ValueError` unless `limit` is between 1 and `URLS_PER_SITEMAP`.
+        """
+        if not 1 <= limit <= URLS_PER_SITEMAP:
+            msg = 'The limit must be between 1 and {}.'.format(URLS_PER_SITEMAP)
+            raise ValueError(msg)
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip('/')
+        self.compress = compress
+        self.limit = limit
+
+    def open(self, name, compress=False):
+        """Open the file `name` in the output directory for writing text."""
+        path = os.path.join(self.output_dir, name)
+        if compress:
+            return gzip.open(path, 'wt', encoding='utf-8')
+        return open(path, 'w', encoding='utf-8')
+
+    def write_sitemap(self, number, entries):
+        """
+        Write `(url, modified)` entries to the sitemap with this number.
+
+        Returns the sitemap's file name, the date its Routes last changed, and
+        the number of urls in it.
+        """
+        name = SITEMAP_NAME.format(number)
+        if self.compress:
+            name += '.gz'
+        lastmod = None
+        count = 0
+        with self.open(name, compress=self.compress) as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<urlset xmlns="{}">\n'.format(XMLNS))
+            for url, modified in entries:
+                lastmod = modified if lastmod is None else max(lastmod, modified)
+                count += 1
+                f.write('<url><loc>{}</loc><lastmod>{}</lastmod></url>\n'.format(
+                    escape(self.base_url + url),
+                    format_date(modified),
+                ))
+            f.write('</urlset>\n')
+        return name, lastmod, count
+
+    def write_index(self, sitemaps):
+        """Write the index of the `(name, lastmod)` of each sitemap."""
+        with self.open(INDEX_NAME) as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<sitemapindex xmlns="{}">\n'.format(XMLNS))
+            for name, lastmod in sitemaps:
+                f.write('<sitemap><loc>{}</loc><lastmod>{}</lastmod></sitemap>\n'.format(
+                    escape('{}/{}'.format(self.base_url, name)),
+                    format_date(lastmod),
+                ))
+            f.write('</sitemapindex>\n')
+
+    def remove_stale(self, names):
+        """Remove the sitemaps in the output directory that aren't in `names`."""
+        for name in os.listdir(self.output_dir):
+            if SITEMAP_PATTERN.match(name) and name not in names:
+                os.remove(os.path.join(self.output_dir, name))
+
+    def run(self):
+        """Write the sitemaps and index, and return the number of urls and sitemaps."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        host = None
+        if get_setting('MULTIPLE_HOSTS'):
+            host = urlparse(self.base_url).hostname
+        entries = iter_entries(host=host)
+        sitemaps = []
+        urls = 0
+        for entry in entries:
+            # Take up to `limit` entries, starting with this one.
+            chunk = itertools.chain([entry], itertools.islice(entries, self.limit - 1))
+            name, lastmod, count = self.write_sitemap(len(sitemaps) + 1, chunk)
+            sitemaps.append((name, lastmod))
+            urls += count
+        self.write_index(sitemaps)
+        self.remove_stale({name for name, lastmod in sitemaps})
+        return {'urls': urls, 'sitemaps': len(sitemaps)}
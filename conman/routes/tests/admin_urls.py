@@ -0,0 +1,17 @@
+from django.conf.urls import include, url
+from django.contrib.admin import AdminSite
+
+from conman.pages.models import Page
+from ..admin import RouteAdmin
+from ..models import Route
+
+
+# An admin site with Pages registered, to link Pages in the Route tree to.
+site = AdminSite(name='pages_admin')
+site.register(Route, RouteAdmin)
+site.register(Page)
+
+
+urlpatterns = [
+    url(r'^admin/', include(site.urls)),
+]
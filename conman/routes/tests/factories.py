@@ -13,9 +13,10 @@ class RootRouteFactory(RouteFactory):
     """Create a Route with no parent and an empty slug."""
     slug = ''
     parent = None
+    host = ''
 
     class Meta:
-        django_get_or_create = ['slug']
+        django_get_or_create = ['slug', 'host']
 
 
 class ChildRouteFactory(RouteFactory):
@@ -0,0 +1,173 @@
+import json
+
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.test import override_settings, RequestFactory, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from conman.tests.factories import UserFactory
+from . import admin_urls
+from .factories import ChildRouteFactory, RootRouteFactory
+from ..admin import make_cursor, parse_cursor, RouteAdmin
+from ..models import Route
+
+
+class CursorTest(TestCase):
+    """Test make_cursor and parse_cursor."""
+    def test_round_trip(self):
+        """A cursor holds the `tree_id` and `lft` of a node."""
+        cursor = make_cursor({'tree_id': 3, 'lft': 42})
+        self.assertEqual(parse_cursor(cursor), (3, 42))
+
+    def test_malformed(self):
+        """Malformed cursors are rejected."""
+        for cursor in ('3', '3-x', '3-4-5'):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    parse_cursor(cursor)
+
+
+class RouteAdminTestCase(TestCase):
+    """Build a tree of Routes, and a RouteAdmin with pages of two."""
+    def setUp(self):
+        """Create the tree, a superuser, and the admin."""
+        self.root = PageFactory.create()
+        self.children = [
+            ChildRouteFactory.create(parent=self.root, slug='child-{}'.format(i))
+            for i in range(3)
+        ]
+        self.grandchild = ChildRouteFactory.create(parent=self.children[0], slug='leaf')
+        self.model_admin = RouteAdmin(Route, admin.site)
+        self.model_admin.list_per_page = 2
+        self.user = UserFactory.create(is_staff=True, is_superuser=True)
+
+    def get(self, view, **params):
+        """Call one of the admin's views with a GET request as the superuser."""
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        return view(request)
+
+    def get_nodes(self, **params):
+        """Get the JSON from `nodes_view`."""
+        response = self.get(self.model_admin.nodes_view, **params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())
+
+
+class RouteAdminNodesViewTest(RouteAdminTestCase):
+    """Test RouteAdmin.nodes_view."""
+    def test_roots(self):
+        """Without a parent, Root Routes are listed, with their details."""
+        data = self.get_nodes()
+
+        self.assertEqual(data, {
+            'nodes': [{
+                'pk': self.root.pk,
+                'url': '/',
+                'slug': '',
+                'host': '',
+                'children': 3,
+                'type': 'page',
+                'change_url': '/admin/routes/route/{}/'.format(self.root.pk),
+            }],
+            'next': None,
+        })
+
+    def test_children(self):
+        """The children of a parent are listed in pages, in tree order."""
+        data = self.get_nodes(parent=self.root.pk)
+
+        urls = [node['url'] for node in data['nodes']]
+        self.assertEqual(urls, ['/child-0/', '/child-1/'])
+        self.assertEqual([node['children'] for node in data['nodes']], [1, 0])
+
+        data = self.get_nodes(parent=self.root.pk, after=data['next'])
+
+        self.assertEqual([node['url'] for node in data['nodes']], ['/child-2/'])
+        self.assertIsNone(data['next'])
+
+    def test_pages_across_trees(self):
+        """Test that pages of Routes carry on from one tree to the next."""
+        RootRouteFactory.create(host='example.com')
+        RootRouteFactory.create(host='example.org')
+
+        data = self.get_nodes()
+        data = self.get_nodes(after=data['next'])
+
+        self.assertEqual([node['host'] for node in data['nodes']], ['example.org'])
+
+    def test_prefix(self):
+        """Test that Routes are searched for by the start of their url."""
+        data = self.get_nodes(prefix='child-0')
+
+        urls = [node['url'] for node in data['nodes']]
+        self.assertEqual(urls, ['/child-0/', '/child-0/leaf/'])
+
+    def test_constant_queries(self):
+        """Each page costs one query."""
+        ContentType.objects.get_for_model(Route)
+        ContentType.objects.get_for_id(self.root.polymorphic_ctype_id)
+        data = self.get_nodes(parent=self.root.pk)
+
+        with self.assertNumQueries(1):
+            self.get_nodes(parent=self.root.pk, after=data['next'])
+
+    def test_stale_content_type(self):
+        """Test that Routes of models that no longer exist show the name of their type."""
+        stale = ContentType.objects.create(app_label='routes', model='removed')
+        Route.objects.filter(pk=self.root.pk).update(polymorphic_ctype=stale)
+
+        data = self.get_nodes()
+
+        self.assertEqual(data['nodes'][0]['type'], 'removed')
+
+    def test_bad_cursor(self):
+        """Malformed cursors are rejected."""
+        response = self.get(self.model_admin.nodes_view, after='nonsense')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bad_parent(self):
+        """Test that parents must be pks."""
+        response = self.get(self.model_admin.nodes_view, parent='nonsense')
+        self.assertEqual(response.status_code, 400)
+
+    def test_permission(self):
+        """Test that users who can't change Routes can't list them."""
+        self.user = UserFactory.create(username='staff', is_staff=True)
+        with self.assertRaises(PermissionDenied):
+            self.get(self.model_admin.nodes_view)
+
+    def test_change_url(self):
+        """Test that Routes link to the admin of their own model, if registered."""
+        model_admin = RouteAdmin(Route, admin_urls.site)
+        page_type = ContentType.objects.get_for_model(self.root)
+        with override_settings(ROOT_URLCONF='conman.routes.tests.admin_urls'):
+            url = model_admin.get_change_url(page_type, self.root.pk)
+
+        self.assertEqual(url, '/admin/pages/page/{}/'.format(self.root.pk))
+
+
+class RouteAdminChangelistViewTest(RouteAdminTestCase):
+    """Test RouteAdmin.changelist_view."""
+    def test_changelist(self):
+        """The changelist shows the tree without fetching any Routes."""
+        with self.assertNumQueries(0):
+            response = self.get(self.model_admin.changelist_view, prefix='/child-')
+            response.render()
+
+        self.assertContains(response, 'data-nodes-url="/admin/routes/route/nodes/"')
+        self.assertContains(response, 'value="/child-"')
+        self.assertNotContains(response, 'addlink')
+
+    def test_no_add(self):
+        """Bare Routes can't be added, as they have no handler."""
+        request = RequestFactory().get('/')
+        request.user = self.user
+        self.assertFalse(self.model_admin.has_add_permission(request))
+
+    def test_permission(self):
+        """Test that users who can't change Routes can't see the changelist."""
+        self.user = UserFactory.create(username='staff', is_staff=True)
+        with self.assertRaises(PermissionDenied):
+            self.get(self.model_admin.changelist_view)
@@ -0,0 +1,220 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.models import RouteRedirect
+from .factories import ChildRouteFactory
+from .. import bulk
+from ..generation import route_generation
+from ..models import Route
+from ..utils import url_hash
+
+
+TREE_FIELDS = ('pk', 'url', 'tree_id', 'lft', 'rght', 'level', 'parent_id')
+
+
+def tree_fields():
+    """Get the url and tree fields of all Routes."""
+    return list(Route.objects.order_by('pk').values_list(*TREE_FIELDS))
+
+
+def pages(width, depth):
+    """Build a nested structure of unsaved Pages, `width` wide and `depth` deep."""
+    if not depth:
+        return []
+    return [
+        (Page(slug='page{}'.format(i)), pages(width, depth - 1))
+        for i in range(width)
+    ]
+
+
+class ReservePksTest(TestCase):
+    """Test reserve_pks."""
+    def test_max_pk(self):
+        """Without a sequence, pks follow the largest in use."""
+        route = ChildRouteFactory.create()
+
+        with mock.patch.object(bulk, 'uses_sequence', return_value=False):
+            pks = bulk.reserve_pks(Page, 3, 'default')
+
+        self.assertEqual(pks, [route.pk + 1, route.pk + 2, route.pk + 3])
+
+    def test_no_routes(self):
+        """Without any Routes, pks start from 1."""
+        with mock.patch.object(bulk, 'uses_sequence', return_value=False):
+            self.assertEqual(bulk.reserve_pks(Route, 2, 'default'), [1, 2])
+
+    def test_sequence(self):
+        """With a sequence, pks are taken from that of the Route table."""
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value.fetchall.return_value = [(7,), (9,)]
+        mock_connection = mock.Mock(vendor='postgresql')
+        mock_connection.cursor.return_value = cursor
+        connections = {'default': mock_connection}
+
+        with mock.patch.object(bulk, 'connections', connections):
+            pks = bulk.reserve_pks(Page, 2, 'default')
+
+        self.assertEqual(pks, [7, 9])
+        execute = cursor.__enter__.return_value.execute
+        params = [Route._meta.db_table, 'id', 2]
+        execute.assert_called_once_with(bulk.SEQUENCE_PKS_SQL, params)
+
+
+class RouteManagerBulkCreateTreeTest(TestCase):
+    """Test Route.objects.bulk_create_tree."""
+    def assertTreeValid(self):
+        """Assert that the tree fields are the same as MPTT would make them."""
+        fields = tree_fields()
+        Route.objects.rebuild()
+        self.assertEqual(fields, tree_fields())
+
+    def test_tree(self):
+        """A new tree is inserted with the urls and tree fields of its Routes."""
+        routes = Route.objects.bulk_create_tree([(Page(content='Home'), pages(3, 3))])
+
+        self.assertEqual(len(routes), 1 + 3 + 9 + 27)
+        self.assertEqual(Route.objects.count(), len(routes))
+        self.assertEqual(routes[4].url, '/page0/page0/page1/')
+        self.assertTreeValid()
+
+    def test_url_hashes(self):
+        """Each Route is inserted with the hash of its url."""
+        routes = Route.objects.bulk_create_tree([(Page(content='Home'), pages(2, 2))])
+
+        hashes = dict(Route.objects.values_list('url', 'url_hash'))
+        self.assertEqual(hashes, {route.url: url_hash(route.url) for route in routes})
+
+    def test_host(self):
+        """Test that Routes are inserted on the host of their Root Route."""
+        root = Page(content='Home', host='example.com')
+        Route.objects.bulk_create_tree([(root, pages(2, 2))])
+
+        hosts = set(Route.objects.values_list('host', flat=True))
+        self.assertEqual(hosts, {'example.com'})
+
+    def test_subclasses(self):
+        """Test that Routes are inserted as instances of their subclasses."""
+        Route.objects.bulk_create_tree([(Page(content='Home'), [])])
+
+        page = Route.objects.get(url='/')
+        self.assertIsInstance(page, Page)
+        self.assertEqual(page.content, 'Home')
+
+    def test_parent(self):
+        """Test that Routes inserted below an existing parent become its last children."""
+        root = PageFactory.create()
+        branch = ChildRouteFactory.create(slug='branch')
+        ChildRouteFactory.create(parent=branch)
+        ChildRouteFactory.create(slug='after')
+
+        routes = Route.objects.bulk_create_tree(pages(2, 2), parent=branch)
+
+        self.assertEqual(routes[0].url, '/branch/page0/')
+        self.assertEqual(routes[0].parent, branch)
+        last_child = Route.objects.get(pk=root.pk).get_children().last()
+        self.assertEqual(last_child.url, '/after/')
+        self.assertTreeValid()
+
+    def test_redirects(self):
+        """Test that Routes are cleaned, so RouteRedirects get their target url."""
+        root = PageFactory.create()
+        target = ChildRouteFactory.create(slug='target')
+
+        routes = Route.objects.bulk_create_tree(
+            [(RouteRedirect(slug='redirect', target=target), [])],
+            parent=root,
+        )
+
+        redirect = RouteRedirect.objects.get(pk=routes[0].pk)
+        self.assertEqual(redirect.target_url, '/target/')
+
+    def test_root_with_slug(self):
+        """A root cannot have a slug."""
+        with self.assertRaises(ValueError):
+            Route.objects.bulk_create_tree([(Page(slug='slug'), [])])
+
+    def test_child_without_slug(self):
+        """A child must have a slug, and nothing is inserted without one."""
+        root = PageFactory.create()
+
+        with self.assertRaises(ValueError):
+            Route.objects.bulk_create_tree([(Page(), [])], parent=root)
+
+        self.assertEqual(Route.objects.count(), 1)
+
+    def test_empty(self):
+        """Nothing is inserted for an empty tree."""
+        with mock.patch.object(route_generation, 'bump') as bump:
+            routes = Route.objects.bulk_create_tree([])
+
+        self.assertEqual(routes, [])
+        self.assertFalse(bump.called)
+
+    def test_generation(self):
+        """Inserting a tree starts a new generation of the Route tree."""
+        with mock.patch.object(route_generation, 'bump') as bump:
+            Route.objects.bulk_create_tree([(Page(), [])])
+
+        bump.assert_called_once_with()
+
+    def test_constant_queries(self):
+        """The number of queries does not grow with the number of Routes."""
+        with CaptureQueriesContext(connection) as small:
+            Route.objects.bulk_create_tree([(Page(), pages(2, 1))])
+        Route.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            Route.objects.bulk_create_tree([(Page(), pages(5, 2))])
+
+        self.assertEqual(len(small), len(large))
+
+    def test_batch_size(self):
+        """Test that rows are inserted in batches of `batch_size`."""
+        with CaptureQueriesContext(connection) as queries:
+            Route.objects.bulk_create_tree([(Page(), pages(3, 1))], batch_size=2)
+
+        inserts = [q for q in queries if 'INSERT' in q['sql']]
+        # Two batches of two for each of the Route and Page tables.
+        self.assertEqual(len(inserts), 4)
+
+    def test_reset_sequence(self):
+        """Without pks from the sequence, it is moved past the new pks."""
+        with mock.patch.object(bulk, 'uses_sequence', return_value=False):
+            with mock.patch.object(connection.ops, 'sequence_reset_sql') as reset_sql:
+                reset_sql.return_value = ['SELECT 1']
+                with CaptureQueriesContext(connection) as queries:
+                    Route.objects.bulk_create_tree([(Page(), [])])
+
+        self.assertTrue(any('SELECT 1' in q['sql'] for q in queries))
+
+    def test_sequence_not_reset(self):
+        """With pks from the sequence, it is left alone."""
+        with mock.patch.object(bulk, 'reserve_pks', return_value=[1000]):
+            with mock.patch.object(bulk, 'uses_sequence', return_value=True):
+                with mock.patch.object(bulk, 'reset_sequence') as reset_sequence:
+                    routes = Route.objects.bulk_create_tree([(Page(), [])])
+
+        self.assertFalse(reset_sequence.called)
+        self.assertEqual(routes[0].pk, 1000)
+
+    def test_reserved_pks(self):
+        """Test that Routes get the reserved pks, and their children link to them."""
+        with mock.patch.object(bulk, 'reserve_pks', return_value=[500, 600, 700]):
+            routes = Route.objects.bulk_create_tree([(Page(), pages(1, 2))])
+
+        self.assertEqual([route.pk for route in routes], [500, 600, 700])
+        self.assertEqual(tree_fields()[2][-1], 600)
+
+    def test_save_after(self):
+        """The inserted Routes can be saved as usual."""
+        routes = Route.objects.bulk_create_tree([(Page(), pages(1, 2))])
+        branch = routes[1]
+
+        branch.slug = 'renamed'
+        branch.save()
+
+        self.assertEqual(Route.objects.get(pk=routes[2].pk).url, '/renamed/page0/')
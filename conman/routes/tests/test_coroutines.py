@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from unittest import mock
+
+from concurrent.futures import Executor, Future
+from django.test import TestCase
+
+from .. import coroutines
+from ..coroutines import call_in_thread, call_view, run_coroutine, run_sync
+
+
+class InlineExecutor(Executor):
+    """
+    Run each call as soon as it is submitted, on the calling thread.
+
+    Lets tests run coroutines that use the database, as the test transaction is
+    not visible to the threads of a real executor.
+    """
+    def submit(self, fn, *args, **kwargs):
+        """Call `fn`, and return a Future holding its result."""
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class CoroutineTestCase(TestCase):
+    """Run coroutines in an event loop of their own, with an InlineExecutor."""
+    def setUp(self):
+        """Create the event loop, and run blocking work inline."""
+        previous = asyncio.get_event_loop()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, previous)
+        self.addCleanup(self.loop.close)
+
+        patches = [
+            mock.patch.object(coroutines, 'executor', InlineExecutor()),
+            # Closing connections would close the test transaction.
+            mock.patch.object(coroutines, 'close_old_connections'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def run_until_complete(self, coroutine):
+        """Run `coroutine` in the event loop, and return its result."""
+        return self.loop.run_until_complete(coroutine)
+
+
+class CallInThreadTest(TestCase):
+    """Test call_in_thread."""
+    def test_result(self):
+        """The result of the function is returned."""
+        with mock.patch.object(coroutines, 'close_old_connections'):
+            result = call_in_thread(lambda a, b: a + b, 1, b=2)
+
+        self.assertEqual(result, 3)
+
+    def test_connections(self):
+        """Old connections are closed before and after the call."""
+        with mock.patch.object(coroutines, 'close_old_connections') as close:
+            with self.assertRaises(ValueError):
+                call_in_thread(mock.Mock(side_effect=ValueError))
+
+        self.assertEqual(close.call_count, 2)
+
+
+class RunSyncTest(CoroutineTestCase):
+    """Test run_sync."""
+    def test_result(self):
+        """The result of the function is returned."""
+        result = self.run_until_complete(run_sync(lambda a, b: a + b, 1, b=2))
+
+        self.assertEqual(result, 3)
+
+    def test_thread(self):
+        """Without an executor of its own, the loop's thread pool is used."""
+        with mock.patch.object(coroutines, 'executor', None):
+            ident = self.run_until_complete(run_sync(threading.get_ident))
+
+        self.assertNotEqual(ident, threading.get_ident())
+
+
+class CallViewTest(CoroutineTestCase):
+    """Test call_view."""
+    def test_coroutine(self):
+        """Coroutine views are run on the event loop."""
+        @asyncio.coroutine
+        def view(request):
+            yield from asyncio.sleep(0)
+            return ('response', request)
+
+        response = self.run_until_complete(call_view(view, 'request'))
+
+        self.assertEqual(response, ('response', 'request'))
+
+    def test_sync(self):
+        """Other views are run in the executor."""
+        view = mock.Mock()
+        with mock.patch.object(coroutines, 'run_sync', wraps=run_sync) as sync:
+            response = self.run_until_complete(call_view(view, 'request', a=1))
+
+        sync.assert_called_once_with(view, 'request', a=1)
+        self.assertEqual(response, view.return_value)
+
+
+class RunCoroutineTest(TestCase):
+    """Test run_coroutine."""
+    def test_result(self):
+        """The coroutine is run to completion, and its result returned."""
+        @asyncio.coroutine
+        def coroutine():
+            yield from asyncio.sleep(0)
+            return 'result'
+
+        self.assertEqual(run_coroutine(coroutine()), 'result')
+
+    def test_previous_loop(self):
+        """The thread's event loop is current again afterwards."""
+        previous = asyncio.get_event_loop()
+        run_coroutine(asyncio.sleep(0))
+
+        self.assertIs(asyncio.get_event_loop(), previous)
+
+    def test_no_loop(self):
+        """Test that coroutines can be run on threads with no event loop."""
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(run_coroutine(asyncio.sleep(0, 'result'))),
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual(results, ['result'])
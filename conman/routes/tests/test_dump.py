@@ -0,0 +1,269 @@
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command, CommandError
+from django.db import models
+from django.test import TestCase
+
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.models import RouteRedirect
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from ..dump import check_dumpable, dump_tree, load_tree, TreeEncoder
+from ..models import Route
+
+
+ROUTE_FIELDS = (
+    'pk', 'polymorphic_ctype_id', 'parent_id', 'slug', 'url', 'modified',
+    'lft', 'rght', 'tree_id', 'level',
+)
+
+
+def snapshot():
+    """Get the values of all the fields of all Routes, Pages and RouteRedirects."""
+    return (
+        list(Route.objects.order_by('pk').values_list(*ROUTE_FIELDS)),
+        list(Page.objects.order_by('pk').values_list('pk', 'content')),
+        list(RouteRedirect.objects.order_by('pk').values_list(
+            'pk', 'target_id', 'permanent', 'target_url',
+        )),
+    )
+
+
+class DumpTestCase(TestCase):
+    """Build a tree of Pages and RouteRedirects to dump."""
+    def setUp(self):
+        """Create the tree."""
+        root = PageFactory.create(content='Root')
+        section = PageFactory.create(parent=root, slug='section', content='Section')
+        page = PageFactory.create(parent=section, slug='page', content='Page')
+        redirect = ChildRouteRedirectFactory.create(parent=root, target=page)
+        ChildRouteRedirectFactory.create(parent=section, target=redirect, permanent=True)
+
+    def dump(self, **kwargs):
+        """Dump the tree, and return the stream it was written to."""
+        stream = StringIO()
+        dump_tree(stream, **kwargs)
+        stream.seek(0)
+        return stream
+
+
+class DumpTreeTest(DumpTestCase):
+    """Test dump_tree."""
+    def test_lines(self):
+        """Each Route is written as a line of JSON, in tree order."""
+        rows = [json.loads(line) for line in self.dump()]
+
+        urls = [row['fields']['url'] for row in rows]
+        expected = Route.objects.order_by('tree_id', 'lft').values_list('url', flat=True)
+        self.assertEqual(urls, list(expected))
+
+    def test_subclass_fields(self):
+        """The fields of each Route's subclass are written too."""
+        row = json.loads(self.dump().readline())
+
+        self.assertEqual(row['model'], 'pages.page')
+        self.assertEqual(row['fields']['content'], 'Root')
+        self.assertNotIn('polymorphic_ctype_id', row['fields'])
+
+    def test_count(self):
+        """The number of Routes written is returned."""
+        self.assertEqual(dump_tree(StringIO()), 5)
+
+    def test_chunks(self):
+        """Test that Routes are fetched in chunks, with one query per chunk."""
+        with self.assertNumQueries(5):
+            # Five queries:
+            # * Get the types of Route to check they can be dumped.
+            # * Get the first two Routes.
+            # * Get the next two.
+            # * Get the last one.
+            # * Check for more.
+            lines = list(self.dump(chunk_size=2))
+
+        self.assertEqual(len(lines), 5)
+
+    def test_not_dumpable(self):
+        """Nothing is written if any Route can't be dumped."""
+        stream = StringIO()
+        error = ValueError('Not dumpable')
+
+        with mock.patch('conman.routes.dump.check_dumpable', side_effect=error):
+            with self.assertRaises(ValueError):
+                dump_tree(stream)
+
+        self.assertEqual(stream.getvalue(), '')
+
+
+class CheckDumpableTest(TestCase):
+    """Test check_dumpable."""
+    def test_dumpable(self):
+        """Test that Routes without many-to-many fields can be dumped."""
+        check_dumpable(Page)
+
+    def test_many_to_many(self):
+        """Test that Routes with many-to-many fields cannot be dumped."""
+        # Not a real Route subclass, which would be found by other tests.
+        class Tagged(models.Model):
+            groups = models.ManyToManyField('auth.Group')
+            tags = models.ManyToManyField('auth.Permission')
+
+        with self.assertRaises(ValueError) as cm:
+            check_dumpable(Tagged)
+
+        expected = (
+            'Routes of routes.tagged have many-to-many fields, which cannot be '
+            'dumped: groups, tags.'
+        )
+        self.assertEqual(str(cm.exception), expected)
+
+
+class LoadTreeTest(DumpTestCase):
+    """Test load_tree."""
+    def test_round_trip(self):
+        """Loading a dumped tree restores all of its Routes exactly."""
+        before = snapshot()
+        stream = self.dump()
+        Route.objects.all().delete()
+
+        count = load_tree(stream)
+
+        self.assertEqual(count, 5)
+        self.assertEqual(snapshot(), before)
+
+    def test_batches(self):
+        """Test that Routes are inserted in batches of `batch_size`."""
+        stream = self.dump()
+        Route.objects.all().delete()
+
+        with mock.patch('conman.routes.dump.insert_routes') as insert_routes:
+            load_tree(stream, batch_size=2)
+
+        batch_sizes = [len(call[0][0]) for call in insert_routes.call_args_list]
+        self.assertEqual(batch_sizes, [2, 2, 1])
+
+    def test_usable(self):
+        """Loaded Routes can be routed to and moved."""
+        stream = self.dump()
+        Route.objects.all().delete()
+        load_tree(stream)
+
+        section = Route.objects.get(url='/section/')
+        section.slug = 'moved'
+        section.save()
+
+        page = Route.objects.best_match_for_path('/moved/page/')
+        self.assertEqual(page.content, 'Page')
+        redirect = RouteRedirect.objects.get(parent=page.parent)
+        self.assertEqual(redirect.target_url, '/moved/page/')
+
+    def test_blank_lines(self):
+        """Blank lines are skipped."""
+        stream = StringIO('\n' + self.dump().read() + '\n')
+        Route.objects.all().delete()
+
+        self.assertEqual(load_tree(stream), 5)
+
+    def test_not_empty(self):
+        """Test that Routes cannot be loaded while there are other Routes."""
+        with self.assertRaises(ValueError):
+            load_tree(self.dump())
+
+    def test_not_dumpable(self):
+        """Test that Routes that can't be dumped can't be loaded either."""
+        stream = self.dump()
+        Route.objects.all().delete()
+        error = ValueError('Not dumpable')
+
+        with mock.patch('conman.routes.dump.check_dumpable', side_effect=error):
+            with self.assertRaises(ValueError):
+                load_tree(stream)
+
+        self.assertFalse(Route.objects.exists())
+
+
+class TreeEncoderTest(TestCase):
+    """Test TreeEncoder."""
+    def test_microseconds(self):
+        """Test that datetimes keep their microseconds."""
+        value = datetime.datetime(2015, 7, 1, 12, 0, 0, 123456)
+        encoded = json.dumps(value, cls=TreeEncoder)
+        self.assertEqual(encoded, '"2015-07-01T12:00:00.123456"')
+
+    def test_other(self):
+        """Other values are encoded as DjangoJSONEncoder does."""
+        encoded = json.dumps(datetime.date(2015, 7, 1), cls=TreeEncoder)
+        self.assertEqual(encoded, '"2015-07-01"')
+
+
+class DumpCommandsTest(DumpTestCase):
+    """Test the conman_dump and conman_load management commands."""
+    def setUp(self):
+        """Create a file to dump to."""
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'routes.ndjson')
+
+    def tearDown(self):
+        """Remove the file."""
+        self.tmp.cleanup()
+
+    def test_file(self):
+        """The tree can be dumped to a file, and loaded from it."""
+        before = snapshot()
+        call_command('conman_dump', self.path, stderr=StringIO())
+        Route.objects.all().delete()
+
+        stdout = StringIO()
+        call_command('conman_load', self.path, stdout=stdout)
+
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(stdout.getvalue(), 'Loaded 5 Routes.\n')
+
+    def test_std_streams(self):
+        """The tree can be dumped to stdout, and loaded from stdin."""
+        before = snapshot()
+        stdout = StringIO()
+        stderr = StringIO()
+        call_command('conman_dump', stdout=stdout, stderr=stderr)
+        Route.objects.all().delete()
+        stdout.seek(0)
+
+        with mock.patch('sys.stdin', stdout):
+            call_command('conman_load', stdout=StringIO())
+
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(stderr.getvalue(), 'Dumped 5 Routes.\n')
+
+    def test_dump_error(self):
+        """Dumping Routes that can't be dumped is an error."""
+        error = ValueError('Not dumpable')
+
+        with mock.patch('conman.routes.dump.check_dumpable', side_effect=error):
+            with self.assertRaises(CommandError):
+                call_command('conman_dump', self.path, stderr=StringIO())
+
+    def test_dump_error_keeps_file(self):
+        """Test that a dump that fails leaves the file of an earlier one alone."""
+        with open(self.path, 'w') as f:
+            f.write('Earlier dump\n')
+        error = ValueError('Not dumpable')
+
+        with mock.patch('conman.routes.dump.check_dumpable', side_effect=error):
+            with self.assertRaises(CommandError):
+                call_command('conman_dump', self.path, stderr=StringIO())
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'Earlier dump\n')
+        self.assertEqual(os.listdir(self.tmp.name), ['routes.ndjson'])
+
+    def test_not_empty(self):
+        """Loading into a database with Routes is an error."""
+        call_command('conman_dump', self.path, stderr=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('conman_load', self.path, stdout=StringIO())
@@ -0,0 +1,244 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import override_settings, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from .. import export
+from ..export import make_pool, make_request, StaticExport
+
+
+class ExportTestCase(TestCase):
+    """Provide a temporary output directory, and helpers to read from it."""
+    def setUp(self):
+        """Create the output directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp.name
+
+    def tearDown(self):
+        """Remove the output directory."""
+        self.tmp.cleanup()
+
+    def path(self, *parts):
+        """Get a path in the output directory."""
+        return os.path.join(self.output_dir, *parts)
+
+    def read(self, *parts):
+        """Read a file from the output directory."""
+        with open(self.path(*parts)) as f:
+            return f.read()
+
+
+class StaticExportTest(ExportTestCase):
+    """Test StaticExport writes the Route tree to files."""
+    def test_pages(self):
+        """Test that Pages are written to index.html in the directory of their url."""
+        root = PageFactory.create(content='Root')
+        PageFactory.create(parent=root, slug='child', content='Child')
+
+        counts = StaticExport(self.output_dir).run()
+
+        self.assertIn('Root', self.read('index.html'))
+        self.assertIn('Child', self.read('child', 'index.html'))
+        self.assertEqual(counts['rendered'], 2)
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_host(self):
+        """With CONMAN_MULTIPLE_HOSTS, only the Routes on the host are exported."""
+        PageFactory.create(content='Root')
+        PageFactory.create(host='example.com', content='Example')
+
+        counts = StaticExport(self.output_dir, host='example.com').run()
+
+        self.assertIn('Example', self.read('index.html'))
+        self.assertEqual(counts['rendered'], 1)
+
+    def test_redirects(self):
+        """Test that redirects are written to an nginx map file for their status code."""
+        target = PageFactory.create()
+        temporary = ChildRouteRedirectFactory.create(slug='temporary', target=target)
+        permanent = ChildRouteRedirectFactory.create(
+            slug='permanent',
+            target=target,
+            permanent=True,
+        )
+
+        StaticExport(self.output_dir).run()
+
+        line = '{} {};\n'
+        expected = line.format(temporary.url, temporary.target.url)
+        self.assertIn(expected, self.read('redirects.302.map'))
+        expected = line.format(permanent.url, permanent.target.url)
+        self.assertEqual(expected, self.read('redirects.301.map'))
+
+    def test_skipped(self):
+        """Test that Routes with neither a page nor a redirect are skipped."""
+        PageFactory.create()
+        response = HttpResponse(status=404)
+
+        with mock.patch('conman.pages.models.Page.handle', return_value=response):
+            counts = StaticExport(self.output_dir).run()
+
+        self.assertEqual(counts['skipped'], 1)
+        self.assertFalse(os.path.exists(self.path('index.html')))
+
+    def test_streaming(self):
+        """The content of streaming responses is written too."""
+        PageFactory.create()
+        response = StreamingHttpResponse([b'streamed ', b'content'])
+
+        with mock.patch('conman.pages.models.Page.handle', return_value=response):
+            StaticExport(self.output_dir).run()
+
+        self.assertEqual(self.read('index.html'), 'streamed content')
+
+    def test_processes(self):
+        """With more than one process, Routes are rendered by a pool."""
+        PageFactory.create(content='Pooled')
+        pool = mock.MagicMock()
+        imap = pool.__enter__.return_value.imap
+        imap.side_effect = lambda func, iterable, chunksize: map(func, iterable)
+
+        with mock.patch.object(export, 'make_pool', return_value=pool) as make:
+            StaticExport(self.output_dir, processes=4).run()
+
+        make.assert_called_once_with(4)
+        self.assertIn('Pooled', self.read('index.html'))
+
+
+class StaticExportIncrementalTest(ExportTestCase):
+    """Test StaticExport only renders changed Routes when `incremental`."""
+    def setUp(self):
+        """Export a tree of Pages once."""
+        super().setUp()
+        self.root = PageFactory.create()
+        self.page = PageFactory.create(parent=self.root, slug='page', content='Old')
+        self.export = StaticExport(self.output_dir, incremental=True)
+        self.export.run()
+
+    def test_unchanged(self):
+        """Test that Routes that have not changed are not rendered again."""
+        with mock.patch.object(export, 'render_route') as render_route:
+            counts = self.export.run()
+
+        self.assertFalse(render_route.called)
+        self.assertEqual(counts['unchanged'], 2)
+
+    def test_modified(self):
+        """Test that Routes that have been saved are rendered again."""
+        self.page.content = 'New'
+        self.page.save()
+
+        counts = self.export.run()
+
+        self.assertIn('New', self.read('page', 'index.html'))
+        self.assertEqual(counts['rendered'], 1)
+
+    def test_moved(self):
+        """The file of a Route that has moved is removed."""
+        self.page.slug = 'moved'
+        self.page.save()
+
+        self.export.run()
+
+        self.assertFalse(os.path.exists(self.path('page', 'index.html')))
+        self.assertTrue(os.path.exists(self.path('moved', 'index.html')))
+
+    def test_deleted(self):
+        """The file of a Route that has been deleted is removed."""
+        self.page.delete()
+
+        counts = self.export.run()
+
+        self.assertFalse(os.path.exists(self.path('page', 'index.html')))
+        self.assertEqual(counts['removed'], 1)
+
+    def test_replaced(self):
+        """A new Route at the url of a deleted Route keeps its file."""
+        self.page.delete()
+        PageFactory.create(parent=self.root, slug='page', content='Replacement')
+
+        self.export.run()
+
+        self.assertIn('Replacement', self.read('page', 'index.html'))
+
+    def test_not_conditional(self):
+        """Test that Routes whose handlers are not `conditional` always render."""
+        redirect = ChildRouteRedirectFactory.create(target=self.page)
+        self.export.run()
+
+        self.page.slug = 'moved'
+        self.page.save()
+        self.export.run()
+
+        expected = '{} {};\n'.format(redirect.url, '/moved/')
+        self.assertEqual(self.read('redirects.302.map'), expected)
+
+    def test_not_incremental(self):
+        """Without `incremental`, every Route is rendered again."""
+        counts = StaticExport(self.output_dir).run()
+        self.assertEqual(counts['rendered'], 2)
+
+
+class MakeRequestTest(TestCase):
+    """Test make_request."""
+    def test_make_request(self):
+        """Test that requests are GETs of the url, sent to the host."""
+        request = make_request('/about/', 'example.com')
+
+        self.assertEqual(request.method, 'GET')
+        self.assertEqual(request.path, '/about/')
+        self.assertEqual(request.get_host(), 'example.com')
+        self.assertEqual(request.GET, {})
+
+
+class MakePoolTest(TestCase):
+    """Test make_pool."""
+    def test_make_pool(self):
+        """Database connections are closed before the processes are started."""
+        connection = mock.Mock()
+        connections = mock.Mock(all=mock.Mock(return_value=[connection]))
+
+        with mock.patch.object(export, 'connections', connections):
+            with mock.patch.object(export, 'Pool') as Pool:
+                pool = make_pool(3)
+
+        connection.close.assert_called_once_with()
+        Pool.assert_called_once_with(3)
+        self.assertEqual(pool, Pool.return_value)
+
+
+class ConmanExportCommandTest(ExportTestCase):
+    """Test the conman_export management command."""
+    def test_export(self):
+        """The tree is exported, and the counts reported."""
+        PageFactory.create(content='Exported')
+        stdout = StringIO()
+
+        call_command('conman_export', self.output_dir, processes=1, stdout=stdout)
+
+        self.assertIn('Exported', self.read('index.html'))
+        self.assertEqual(stdout.getvalue(), 'Rendered 1, unchanged 0, removed 0.\n')
+
+    def test_skipped(self):
+        """Skipped Routes are reported."""
+        PageFactory.create()
+        stderr = StringIO()
+        response = HttpResponse(status=404)
+
+        with mock.patch('conman.pages.models.Page.handle', return_value=response):
+            call_command(
+                'conman_export',
+                self.output_dir,
+                processes=1,
+                stdout=StringIO(),
+                stderr=stderr,
+            )
+
+        expected = 'Skipped 1 Routes that were neither pages nor redirects.\n'
+        self.assertEqual(stderr.getvalue(), expected)
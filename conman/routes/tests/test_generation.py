@@ -0,0 +1,169 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings, TestCase
+
+from conman.tests.factories import UserFactory
+from .factories import RootRouteFactory
+from .. import generation
+from ..transactions import run_on_commit
+
+
+class TestGeneration(TestCase):
+    """Test Generation shares a counter through the cache."""
+    def setUp(self):
+        """Start each test with an empty cache."""
+        cache.clear()
+        self.generation = generation.Generation()
+
+    def test_get_creates(self):
+        """The counter is created in the cache if it is missing."""
+        value = self.generation.get()
+
+        self.assertEqual(cache.get(generation.CACHE_KEY), value)
+
+    def test_get_existing(self):
+        """The counter is read from the cache if it exists."""
+        cache.set(generation.CACHE_KEY, 42)
+
+        self.assertEqual(self.generation.get(), 42)
+
+    def test_bump(self):
+        """Bumping the counter increments it in the cache."""
+        cache.set(generation.CACHE_KEY, 42)
+
+        self.generation.bump()
+
+        self.assertEqual(cache.get(generation.CACHE_KEY), 43)
+        self.assertEqual(self.generation.get(), 43)
+
+    def test_key(self):
+        """Other counters are kept under their own keys."""
+        cache.set(generation.CACHE_KEY, 42)
+        other = generation.Generation('other')
+
+        other.bump()
+
+        self.assertEqual(cache.get(generation.CACHE_KEY), 42)
+        self.assertEqual(cache.get('other'), other.get())
+
+    def test_bump_missing(self):
+        """Bumping a counter missing from the cache starts a new one."""
+        with mock.patch.object(generation, 'new_generation', return_value=42):
+            self.generation.bump()
+
+        self.assertEqual(cache.get(generation.CACHE_KEY), 42)
+        self.assertEqual(self.generation.get(), 42)
+
+    def test_new_generation(self):
+        """New counters start from the time in milliseconds."""
+        with mock.patch('time.time', return_value=1.5):
+            self.assertEqual(generation.new_generation(), 1500)
+
+    @override_settings(CONMAN_GENERATION_CHECK_MS=0)
+    def test_bumped_elsewhere(self):
+        """A bump by another process is seen on the next check."""
+        self.generation.get()
+
+        other_process = generation.Generation()
+        value = other_process.bump()
+
+        self.assertEqual(self.generation.get(), value)
+
+    @override_settings(CONMAN_GENERATION_CHECK_MS=1000)
+    def test_check_interval(self):
+        """The cache is not checked again until the interval has passed."""
+        with mock.patch('time.monotonic', return_value=100):
+            first = self.generation.get()
+            cache.incr(generation.CACHE_KEY)
+            self.assertEqual(self.generation.get(), first)
+
+        with mock.patch('time.monotonic', return_value=101):
+            self.assertEqual(self.generation.get(), first + 1)
+
+    @override_settings(
+        CACHES={'conman': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(tempfile.gettempdir(), 'conman-test'),
+        }},
+        CONMAN_CACHE='conman',
+    )
+    def test_file_cache(self):
+        """The counter works with the file based cache backend."""
+        self.generation.get_cache().clear()
+        first = self.generation.get()
+
+        self.assertEqual(generation.Generation().bump(), first + 1)
+
+
+class TestRouteGenerationBumps(TestCase):
+    """The Route generation is bumped when the Route tree changes."""
+    def patch_bump(self):
+        """Patch route_generation.bump to record calls."""
+        return mock.patch.object(generation.route_generation, 'bump')
+
+    def test_save(self):
+        """Saving a new Route bumps the generation."""
+        with self.patch_bump() as bump:
+            RootRouteFactory.create()
+
+        bump.assert_called_once_with()
+
+    def test_save_unchanged(self):
+        """Saving a Route without changing its url does not bump the generation."""
+        root = RootRouteFactory.create()
+
+        with self.patch_bump() as bump:
+            root.save()
+
+        self.assertFalse(bump.called)
+
+    def test_delete(self):
+        """Deleting a Route bumps the generation."""
+        root = RootRouteFactory.create()
+
+        with self.patch_bump() as bump:
+            root.delete()
+
+        bump.assert_called_once_with()
+
+    def test_delete_other_model(self):
+        """Deleting something that is not a Route does not bump the generation."""
+        user = UserFactory.create()
+
+        with self.patch_bump() as bump:
+            user.delete()
+
+        self.assertFalse(bump.called)
+
+
+class TestBumpOnCommit(TestCase):
+    """Test Generation.bump_on_commit."""
+    def setUp(self):
+        """Create a Generation to bump."""
+        run_on_commit()
+        self.generation = generation.Generation()
+
+    def test_transaction(self):
+        """Within a transaction, the generation is bumped again once it commits."""
+        with mock.patch.object(self.generation, 'bump') as bump:
+            self.generation.bump_on_commit()
+            self.assertEqual(bump.call_count, 1)
+
+            run_on_commit()
+
+        self.assertEqual(bump.call_count, 2)
+
+    def test_no_transaction(self):
+        """Outside a transaction, the generation is only bumped once."""
+        connection = transaction.get_connection()
+        with mock.patch.object(self.generation, 'bump') as bump:
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.generation.bump_on_commit()
+
+            run_on_commit()
+
+        self.assertEqual(bump.call_count, 1)
@@ -1,10 +1,23 @@
+import asyncio
+import datetime
 from unittest import mock
 
 from django.core.urlresolvers import clear_url_caches, Resolver404
-from django.test import TestCase
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils.http import http_date, quote_etag
 from django.views.generic import View
 
-from ..handlers import BaseHandler, SimpleHandler
+from conman.pages.handlers import PageHandler
+from conman.redirects.handlers import RouteRedirectHandler
+from .test_coroutines import CoroutineTestCase
+from ..handlers import (
+    BaseHandler,
+    HandlerRegistry,
+    registry,
+    route_etag,
+    SimpleHandler,
+)
 
 
 class BaseHandlerPathTest(TestCase):
@@ -22,17 +35,6 @@ class BaseHandlerPathTest(TestCase):
         self.assertEqual(TestHandler.path(), 'does_not_exist.TestHandler')
 
 
-class BaseHandlerInitTest(TestCase):
-    """Test BaseHandler.__init__()."""
-    def test_init(self):
-        """Make sure "route" gets saved on the handler."""
-        route = mock.MagicMock()
-
-        handler = BaseHandler(route)
-
-        self.assertEqual(handler.route, route)
-
-
 class BaseHandlerHandleTest(TestCase):
     """Test BaseHandler.handle()."""
     def setUp(self):
@@ -42,7 +44,7 @@ class BaseHandlerHandleTest(TestCase):
 
         self.route = mock.Mock()
         self.request = mock.Mock()
-        self.handler = TestHandler(self.route)
+        self.handler = TestHandler()
         self.view = 'conman.routes.tests.urls.dummy_view'
 
     def tearDown(self):
@@ -52,7 +54,7 @@ class BaseHandlerHandleTest(TestCase):
     def test_handle_basic(self):
         """Show that url resolving works at the root of the urlconf."""
         with mock.patch(self.view) as view:
-            response = self.handler.handle(self.request, '/')
+            response = self.handler.handle(self.route, self.request, '/')
 
         view.assert_called_with(self.request, route=self.route)
         self.assertEqual(response, view(self.request, route=self.route))
@@ -61,7 +63,7 @@ class BaseHandlerHandleTest(TestCase):
         """Show that url resolving works with slugs."""
         slug = 'slug'
         with mock.patch(self.view) as view:
-            response = self.handler.handle(self.request, '/slug/')
+            response = self.handler.handle(self.route, self.request, '/slug/')
 
         view.assert_called_with(self.request, route=self.route, slug=slug)
 
@@ -72,11 +74,93 @@ class BaseHandlerHandleTest(TestCase):
         """Show that an error is thrown when the url does not match."""
         with self.assertRaises(Resolver404):
             with mock.patch(self.view) as view:
-                self.handler.handle(self.request, '/no/match/')
+                self.handler.handle(self.route, self.request, '/no/match/')
 
         self.assertFalse(view.called)
 
 
+class BaseHandlerResolverTest(TestCase):
+    """Test BaseHandler keeps its own resolver."""
+    def setUp(self):
+        """Create a Handler with a urlconf."""
+        class TestHandler(BaseHandler):
+            urlconf = 'conman.routes.tests.urls'
+
+        self.handler = TestHandler()
+
+    def test_resolver(self):
+        """A resolver for the urlconf is built with the handler."""
+        self.assertEqual(self.handler.resolver.urlconf_name, self.handler.urlconf)
+
+    def test_handle_uses_resolver(self):
+        """The handler's own resolver is used to handle requests."""
+        route = mock.Mock()
+        request = mock.Mock()
+        view = mock.Mock()
+        resolve = mock.Mock(return_value=(view, (), {}))
+
+        with mock.patch.object(self.handler.resolver, 'resolve', resolve):
+            response = self.handler.handle(route, request, '/')
+
+        resolve.assert_called_once_with('/')
+        view.assert_called_once_with(request, route=route)
+        self.assertEqual(response, view.return_value)
+
+
+class BaseHandlerHandleAsyncTest(CoroutineTestCase):
+    """Test BaseHandler.handle_async(), and coroutine views."""
+    def setUp(self):
+        """Create a Handler with a urlconf, and a coroutine view."""
+        super().setUp()
+
+        class TestHandler(BaseHandler):
+            urlconf = 'conman.routes.tests.urls'
+
+        @asyncio.coroutine
+        def view(request, route, slug):
+            yield from asyncio.sleep(0)
+            return (request, route, slug)
+
+        self.handler = TestHandler()
+        self.view = view
+
+    def resolve(self, view):
+        """Make the handler's resolver resolve all paths to `view`."""
+        resolve = mock.Mock(return_value=(view, (), {'slug': 'slug'}))
+        return mock.patch.object(self.handler.resolver, 'resolve', resolve)
+
+    def test_coroutine_view(self):
+        """Coroutine views are waited for."""
+        with self.resolve(self.view):
+            coroutine = self.handler.handle_async('route', 'request', '/slug/')
+            response = self.run_until_complete(coroutine)
+
+        self.assertEqual(response, ('request', 'route', 'slug'))
+
+    def test_sync_view(self):
+        """Other views are run in the executor."""
+        view = mock.Mock()
+        with self.resolve(view):
+            coroutine = self.handler.handle_async('route', 'request', '/slug/')
+            response = self.run_until_complete(coroutine)
+
+        view.assert_called_once_with('request', route='route', slug='slug')
+        self.assertEqual(response, view.return_value)
+
+    def test_no_url_match(self):
+        """An error is raised when the url does not match."""
+        with self.assertRaises(Resolver404):
+            coroutine = self.handler.handle_async('route', 'request', '/no/match/')
+            self.run_until_complete(coroutine)
+
+    def test_handle(self):
+        """Coroutine views can be used by the synchronous `handle` too."""
+        with self.resolve(self.view):
+            response = self.handler.handle('route', 'request', '/slug/')
+
+        self.assertEqual(response, ('request', 'route', 'slug'))
+
+
 class SimpleHandlerHandleTest(TestCase):
     """Test SimpleHandler.handle()."""
     def setUp(self):
@@ -84,9 +168,10 @@ class SimpleHandlerHandleTest(TestCase):
         class TestHandler(SimpleHandler):
             view = mock.MagicMock()
 
-        self.route = mock.Mock()
-        self.request = mock.Mock()
-        self.handler = TestHandler(self.route)
+        modified = datetime.datetime(2015, 7, 1, 12)
+        self.route = mock.Mock(pk=42, modified=modified)
+        self.request = RequestFactory().get('/')
+        self.handler = TestHandler()
         self.route.get_handler.return_value = self.handler
         self.view = TestHandler.view
 
@@ -96,7 +181,7 @@ class SimpleHandlerHandleTest(TestCase):
 
     def test_handle_basic(self):
         """Show that SimpleHandler.view is used to process the request."""
-        response = self.handler.handle(self.request, '/')
+        response = self.handler.handle(self.route, self.request, '/')
 
         self.view.assert_called_with(self.request, route=self.route)
         expected = self.view(self.request, route=self.route)
@@ -105,18 +190,148 @@ class SimpleHandlerHandleTest(TestCase):
     def test_handle_slug(self):
         """Show that slugs are not accepted."""
         with self.assertRaises(Resolver404):
-            self.handler.handle(self.request, '/slug/')
+            self.handler.handle(self.route, self.request, '/slug/')
 
         self.assertFalse(self.view.called)
 
+    def test_no_resolver(self):
+        """SimpleHandler does not need a resolver."""
+        self.assertIsNone(self.handler.resolver)
+
     def test_handle_pk(self):
         """Show that pks are not accepted."""
         with self.assertRaises(Resolver404):
-            self.handler.handle(self.request, '/42/')
+            self.handler.handle(self.route, self.request, '/42/')
 
         self.assertFalse(self.view.called)
 
 
+class SimpleHandlerConditionalTest(TestCase):
+    """Test SimpleHandler answers conditional GETs from Route.modified."""
+    def setUp(self):
+        """Create a Handler with a view, and a route."""
+        class TestHandler(SimpleHandler):
+            view = mock.Mock(return_value=HttpResponse('content'))
+
+        self.handler = TestHandler()
+        self.view = TestHandler.view
+        modified = datetime.datetime(2015, 7, 1, 12)
+        self.route = mock.Mock(pk=42, modified=modified)
+        self.last_modified = http_date(modified.timestamp())
+
+    def test_headers(self):
+        """Test that responses carry the Route's ETag and Last-Modified time."""
+        request = RequestFactory().get('/')
+        response = self.handler.handle(self.route, request, '/')
+
+        self.assertEqual(response['ETag'], quote_etag(route_etag(request, self.route)))
+        self.assertEqual(response['Last-Modified'], self.last_modified)
+
+    def test_if_modified_since(self):
+        """The view is not called if the Route is unmodified since the given time."""
+        request = RequestFactory().get('/', HTTP_IF_MODIFIED_SINCE=self.last_modified)
+        response = self.handler.handle(self.route, request, '/')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(self.view.called)
+
+    def test_if_none_match(self):
+        """The view is not called if the ETag of the Route matches."""
+        etag = quote_etag(route_etag(None, self.route))
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag)
+        response = self.handler.handle(self.route, request, '/')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(self.view.called)
+
+    def test_modified(self):
+        """The view is called if the Route has been modified since."""
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH='"42-old"')
+        response = self.handler.handle(self.route, request, '/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.view.called)
+
+    def test_not_conditional(self):
+        """Test that handlers that are not `conditional` always call the view."""
+        class TestHandler(SimpleHandler):
+            conditional = False
+            view = mock.Mock(return_value=HttpResponse('content'))
+
+        etag = quote_etag(route_etag(None, self.route))
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=etag)
+        response = TestHandler().handle(self.route, request, '/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_route_records(self):
+        """Test that handlers that take records are never `conditional`."""
+        class TestHandler(SimpleHandler):
+            route_records = True
+            view = mock.Mock(return_value=HttpResponse('content'))
+
+        handler = TestHandler()
+
+        self.assertFalse(handler.conditional)
+        self.assertIs(handler.conditional_view, handler.view)
+
+
+class SimpleHandlerHandleAsyncTest(CoroutineTestCase):
+    """Test SimpleHandler.handle_async(), and coroutine views."""
+    def setUp(self):
+        """Create Handlers with a coroutine view, and a sync view."""
+        super().setUp()
+
+        @asyncio.coroutine
+        def coroutine_view(request, route):
+            yield from asyncio.sleep(0)
+            return HttpResponse('{} {}'.format(request.path, route.pk))
+
+        class AsyncHandler(SimpleHandler):
+            view = coroutine_view
+
+        class SyncHandler(SimpleHandler):
+            view = mock.Mock(return_value=HttpResponse('content'))
+
+        self.async_handler = AsyncHandler()
+        self.sync_handler = SyncHandler()
+        modified = datetime.datetime(2015, 7, 1, 12)
+        self.route = mock.Mock(pk=42, modified=modified)
+        self.request = RequestFactory().get('/')
+
+    def test_coroutine_view(self):
+        """Coroutine views are waited for."""
+        coroutine = self.async_handler.handle_async(self.route, self.request, '/')
+        response = self.run_until_complete(coroutine)
+
+        self.assertEqual(response.content, b'/ 42')
+
+    def test_coroutine_view_not_conditional(self):
+        """Coroutine views are not wrapped to answer conditional GETs."""
+        self.assertIs(self.async_handler.conditional_view, self.async_handler.view)
+
+    def test_sync_view(self):
+        """Other views are run in the executor, and still answer conditional GETs."""
+        coroutine = self.sync_handler.handle_async(self.route, self.request, '/')
+        response = self.run_until_complete(coroutine)
+
+        self.assertEqual(response.content, b'content')
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_handle_slug(self):
+        """Test that slugs are not accepted."""
+        with self.assertRaises(Resolver404):
+            coroutine = self.sync_handler.handle_async(self.route, self.request, '/slug/')
+            self.run_until_complete(coroutine)
+
+    def test_handle(self):
+        """Coroutine views can be used by the synchronous `handle` too."""
+        response = self.async_handler.handle(self.route, self.request, '/')
+
+        self.assertEqual(response.content, b'/ 42')
+
+
 class SimpleHandlerViewBindingTest(TestCase):
     """Views should not unexpectedly "bind" to SimpleHandler subclasses."""
     def test_unbound_function(self):
@@ -127,7 +342,7 @@ class SimpleHandlerViewBindingTest(TestCase):
         class TestHandler(SimpleHandler):
             view = unbound_function
 
-        handler = TestHandler(None)  # First arg here not used
+        handler = TestHandler()
         request = mock.Mock()
         response = handler.view(request)
         self.assertIs(response, request)
@@ -141,8 +356,41 @@ class SimpleHandlerViewBindingTest(TestCase):
         class TestHandler(SimpleHandler):
             view = TestView.as_view()
 
-        handler = TestHandler(None)  # First arg here not used
+        handler = TestHandler()
         request = mock.Mock()
         self_arg, request_arg = handler.view(request)
         self.assertIsInstance(self_arg, TestView)
         self.assertIs(request_arg, request)
+
+
+class HandlerRegistryTest(TestCase):
+    """Test HandlerRegistry shares handler instances."""
+    def setUp(self):
+        """Create an empty registry."""
+        self.registry = HandlerRegistry()
+
+    def test_get(self):
+        """An instance of the handler class at the path is returned."""
+        handler = self.registry.get(SimpleHandler.path())
+        self.assertIsInstance(handler, SimpleHandler)
+
+    def test_get_again(self):
+        """The same instance is returned every time."""
+        first = self.registry.get(SimpleHandler.path())
+        second = self.registry.get(SimpleHandler.path())
+        self.assertIs(first, second)
+
+    def test_load(self):
+        """Test that handlers of Route models are loaded in advance."""
+        class Model:
+            handler = SimpleHandler.path()
+
+        self.registry.load([Model, object])
+
+        self.assertEqual(list(self.registry.handlers), [SimpleHandler.path()])
+        self.assertIsInstance(self.registry.handlers[Model.handler], SimpleHandler)
+
+    def test_loaded_on_ready(self):
+        """The handlers of Route subclasses are loaded when the app is ready."""
+        self.assertIn(PageHandler.path(), registry.handlers)
+        self.assertIn(RouteRedirectHandler.path(), registry.handlers)
@@ -0,0 +1,134 @@
+from unittest import mock
+
+from django.test import override_settings, TestCase
+
+from .factories import ChildRouteFactory, RouteFactory
+from .. import index
+
+
+class TestURLComponents(TestCase):
+    """Test the url_components function."""
+    def test_root(self):
+        """The root path has no components."""
+        self.assertEqual(index.url_components('/'), [])
+
+    def test_empty(self):
+        """An empty path has no components."""
+        self.assertEqual(index.url_components(''), [])
+
+    def test_path(self):
+        """A path is split on slashes."""
+        components = index.url_components('/a/path/')
+        self.assertEqual(components, ['a', 'path'])
+
+    def test_without_trailing_slash(self):
+        """A trailing slash is not required."""
+        components = index.url_components('/a/path')
+        self.assertEqual(components, ['a', 'path'])
+
+
+class TestRouteIndex(TestCase):
+    """Test RouteIndex.best_match_for_path."""
+    def setUp(self):
+        """Create an index of a small tree of routes."""
+        self.index = index.RouteIndex([
+            (1, '/', 10),
+            (2, '/branch/', 20),
+            (3, '/branch/leaf/', 30),
+        ])
+
+    def test_root(self):
+        """The root path matches the Root Route."""
+        match = self.index.best_match_for_path('/')
+        self.assertEqual(match, (1, '/', 10))
+
+    def test_leaf(self):
+        """A path matches the Route with that url."""
+        match = self.index.best_match_for_path('/branch/leaf/')
+        self.assertEqual(match, (3, '/branch/leaf/', 30))
+
+    def test_fall_back_to_branch(self):
+        """A path with no exact match matches the longest url prefix."""
+        match = self.index.best_match_for_path('/branch/absent/leaf/')
+        self.assertEqual(match, (2, '/branch/', 20))
+
+    def test_fall_back_to_root(self):
+        """A path with no matching prefix matches the Root Route."""
+        match = self.index.best_match_for_path('/absent/')
+        self.assertEqual(match, (1, '/', 10))
+
+    def test_no_match(self):
+        """LookupError is raised when nothing matches."""
+        empty_index = index.RouteIndex([(2, '/branch/', 20)])
+        with self.assertRaises(LookupError):
+            empty_index.best_match_for_path('/absent/')
+
+    def test_hosts(self):
+        """Test that Routes on other hosts are not matched."""
+        hosts_index = index.RouteIndex([
+            (1, '/', 10, 'example.com'),
+            (2, '/', 20, 'example.org'),
+            (3, '/branch/', 30, 'example.org'),
+        ])
+
+        match = hosts_index.best_match_for_path('/branch/', 'example.com')
+        self.assertEqual(match, (1, '/', 10))
+        match = hosts_index.best_match_for_path('/branch/', 'example.org')
+        self.assertEqual(match, (3, '/branch/', 30))
+        with self.assertRaises(LookupError):
+            hosts_index.best_match_for_path('/branch/', 'example.net')
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_build_hosts(self):
+        """With CONMAN_MULTIPLE_HOSTS, the index is built with each Route's host."""
+        branch = ChildRouteFactory.create(slug='branch', parent__host='example.com')
+
+        route_index = index.RouteIndex.build()
+
+        match = route_index.best_match_for_path('/branch/', 'example.com')
+        self.assertEqual(match, (branch.pk, branch.url, branch.polymorphic_ctype_id))
+        with self.assertRaises(LookupError):
+            route_index.best_match_for_path('/branch/')
+
+    def test_build(self):
+        """An index can be built from the Routes in the database."""
+        branch = ChildRouteFactory.create(slug='branch')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+
+        with self.assertNumQueries(1):
+            route_index = index.RouteIndex.build(version=42)
+
+        match = route_index.best_match_for_path('/branch/leaf/absent/')
+        expected = (leaf.pk, leaf.url, leaf.polymorphic_ctype_id)
+        self.assertEqual(match, expected)
+        self.assertEqual(route_index.version, 42)
+
+
+class TestIndexCache(TestCase):
+    """Test IndexCache keeps its RouteIndex up to date."""
+    def setUp(self):
+        """Create an IndexCache that follows a fake generation."""
+        self.generation = mock.Mock()
+        self.generation.get.return_value = 1
+        self.cache = index.IndexCache(self.generation)
+
+    def test_get(self):
+        """An index is built on first use, and then reused."""
+        with self.assertNumQueries(1):
+            first = self.cache.get()
+        with self.assertNumQueries(0):
+            second = self.cache.get()
+
+        self.assertIs(first, second)
+        self.assertEqual(first.version, 1)
+
+    def test_new_generation(self):
+        """The index is rebuilt when the generation changes."""
+        first = self.cache.get()
+
+        self.generation.get.return_value = 2
+        with self.assertNumQueries(1):
+            second = self.cache.get()
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.version, 2)
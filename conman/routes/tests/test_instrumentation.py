@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+
+from conman.pages.tests.factories import PageFactory
+from .. import instrumentation
+from ..instrumentation import get_recorder, Phase, start, stop, timed
+from ..models import Route
+from ..signals import phase_timed
+
+
+class TimedTest(TestCase):
+    """Test timed records phases while a Recorder is active."""
+    def tearDown(self):
+        """Make sure no Recorder is left running."""
+        stop()
+
+    def test_not_recording(self):
+        """Nothing is recorded without a Recorder."""
+        with timed('phase'):
+            pass
+
+        self.assertIsNone(get_recorder())
+
+    def test_recording(self):
+        """The duration and queries of a phase are recorded."""
+        recorder = start()
+        with mock.patch('time.perf_counter', side_effect=[1.0, 1.5]):
+            with timed('phase'):
+                Route.objects.count()
+
+        self.assertEqual(recorder.phases, [Phase('phase', 0.5, 1)])
+
+    def test_all_connections(self):
+        """Test that queries are counted on every database connection."""
+        other = mock.Mock(queries_log=[], force_debug_cursor=False)
+        all_connections = [connection, other]
+        with mock.patch.object(instrumentation.connections, 'all') as mock_all:
+            mock_all.return_value = all_connections
+            recorder = start()
+            with timed('phase'):
+                Route.objects.count()
+                other.queries_log.extend(['SELECT 1', 'SELECT 2'])
+            stop()
+
+        self.assertEqual(recorder.phases[0].queries, 3)
+        self.assertFalse(other.force_debug_cursor)
+
+    def test_decorator(self):
+        """Test that phases can be marked out with a decorator."""
+        @timed('decorated')
+        def function():
+            return 'result'
+
+        recorder = start()
+        self.assertEqual(function(), 'result')
+
+        self.assertEqual([phase.name for phase in recorder.phases], ['decorated'])
+
+    def test_nested(self):
+        """Test that phases can be nested, and are recorded as they end."""
+        recorder = start()
+        with timed('outer'):
+            with timed('inner'):
+                pass
+
+        self.assertEqual([phase.name for phase in recorder.phases], ['inner', 'outer'])
+
+    def test_signal(self):
+        """The `phase_timed` signal is sent for each phase."""
+        receiver = mock.Mock()
+        phase_timed.connect(receiver)
+        self.addCleanup(phase_timed.disconnect, receiver)
+
+        recorder = start()
+        with timed('phase'):
+            pass
+
+        receiver.assert_called_once_with(
+            sender=instrumentation.Recorder,
+            signal=phase_timed,
+            phase=recorder.phases[0],
+        )
+
+    def test_total(self):
+        """The total covers everything since the Recorder started."""
+        with mock.patch('time.perf_counter', side_effect=[1.0, 3.0]):
+            recorder = start()
+            Route.objects.count()
+            total = recorder.total()
+
+        self.assertEqual(total, Phase('total', 2.0, 1))
+
+    def test_routing_phases(self):
+        """The phases of routing a request are recorded."""
+        page = PageFactory.create()
+        recorder = start()
+        self.client.get(page.url)
+
+        names = [phase.name for phase in recorder.phases]
+        self.assertEqual(names, ['route', 'handler', 'view', 'handle'])
+
+
+class StartStopTest(TestCase):
+    """Test start and stop."""
+    def test_debug_cursor(self):
+        """Test that queries are logged while recording, then the setting restored."""
+        connection.force_debug_cursor = False
+        start()
+        self.assertTrue(connection.force_debug_cursor)
+
+        stop()
+        self.assertFalse(connection.force_debug_cursor)
+
+    def test_stop(self):
+        """The Recorder that was active is returned."""
+        recorder = start()
+        self.assertIs(stop(), recorder)
+        self.assertIsNone(get_recorder())
+
+    def test_stop_not_started(self):
+        """Stopping when not recording returns None."""
+        self.assertIsNone(stop())
+
+    def test_start_again(self):
+        """Starting again replaces a Recorder that was never stopped."""
+        connection.force_debug_cursor = False
+        start()
+        recorder = start()
+
+        self.assertIs(stop(), recorder)
+        self.assertFalse(connection.force_debug_cursor)
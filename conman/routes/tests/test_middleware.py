@@ -0,0 +1,63 @@
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from ..instrumentation import get_recorder, stop
+from ..middleware import ServerTimingMiddleware
+
+
+@override_settings(MIDDLEWARE_CLASSES=['conman.routes.middleware.ServerTimingMiddleware'])
+class ServerTimingMiddlewareTest(TestCase):
+    """Test ServerTimingMiddleware reports the phases of routing."""
+    def tearDown(self):
+        """Make sure no Recorder is left running."""
+        stop()
+
+    def test_header(self):
+        """The duration and queries of each phase are in Server-Timing."""
+        page = PageFactory.create()
+        response = self.client.get(page.url)
+
+        entries = response['Server-Timing'].split(', ')
+        names = [entry.split(';')[0] for entry in entries]
+        self.assertEqual(names, ['route', 'handler', 'view', 'handle', 'total'])
+        self.assertRegex(entries[0], r'^route;dur=\d+\.\d{3};desc="1 queries"$')
+
+    def test_stopped(self):
+        """Recording stops once the response is ready."""
+        page = PageFactory.create()
+        self.client.get(page.url)
+
+        self.assertIsNone(get_recorder())
+
+    def test_logged(self):
+        """Each phase is logged."""
+        page = PageFactory.create()
+
+        with self.assertLogs('conman.routes.timing', 'DEBUG') as logs:
+            self.client.get(page.url)
+
+        self.assertEqual(len(logs.output), 5)
+        self.assertIn('GET /: route took', logs.output[0])
+
+
+class ServerTimingMiddlewareNoPhasesTest(TestCase):
+    """Test ServerTimingMiddleware leaves responses without phases alone."""
+    def setUp(self):
+        """Create the middleware, a request and a response."""
+        self.middleware = ServerTimingMiddleware()
+        self.request = RequestFactory().get('/')
+        self.response = HttpResponse()
+
+    def test_no_phases(self):
+        """No header is added if nothing was routed."""
+        self.middleware.process_request(self.request)
+        response = self.middleware.process_response(self.request, self.response)
+
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_not_started(self):
+        """No header is added if recording never started."""
+        response = self.middleware.process_response(self.request, self.response)
+
+        self.assertFalse(response.has_header('Server-Timing'))
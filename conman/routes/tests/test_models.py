@@ -1,11 +1,19 @@
+import asyncio
 from unittest import mock
 
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import override_settings, TestCase
 
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.models import RouteRedirect
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
 from .factories import ChildRouteFactory, RootRouteFactory, RouteFactory
+from .test_coroutines import CoroutineTestCase
 from .. import handlers
+from ..generation import route_generation
 from ..models import Route
+from ..utils import url_hash
 
 
 NODE_BASE_FIELDS = (
@@ -13,6 +21,9 @@ NODE_BASE_FIELDS = (
     'parent_id',
     'slug',
     'url',
+    'url_hash',
+    'host',
+    'modified',
 
     # MPTT fields
     'level',
@@ -26,6 +37,7 @@ NODE_BASE_FIELDS = (
 
     # Incoming foreign keys
     'children',  # FK from self. The other end of "parent".
+    'url_rewrites',  # FK from UrlRewrite.
 )
 
 
@@ -192,6 +204,125 @@ class RouteCachesURLOnMoveTest(TestCase):
         self.assertEqual(leaf.url, '/bar/branch/leaf/')
 
 
+class RouteRewriteDescendantURLsTest(TestCase):
+    """Make sure descendant urls are rewritten in bulk."""
+    def test_constant_queries(self):
+        """Renaming a branch costs the same however many descendants it has."""
+        branch = ChildRouteFactory.create(slug='foo')
+        for i in range(5):
+            ChildRouteFactory.create(parent=branch)
+
+        branch.slug = 'bar'
+        with self.assertNumQueries(5):
+            # Five queries:
+            # * Create a savepoint.
+            # * Update the branch.
+            # * Update the urls and url hashes of the descendants.
+            # * Update the target urls of redirects into the branch.
+            # * Release the savepoint.
+            branch.save()
+
+    def test_rename_leaves_siblings(self):
+        """Test that Routes outside the renamed branch keep their urls."""
+        branch = ChildRouteFactory.create(slug='foo')
+        sibling = ChildRouteFactory.create(slug='foobar')
+        sibling_leaf = RouteFactory.create(slug='leaf', parent=sibling)
+
+        branch.slug = 'bar'
+        branch.save()
+
+        sibling_leaf = Route.objects.get(pk=sibling_leaf.pk)
+        self.assertEqual(sibling_leaf.url, '/foobar/leaf/')
+
+    def test_same_as_slugs(self):
+        """Rewritten urls match those built from the Routes' slugs."""
+        trunk = ChildRouteFactory.create(slug='trunk')
+        branch = RouteFactory.create(slug='branch', parent=trunk)
+        RouteFactory.create(slug='leaf', parent=branch)
+        RouteFactory.create(slug='other-leaf', parent=branch)
+        RouteFactory.create(slug='twig', parent=trunk)
+        new_trunk = ChildRouteFactory.create(slug='new-trunk')
+
+        branch.parent = new_trunk
+        branch.save()
+
+        for route in Route.objects.exclude(parent=None):
+            expected = '{}{}/'.format(route.parent.url, route.slug)
+            self.assertEqual(route.url, expected)
+
+    def test_descendants_modified(self):
+        """Test that descendants are marked as modified along with the renamed Route."""
+        branch = ChildRouteFactory.create(slug='foo')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+
+        branch.slug = 'bar'
+        branch.save()
+
+        leaf = Route.objects.get(pk=leaf.pk)
+        self.assertEqual(leaf.modified, branch.modified)
+
+    def test_descendants_rehashed(self):
+        """The url hashes of descendants match their new urls."""
+        branch = ChildRouteFactory.create(slug='foo')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+
+        branch.slug = 'bar'
+        branch.save()
+
+        leaf = Route.objects.get(pk=leaf.pk)
+        self.assertEqual(branch.url_hash, url_hash('/bar/'))
+        self.assertEqual(leaf.url_hash, url_hash('/bar/leaf/'))
+
+    def test_hashed_in_python(self):
+        """Where the database can't hash urls, they are hashed in Python."""
+        branch = ChildRouteFactory.create(slug='foo')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+
+        branch.slug = 'bar'
+        with mock.patch('conman.routes.models.can_hash_urls', return_value=False):
+            branch.save()
+
+        leaf = Route.objects.get(pk=leaf.pk)
+        self.assertEqual(leaf.url, '/bar/leaf/')
+        self.assertEqual(leaf.url_hash, url_hash('/bar/leaf/'))
+        self.assertEqual(leaf.modified, branch.modified)
+
+    def test_rehash_batches(self):
+        """Hashed in Python, urls are updated `REHASH_BATCH_SIZE` at a time."""
+        branch = ChildRouteFactory.create(slug='foo')
+        for i in range(3):
+            ChildRouteFactory.create(parent=branch)
+        descendants = branch.get_descendants()
+
+        with mock.patch('conman.routes.models.can_hash_urls', return_value=False):
+            with mock.patch('conman.routes.models.REHASH_BATCH_SIZE', 2):
+                with self.assertNumQueries(3):
+                    # Three queries:
+                    # * Get the urls of the descendants.
+                    # * Update the first two.
+                    # * Update the last one.
+                    count = Route.objects.rewrite_urls(descendants, '/foo/', '/bar/')
+
+        self.assertEqual(count, 3)
+        for route in descendants:
+            self.assertEqual(route.url_hash, url_hash(route.url))
+
+    def test_rolled_back(self):
+        """The Route is not saved if rewriting its descendants fails."""
+        branch = ChildRouteFactory.create(slug='foo')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+        branch.slug = 'bar'
+
+        rewrite_path = 'conman.routes.models.Route.rewrite_descendant_urls'
+        with mock.patch(rewrite_path, side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                branch.save()
+
+        self.assertEqual(Route.objects.get(pk=branch.pk).url, '/foo/')
+        self.assertEqual(Route.objects.get(pk=leaf.pk).url, '/foo/leaf/')
+
+
+@override_settings(CONMAN_ROUTE_LOOKUP='url')
 class RouteManagerBestMatchForPathTest(TestCase):
     """
     Test Route.objects.best_match_for_path works with perfect url matches.
@@ -250,6 +381,7 @@ class RouteManagerBestMatchForPathTest(TestCase):
         self.assertEqual(route, branch)
 
 
+@override_settings(CONMAN_ROUTE_LOOKUP='url')
 class RouteManagerBestMatchForBrokenPathTest(TestCase):
     """
     Test Route.objects.best_match_for_path works without a perfect url match.
@@ -295,6 +427,330 @@ class RouteManagerBestMatchForBrokenPathTest(TestCase):
         self.assertEqual(route, branch)
 
 
+@override_settings(CONMAN_ROUTE_LOOKUP='hash')
+class RouteManagerBestMatchFromHashesTest(RouteManagerBestMatchForPathTest):
+    """
+    Test Route.objects.best_match_for_path looking Routes up by url hash.
+
+    All of these tests assert use of only one query:
+        * Get the Routes matching the hashes of the sub-paths, deepest first:
+            SELECT <fields>
+            FROM "routes_route"
+            WHERE "routes_route"."url_hash" IN (<hash of each sub-path>)
+            ORDER BY "routes_route"."level" DESC
+    """
+    def test_hash_collision(self):
+        """A Route whose hash matches, but whose url does not, is skipped."""
+        root = RootRouteFactory.create()
+        leaf = ChildRouteFactory.create(slug='leaf', parent=root)
+        Route.objects.filter(pk=leaf.pk).update(url_hash=url_hash('/other/'))
+
+        route = Route.objects.best_match_for_path('/other/')
+
+        self.assertEqual(route, root)
+
+
+@override_settings(CONMAN_ROUTE_LOOKUP='hash')
+class RouteManagerBestMatchFromHashesForBrokenPathTest(
+    RouteManagerBestMatchForBrokenPathTest,
+):
+    """Test Route.objects.best_match_for_path by url hash without a perfect match."""
+
+
+@override_settings(CONMAN_ROUTE_LOOKUP='prefix')
+class RouteManagerBestMatchFromPrefixesTest(RouteManagerBestMatchForPathTest):
+    """
+    Test Route.objects.best_match_for_path letting the database split the path.
+
+    All of these tests assert use of only one query:
+        * Get the best Route among the sub-paths of the path:
+            SELECT
+                (LENGTH(url)) AS "length",
+                <other fields>
+            FROM "routes_route"
+            WHERE "routes_route"."url" IN (
+                WITH RECURSIVE positions(i) AS (...)
+                SELECT SUBSTR('/url/split/', 1, i) FROM positions
+                WHERE SUBSTR('/url/split/', i, 1) = '/'
+            )
+            ORDER BY "length" DESC
+            LIMIT 1
+    """
+    def test_no_trailing_slash(self):
+        """The last component of a path matches without a trailing slash."""
+        branch = ChildRouteFactory.create(slug='branch')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+
+        route = Route.objects.best_match_for_path('/branch/leaf')
+
+        self.assertEqual(route, leaf)
+
+    def test_subclass_manager(self):
+        """Subclass managers look up urls in the Route table too."""
+        page = PageFactory.create(slug='page', parent=RootRouteFactory.create())
+
+        route = Page.objects.best_match_for_path('/page/')
+
+        self.assertEqual(route, page)
+
+
+@override_settings(CONMAN_ROUTE_LOOKUP='prefix')
+class RouteManagerBestMatchFromPrefixesForBrokenPathTest(
+    RouteManagerBestMatchForBrokenPathTest,
+):
+    """Test Route.objects.best_match_for_path by prefix without a perfect match."""
+
+
+class RouteHostTest(TestCase):
+    """Test the host of each tree of Routes."""
+    def setUp(self):
+        """Create a branch on a host."""
+        self.root = RootRouteFactory.create(host='example.com')
+        self.branch = ChildRouteFactory.create(parent=self.root, slug='branch')
+        self.leaf = ChildRouteFactory.create(parent=self.branch, slug='leaf')
+
+    def test_inherited(self):
+        """Test that Routes are on the host of their Root Route."""
+        self.assertEqual(self.leaf.host, 'example.com')
+
+    def test_child_host_ignored(self):
+        """A Child Route can't be given a host of its own."""
+        self.leaf.host = 'example.org'
+        self.leaf.save()
+
+        self.assertEqual(Route.objects.get(pk=self.leaf.pk).host, 'example.com')
+
+    def test_root_moved(self):
+        """Changing the host of a Root Route moves its descendants too."""
+        self.root.host = 'example.org'
+        self.root.save()
+
+        hosts = set(Route.objects.values_list('host', flat=True))
+        self.assertEqual(hosts, {'example.org'})
+
+    @override_settings(CONMAN_DEFER_URL_REWRITES=True)
+    def test_root_moved_deferred(self):
+        """Test that descendants move host at once, even when rewrites are deferred."""
+        self.root.host = 'example.org'
+        self.root.save()
+
+        self.assertEqual(Route.objects.get(pk=self.leaf.pk).host, 'example.org')
+
+    def test_branch_moved(self):
+        """Moving a branch into another host's tree moves its descendants too."""
+        other_root = RootRouteFactory.create(host='example.org')
+
+        self.branch.parent = other_root
+        self.branch.save()
+
+        leaf = Route.objects.get(pk=self.leaf.pk)
+        self.assertEqual((leaf.host, leaf.url), ('example.org', '/branch/leaf/'))
+
+    def test_unique_per_host(self):
+        """Test that urls only need to be unique on each host."""
+        other_root = RootRouteFactory.create(host='example.org')
+        ChildRouteFactory.create(parent=other_root, slug='branch')
+
+        with self.assertRaises(IntegrityError):
+            RouteFactory.create(host='example.org')
+
+
+class RouteManagerBestMatchForHostTest(TestCase):
+    """Test Route.objects.best_match_for_path only matches Routes on the host."""
+    def setUp(self):
+        """Create a branch on each of two hosts, and a leaf on one."""
+        route_generation.bump()
+        self.branches = {}
+        for host in ('example.com', 'example.org'):
+            root = RootRouteFactory.create(host=host)
+            self.branches[host] = ChildRouteFactory.create(parent=root, slug='branch')
+        self.leaf = ChildRouteFactory.create(
+            parent=self.branches['example.com'],
+            slug='leaf',
+        )
+
+    def test_lookups(self):
+        """Each lookup finds the best match on the host."""
+        path = '/branch/leaf/'
+        for lookup in ('url', 'hash', 'prefix'):
+            with self.subTest(lookup=lookup):
+                with override_settings(CONMAN_ROUTE_LOOKUP=lookup):
+                    route = Route.objects.best_match_for_path(path, 'example.org')
+                self.assertEqual(route, self.branches['example.org'])
+
+    @override_settings(CONMAN_ROUTE_INDEX=True, CONMAN_MULTIPLE_HOSTS=True)
+    def test_index(self):
+        """The index finds the best match on the host."""
+        route = Route.objects.best_match_for_path('/branch/leaf/', 'example.org')
+        self.assertEqual(route, self.branches['example.org'])
+
+    def test_record(self):
+        """Test that records are found for the best match on the host."""
+        record = Route.objects.best_record_for_path('/branch/leaf/', 'example.com')
+        self.assertEqual(record.pk, self.leaf.pk)
+
+    def test_any_host(self):
+        """Without a host, Routes on any host are matched."""
+        route = Route.objects.best_match_for_path('/branch/leaf/')
+        self.assertEqual(route, self.leaf)
+
+    def test_unknown_host(self):
+        """Nothing matches on a host without Routes."""
+        with self.assertRaises(Route.DoesNotExist):
+            Route.objects.best_match_for_path('/branch/', 'example.net')
+
+
+class RouteManagerGetLookupTest(TestCase):
+    """Test Route.objects.get_lookup."""
+    @override_settings(CONMAN_ROUTE_LOOKUP='hash')
+    def test_setting(self):
+        """A lookup named in the setting is used."""
+        self.assertEqual(Route.objects.get_lookup(), 'hash')
+
+    def test_auto(self):
+        """By default, urls are looked up directly on most databases."""
+        with mock.patch('django.db.connection.vendor', 'sqlite'):
+            self.assertEqual(Route.objects.get_lookup(), 'url')
+
+    def test_auto_postgresql(self):
+        """By default, the database splits the path on PostgreSQL."""
+        with mock.patch('django.db.connection.vendor', 'postgresql'):
+            self.assertEqual(Route.objects.get_lookup(), 'prefix')
+
+
+@override_settings(CONMAN_ROUTE_INDEX=True)
+class RouteManagerBestMatchFromIndexTest(TestCase):
+    """Test Route.objects.best_match_for_path with the Route index enabled."""
+    def setUp(self):
+        """Make sure no index is left over from other tests."""
+        route_generation.bump()
+
+    def test_get_leaf(self):
+        """Check a Route is matched from the index, then fetched."""
+        branch = ChildRouteFactory.create(slug='branch')
+        leaf = RouteFactory.create(slug='leaf', parent=branch)
+        # Build the index.
+        Route.objects.best_match_for_path('/')
+
+        with self.assertNumQueries(1):
+            # One query:
+            # * Get the Route by pk.
+            route = Route.objects.best_match_for_path('/branch/leaf/')
+
+        self.assertEqual(route, leaf)
+
+    def test_fall_back_to_branch(self):
+        """Check a Branch Route matches when no Leaf Route matches."""
+        branch = ChildRouteFactory.create(slug='branch')
+
+        route = Route.objects.best_match_for_path('/branch/absent-leaf/')
+
+        self.assertEqual(route, branch)
+
+    def test_concrete_class(self):
+        """The matched Route is an instance of its concrete class."""
+        page = PageFactory.create()
+
+        route = Route.objects.best_match_for_path('/')
+
+        self.assertIsInstance(route, Page)
+        self.assertEqual(route, page)
+
+    def test_rebuilt_after_save(self):
+        """Check a new Route is matched once it has been saved."""
+        root = RootRouteFactory.create()
+        self.assertEqual(Route.objects.best_match_for_path('/leaf/'), root)
+
+        leaf = ChildRouteFactory.create(slug='leaf')
+
+        self.assertEqual(Route.objects.best_match_for_path('/leaf/'), leaf)
+
+    def test_throw_error_without_match(self):
+        """Check Route.DoesNotExist is raised if no Root Route exists."""
+        with self.assertRaises(Route.DoesNotExist):
+            Route.objects.best_match_for_path('/')
+
+
+class RouteManagerSelectSubclassesTest(TestCase):
+    """Test Route.objects.select_subclasses and Route.downcast."""
+    def test_page(self):
+        """A Page is fetched in one query."""
+        page = PageFactory.create()
+
+        with self.assertNumQueries(1):
+            route = Route.objects.select_subclasses().get(pk=page.pk).downcast()
+
+        self.assertIsInstance(route, Page)
+        self.assertEqual(route, page)
+
+    def test_redirect(self):
+        """A RouteRedirect, with the url of its target, is fetched in one query."""
+        redirect = ChildRouteRedirectFactory.create()
+
+        with self.assertNumQueries(1):
+            route = Route.objects.select_subclasses().get(pk=redirect.pk).downcast()
+            target_url = route.target_url
+
+        self.assertIsInstance(route, RouteRedirect)
+        self.assertEqual(target_url, redirect.target.url)
+
+    def test_routing_select_related(self):
+        """Test that relations in a subclass's routing_select_related are fetched too."""
+        redirect = ChildRouteRedirectFactory.create()
+
+        with mock.patch.object(RouteRedirect, 'routing_select_related', ('target',)):
+            with self.assertNumQueries(1):
+                route = Route.objects.select_subclasses().get(pk=redirect.pk)
+                target = route.downcast().target
+
+        self.assertEqual(target, redirect.target)
+
+    def test_route(self):
+        """A Route without a subclass is fetched in one query."""
+        root = RootRouteFactory.create()
+
+        with self.assertNumQueries(1):
+            route = Route.objects.select_subclasses().get(pk=root.pk).downcast()
+
+        self.assertIs(type(route), Route)
+
+    def test_downcast_without_select_subclasses(self):
+        """A Route not from select_subclasses is downcast with another query."""
+        page = PageFactory.create()
+        route = Route.objects.non_polymorphic().get(pk=page.pk)
+
+        with self.assertNumQueries(1):
+            route = route.downcast()
+
+        self.assertIsInstance(route, Page)
+
+    def test_relations(self):
+        """Test that subclass relations and their routing_select_related are listed."""
+        with mock.patch.object(RouteRedirect, 'routing_select_related', ('target',)):
+            relations = Route.get_subclass_relations()
+
+        expected = ['page', 'routeredirect', 'routeredirect__target']
+        self.assertCountEqual(relations, expected)
+
+    def test_nested_relations(self):
+        """Test that relations to subclasses of subclasses are prefixed."""
+        with mock.patch.object(Page, 'get_subclass_relations') as relations:
+            relations.return_value = ['fancypage']
+            self.assertIn('page__fancypage', Route.get_subclass_relations())
+
+    def test_discover_proxy(self):
+        """Proxy models are not subclasses with tables of their own."""
+        class ProxyPage(Page):
+            handler = Page.handler
+
+            class Meta:
+                proxy = True
+
+        Page.discover_subclasses()
+
+        self.assertEqual(Page.get_subclass_links(), [])
+
+
 class RouteGetHandlerClassTest(TestCase):
     """Check the behaviour of Route().get_handler_class()."""
     def test_get_handler_class(self):
@@ -309,25 +765,26 @@ class RouteGetHandlerClassTest(TestCase):
 class RouteGetHandlerTest(TestCase):
     """Make sure that Route.get_handler acts as expected."""
     def test_get_handler(self):
-        """We expect an instance of handler instanciated with a Route."""
-        handler_class = handlers.BaseHandler
+        """We expect an instance of the Route's handler class."""
+        handler_class = handlers.SimpleHandler
         route = RouteFactory.build()
         route.handler = handler_class.path()
 
         handler = route.get_handler()
         self.assertIsInstance(handler, handler_class)
-        self.assertEqual(handler.route, route)
 
     def test_get_handler_again(self):
-        """Make sure we always get the same instance of a handler on a Route."""
-        handler_class = handlers.BaseHandler
+        """Make sure we always get the same instance of a handler."""
+        handler_class = handlers.SimpleHandler
         route = RouteFactory.build()
         route.handler = handler_class.path()
+        other_route = RouteFactory.build()
+        other_route.handler = handler_class.path()
 
         first_handler = route.get_handler()
-        second_handler = route.get_handler()
+        second_handler = other_route.get_handler()
 
-        self.assertEqual(first_handler, second_handler)
+        self.assertIs(first_handler, second_handler)
 
 
 class RouteHandleTest(TestCase):
@@ -339,13 +796,75 @@ class RouteHandleTest(TestCase):
         The Route's url is stripped from the requested url path.
         """
         route = RouteFactory.build(url='/branch/')
-        route.get_handler_class = mock.MagicMock()
+        route.get_handler = mock.MagicMock()
         request = mock.Mock()
 
         result = route.handle(request, '/branch/leaf/')
 
-        expected = route.get_handler_class()(route).handle(request, '/leaf/')
-        self.assertEqual(result, expected)
+        handle = route.get_handler().handle
+        handle.assert_called_once_with(route, request, '/leaf/')
+        self.assertEqual(result, handle(route, request, '/leaf/'))
+
+
+class RouteHandleAsyncTest(CoroutineTestCase):
+    """Check the behaviour of Route.handle_async()."""
+    def setUp(self):
+        """Create a Route, and a request."""
+        super().setUp()
+        self.route = RouteFactory.build(url='/branch/')
+        self.request = mock.Mock()
+
+    def test_handle_async(self):
+        """Route delegates requests to its handler's `handle_async`."""
+        handler = mock.Mock(cacheable=False)
+        handler.handle_async = asyncio.coroutine(lambda *args: args)
+        self.route.get_handler = mock.Mock(return_value=handler)
+
+        coroutine = self.route.handle_async(self.request, '/branch/leaf/')
+        result = self.run_until_complete(coroutine)
+
+        self.assertEqual(result, (self.route, self.request, '/leaf/'))
+
+    def test_sync_handler(self):
+        """Test that handlers without `handle_async` handle requests in the executor."""
+        handler = mock.Mock(spec=['handle'], cacheable=False)
+        self.route.get_handler = mock.Mock(return_value=handler)
+
+        coroutine = self.route.handle_async(self.request, '/branch/leaf/')
+        result = self.run_until_complete(coroutine)
+
+        handler.handle.assert_called_once_with(self.route, self.request, '/leaf/')
+        self.assertEqual(result, handler.handle.return_value)
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_response_cache(self):
+        """Cacheable responses are handled by `handle`, in the executor."""
+        self.route.get_handler = mock.Mock()
+        with mock.patch.object(Route, 'handle') as handle:
+            with mock.patch('conman.routes.models.response_cache') as cache:
+                cache.can_cache.return_value = True
+                coroutine = self.route.handle_async(self.request, '/branch/leaf/')
+                result = self.run_until_complete(coroutine)
+
+        handle.assert_called_once_with(self.request, '/branch/leaf/')
+        self.assertEqual(result, handle.return_value)
+
+
+class RouteManagerBestMatchForPathAsyncTest(CoroutineTestCase):
+    """Test Route.objects.best_match_for_path_async."""
+    def test_match(self):
+        """The best match is found as by `best_match_for_path`."""
+        branch = ChildRouteFactory.create(slug='branch')
+
+        coroutine = Route.objects.best_match_for_path_async('/branch/leaf/')
+        route = self.run_until_complete(coroutine)
+
+        self.assertEqual(route, branch)
+
+    def test_no_match(self):
+        """Route.DoesNotExist is raised if nothing matches."""
+        with self.assertRaises(Route.DoesNotExist):
+            self.run_until_complete(Route.objects.best_match_for_path_async('/'))
 
 
 class RouteStrTest(TestCase):
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from .factories import ChildRouteFactory, RootRouteFactory
+from ..generation import route_generation
+from ..models import Route
+from ..navigation import build_tree, NavNode
+
+
+class RouteManagerNavigationTest(TestCase):
+    """Test Route.objects.navigation."""
+    def setUp(self):
+        """Build a tree, and make sure no navigation is cached from other tests."""
+        route_generation.bump()
+        self.root = RootRouteFactory.create()
+        self.about = ChildRouteFactory.create(parent=self.root, slug='about')
+        self.team = ChildRouteFactory.create(parent=self.about, slug='team')
+        self.contact = ChildRouteFactory.create(parent=self.root, slug='contact')
+
+    def test_tree(self):
+        """The whole subtree is returned as NavNodes, in tree order."""
+        tree = Route.objects.navigation(self.root)
+
+        team = NavNode('/about/team/', 'team', 2, ())
+        about = NavNode('/about/', 'about', 1, (team,))
+        contact = NavNode('/contact/', 'contact', 1, ())
+        self.assertEqual(tree, NavNode('/', '', 0, (about, contact)))
+
+    def test_depth(self):
+        """Test that descendants more than `depth` levels below the root are left out."""
+        tree = Route.objects.navigation(self.root, depth=1)
+
+        self.assertEqual([node.url for node in tree.children], ['/about/', '/contact/'])
+        self.assertEqual(tree.children[0].children, ())
+
+    def test_subtree(self):
+        """Navigation can start below the root of the tree."""
+        tree = Route.objects.navigation(self.about)
+
+        self.assertEqual(tree, NavNode('/about/', 'about', 1, (
+            NavNode('/about/team/', 'team', 2, ()),
+        )))
+
+    def test_one_query(self):
+        """All the Routes are fetched, as their subclasses, in one query."""
+        PageFactory.create(parent=self.contact, slug='page')
+        title_path = 'conman.pages.models.Page.get_navigation_title'
+
+        with mock.patch(title_path, return_value='Page title'):
+            with self.assertNumQueries(1):
+                tree = Route.objects.navigation(self.root)
+
+        self.assertEqual(tree.children[1].children[0].title, 'Page title')
+
+    def test_cached(self):
+        """Test that trees are cached."""
+        tree = Route.objects.navigation(self.root)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(Route.objects.navigation(self.root), tree)
+
+    def test_cached_per_depth(self):
+        """Test that trees of different depths are cached separately."""
+        Route.objects.navigation(self.root)
+
+        tree = Route.objects.navigation(self.root, depth=1)
+
+        self.assertEqual(tree.children[0].children, ())
+
+    def test_url_changed(self):
+        """Cached trees are rebuilt once urls change."""
+        Route.objects.navigation(self.root)
+        self.about.slug = 'about-us'
+        self.about.save()
+
+        tree = Route.objects.navigation(self.root)
+
+        self.assertEqual(tree.children[0].url, '/about-us/')
+        self.assertEqual(tree.children[0].children[0].url, '/about-us/team/')
+
+    def test_title_changed(self):
+        """Cached trees are rebuilt once a Route is saved, whatever changed."""
+        page = PageFactory.create(parent=self.contact, slug='page', content='Old')
+        title_path = 'conman.pages.models.Page.get_navigation_title'
+        with mock.patch(title_path, lambda page: page.content):
+            Route.objects.navigation(self.root)
+            page.content = 'New'
+            page.save()
+
+            tree = Route.objects.navigation(self.root)
+
+        self.assertEqual(tree.children[1].children[0].title, 'New')
+
+    def test_reordered(self):
+        """Cached trees are rebuilt once Routes are moved among their siblings."""
+        Route.objects.navigation(self.root)
+        self.contact.move_to(self.about, 'left')
+
+        tree = Route.objects.navigation(self.root)
+
+        self.assertEqual([node.url for node in tree.children], ['/contact/', '/about/'])
+
+    def test_deleted(self):
+        """Cached trees are rebuilt once a Route is deleted."""
+        page = PageFactory.create(parent=self.contact, slug='page')
+        Route.objects.navigation(self.root)
+        page.delete()
+
+        tree = Route.objects.navigation(self.root)
+
+        self.assertEqual(tree.children[1].children, ())
+
+    def test_root_deleted(self):
+        """There is no tree below a root that has been deleted."""
+        root = PageFactory.create(host='example.com')
+        Page.objects.filter(pk=root.pk).delete()
+
+        with self.assertRaises(Route.DoesNotExist):
+            Route.objects.navigation(root)
+
+
+class BuildTreeTest(TestCase):
+    """Test build_tree."""
+    def test_empty(self):
+        """There is no tree without Routes."""
+        with self.assertRaises(Route.DoesNotExist):
+            build_tree([])
+
+
+class RouteGetNavigationTitleTest(TestCase):
+    """Test Route.get_navigation_title."""
+    def test_slug(self):
+        """The title defaults to the slug."""
+        page = Page(slug='slug')
+        self.assertEqual(page.get_navigation_title(), 'slug')
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.test import override_settings, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from ..generation import route_generation
+from ..not_found import not_found_cache, NotFoundCache
+from ..transactions import run_on_commit
+
+
+@override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=2)
+class NotFoundCacheTest(TestCase):
+    """Test NotFoundCache."""
+    def setUp(self):
+        """Create a NotFoundCache."""
+        self.cache = NotFoundCache(route_generation)
+
+    def test_add(self):
+        """Test that paths that have been added are known to be not found."""
+        self.cache.add('/junk/')
+
+        self.assertIn('/junk/', self.cache)
+        self.assertNotIn('/other/', self.cache)
+
+    def test_size(self):
+        """Only the most recently used paths are kept."""
+        self.cache.add('/first/')
+        self.cache.add('/second/')
+        # Use the first path again, so that the second is the least recent.
+        self.assertIn('/first/', self.cache)
+        self.cache.add('/third/')
+
+        self.assertIn('/first/', self.cache)
+        self.assertNotIn('/second/', self.cache)
+        self.assertIn('/third/', self.cache)
+
+    def test_generation(self):
+        """Test that paths are forgotten when the Route tree changes."""
+        self.cache.add('/junk/')
+        route_generation.bump()
+
+        self.assertNotIn('/junk/', self.cache)
+
+    def test_emptied(self):
+        """Test that paths emptied by another thread while adding are no problem."""
+        paths = mock.MagicMock()
+        paths.__len__.return_value = 3
+        paths.popitem.side_effect = KeyError
+        with mock.patch.object(self.cache, 'get_paths', return_value=paths):
+            self.cache.add('/junk/')
+
+        paths.popitem.assert_called_once_with(last=False)
+
+    @override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=0)
+    def test_disabled(self):
+        """No paths are kept when the size is 0."""
+        self.cache.add('/junk/')
+
+        self.assertNotIn('/junk/', self.cache)
+        self.assertEqual(self.cache.paths, {})
+
+
+@override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=10)
+class RouterNotFoundTest(TestCase):
+    """Test `route_router` answers unresolvable paths it has seen with no queries."""
+    def setUp(self):
+        """Forget paths from other tests."""
+        route_generation.bump()
+
+    def test_not_found(self):
+        """Once a path is not found, it is not looked up again."""
+        PageFactory.create()
+        # As if the test's transaction had committed. See `transactions`.
+        run_on_commit()
+        self.client.get('/junk/')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/junk/')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertIn((None, '/junk/'), not_found_cache)
+
+    def test_new_route(self):
+        """Test that paths are found again once they are given a Route."""
+        root = PageFactory.create()
+        self.client.get('/junk/')
+
+        PageFactory.create(parent=root, slug='junk', content='Junk')
+        response = self.client.get('/junk/')
+
+        self.assertContains(response, 'Junk')
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_per_host(self):
+        """Test that paths not found on one host are still looked up on others."""
+        PageFactory.create(host='example.com')
+        root = PageFactory.create(host='example.org')
+        PageFactory.create(parent=root, slug='junk', content='Junk')
+        # As if the test's transaction had committed. See `transactions`.
+        run_on_commit()
+        self.client.get('/junk/', HTTP_HOST='example.com')
+
+        response = self.client.get('/junk/', HTTP_HOST='example.org')
+
+        self.assertContains(response, 'Junk')
+        self.assertIn(('example.com', '/junk/'), not_found_cache)
@@ -0,0 +1,213 @@
+import asyncio
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, TestCase
+
+from conman.pages.handlers import PageHandler
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from .factories import ChildRouteFactory
+from .test_coroutines import CoroutineTestCase
+from ..generation import route_generation
+from ..handlers import SimpleHandler
+from ..models import Route
+from ..records import RouteRecord
+from ..transactions import run_on_commit
+from ..utils import url_hash
+
+
+class RecordHandler(SimpleHandler):
+    """A handler whose view only needs a RouteRecord."""
+    route_records = True
+    view = mock.Mock(return_value=HttpResponse('content'))
+
+
+class RouteRecordTest(TestCase):
+    """Test RouteRecord."""
+    def setUp(self):
+        """Create a Page, and a record of it."""
+        self.page = PageFactory.create(content='Content')
+        self.record = RouteRecord(self.page.pk, '/', self.page.polymorphic_ctype_id)
+
+    def test_slots(self):
+        """Test that records have no `__dict__`, so are small."""
+        self.assertFalse(hasattr(self.record, '__dict__'))
+
+    def test_repr(self):
+        """Test that records show their pk and url."""
+        self.assertEqual(repr(self.record), '<RouteRecord {} @ />'.format(self.page.pk))
+
+    def test_get_model(self):
+        """The concrete model of the Route is found from its content type."""
+        self.assertEqual(self.record.get_model(), Page)
+
+    def test_get_route(self):
+        """The Route is fetched as its concrete model, once."""
+        with self.assertNumQueries(1):
+            route = self.record.get_route()
+            self.assertIs(self.record.get_route(), route)
+
+        self.assertEqual(route.content, 'Content')
+
+    def test_get_handler(self):
+        """The handler of the Route's model is shared from the registry."""
+        self.assertIsInstance(self.record.get_handler(), PageHandler)
+
+    def test_handle(self):
+        """Test that handlers get the Route, and the path less the record's url."""
+        handler = mock.Mock(route_records=False)
+        with mock.patch.object(RouteRecord, 'get_handler', return_value=handler):
+            response = self.record.handle(RequestFactory().get('/'), '/')
+
+        handler.handle.assert_called_once_with(self.page, mock.ANY, '/')
+        self.assertEqual(response, handler.handle.return_value)
+
+    def test_handle_records(self):
+        """Test that handlers that set `route_records` are passed the record itself."""
+        handler = RecordHandler()
+        with mock.patch.object(RouteRecord, 'get_handler', return_value=handler):
+            with self.assertNumQueries(0):
+                self.record.handle(RequestFactory().get('/'), '/')
+
+        RecordHandler.view.assert_called_with(mock.ANY, route=self.record)
+
+
+class RouteRecordHandleAsyncTest(CoroutineTestCase):
+    """Test RouteRecord.handle_async."""
+    def setUp(self):
+        """Create a Page, a record of it, and a request."""
+        super().setUp()
+        self.page = PageFactory.create(slug='branch', parent=PageFactory.create())
+        ctype_id = self.page.polymorphic_ctype_id
+        self.record = RouteRecord(self.page.pk, '/branch/', ctype_id)
+        self.request = RequestFactory().get('/branch/leaf/')
+
+    def handle_async(self, handler):
+        """Have `handler` handle the request for the record."""
+        with mock.patch.object(RouteRecord, 'get_handler', return_value=handler):
+            coroutine = self.record.handle_async(self.request, '/branch/leaf/')
+            return self.run_until_complete(coroutine)
+
+    def test_handle_async(self):
+        """Handlers' `handle_async` is passed the Route."""
+        handler = mock.Mock(route_records=False, cacheable=False)
+        handler.handle_async = asyncio.coroutine(lambda *args: args)
+
+        result = self.handle_async(handler)
+
+        self.assertEqual(result, (self.page, self.request, '/leaf/'))
+
+    def test_handle_async_records(self):
+        """Test that handlers that set `route_records` are passed the record itself."""
+        handler = mock.Mock(route_records=True, cacheable=False)
+        handler.handle_async = asyncio.coroutine(lambda *args: args)
+
+        with self.assertNumQueries(0):
+            result = self.handle_async(handler)
+
+        self.assertEqual(result, (self.record, self.request, '/leaf/'))
+
+    def test_sync_handler(self):
+        """Test that handlers without `handle_async` handle requests in the executor."""
+        handler = mock.Mock(spec=['handle', 'route_records'], route_records=False)
+
+        result = self.handle_async(handler)
+
+        handler.handle.assert_called_once_with(self.page, self.request, '/leaf/')
+        self.assertEqual(result, handler.handle.return_value)
+
+
+class RouteManagerBestRecordForPathTest(TestCase):
+    """Test Route.objects.best_record_for_path."""
+    def setUp(self):
+        """Make sure no index is left over from other tests."""
+        route_generation.bump()
+
+    def test_query(self):
+        """The best match is found with one query."""
+        branch = ChildRouteFactory.create(slug='branch')
+
+        with self.assertNumQueries(1):
+            record = Route.objects.best_record_for_path('/branch/leaf/')
+
+        self.assertEqual((record.pk, record.url), (branch.pk, '/branch/'))
+        self.assertEqual(record.polymorphic_ctype_id, branch.polymorphic_ctype_id)
+
+    def test_query_no_match(self):
+        """Route.DoesNotExist is raised if no Route matches."""
+        with self.assertRaises(Route.DoesNotExist):
+            Route.objects.best_record_for_path('/')
+
+    def test_lookups(self):
+        """Each `CONMAN_ROUTE_LOOKUP` finds the best match with one query."""
+        branch = ChildRouteFactory.create(slug='branch')
+        ChildRouteFactory.create(slug='leaf', parent=branch)
+
+        for lookup in ('url', 'hash', 'prefix'):
+            with self.subTest(lookup=lookup):
+                with override_settings(CONMAN_ROUTE_LOOKUP=lookup):
+                    with self.assertNumQueries(1):
+                        record = Route.objects.best_record_for_path('/branch/twig/')
+                self.assertEqual((record.pk, record.url), (branch.pk, '/branch/'))
+
+    def test_lookups_no_match(self):
+        """Each `CONMAN_ROUTE_LOOKUP` raises Route.DoesNotExist without a match."""
+        for lookup in ('url', 'hash', 'prefix'):
+            with self.subTest(lookup=lookup):
+                with override_settings(CONMAN_ROUTE_LOOKUP=lookup):
+                    with self.assertRaises(Route.DoesNotExist):
+                        Route.objects.best_record_for_path('/')
+
+    @override_settings(CONMAN_ROUTE_LOOKUP='hash')
+    def test_hash_collision(self):
+        """A Route whose url hash collides with a sub-path's isn't matched."""
+        root = ChildRouteFactory.create(slug='branch').parent
+        other = ChildRouteFactory.create(slug='other', parent=root)
+        Route.objects.filter(pk=other.pk).update(url_hash=url_hash('/branch/leaf/'))
+
+        record = Route.objects.best_record_for_path('/branch/leaf/')
+
+        self.assertEqual(record.url, '/branch/')
+
+    @override_settings(CONMAN_ROUTE_INDEX=True)
+    def test_index(self):
+        """With the index, the best match is found without queries."""
+        branch = ChildRouteFactory.create(slug='branch')
+        # Build the index.
+        Route.objects.best_record_for_path('/')
+
+        with self.assertNumQueries(0):
+            record = Route.objects.best_record_for_path('/branch/leaf/')
+
+        self.assertEqual((record.pk, record.url), (branch.pk, '/branch/'))
+
+
+@override_settings(CONMAN_ROUTE_INDEX=True, CONMAN_RESPONSE_CACHE=True)
+class RouterRecordsTest(TestCase):
+    """Test `route_router` routes with RouteRecords when the index is enabled."""
+    def setUp(self):
+        """Clear the index and cached responses of other tests."""
+        cache.clear()
+        route_generation.bump()
+
+    def test_page(self):
+        """Test that Pages are still passed the Page itself."""
+        page = PageFactory.create(content='Content')
+
+        response = self.client.get(page.url)
+
+        self.assertContains(response, 'Content')
+
+    def test_cached_response(self):
+        """Cached responses are served without any queries."""
+        page = PageFactory.create(content='Content')
+        # As if the test's transaction had committed. See `transactions`.
+        run_on_commit()
+        self.client.get(page.url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(page.url)
+
+        self.assertContains(response, 'Content')
@@ -0,0 +1,216 @@
+from django.core.cache import cache
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import override_settings, RequestFactory, TestCase
+
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from .factories import ChildRouteFactory
+from .. import replicas
+from ..generation import route_generation
+from ..middleware import PinPrimaryMiddleware
+from ..models import Route
+from ..replicas import (
+    get_read_database,
+    pin_to_primary,
+    reading_from_primary,
+    reading_from_replica,
+    ReplicaRouter,
+)
+from ..response_cache import response_cache
+
+
+# Reads from the replica fail, as there is no such database, which shows where
+# each read went.
+REPLICA_SETTINGS = {
+    'CONMAN_READ_DATABASE': 'replica',
+    'DATABASE_ROUTERS': ['conman.routes.replicas.ReplicaRouter'],
+}
+
+
+class ReplicaTestCase(TestCase):
+    """Make sure no thread state is left over between tests."""
+    def tearDown(self):
+        """Stop pinning to the primary, and forget writes."""
+        pin_to_primary(False)
+        replicas.pop_write()
+
+
+@override_settings(CONMAN_READ_DATABASE='replica')
+class GetReadDatabaseTest(ReplicaTestCase):
+    """Test get_read_database."""
+    def test_primary(self):
+        """Test that reads go to the primary by default."""
+        self.assertIsNone(get_read_database())
+
+    def test_replica(self):
+        """Test that reads go to the replica within `reading_from_replica`."""
+        with reading_from_replica():
+            self.assertEqual(get_read_database(), 'replica')
+        self.assertIsNone(get_read_database())
+
+    @override_settings(CONMAN_READ_DATABASE=None)
+    def test_no_replica(self):
+        """Test that reads go to the primary if there is no replica."""
+        with reading_from_replica():
+            self.assertIsNone(get_read_database())
+
+    def test_reading_from_primary(self):
+        """Test that reads go to the primary within `reading_from_primary`."""
+        with reading_from_replica():
+            with reading_from_primary():
+                self.assertIsNone(get_read_database())
+            self.assertEqual(get_read_database(), 'replica')
+
+    def test_pinned(self):
+        """Test that reads go to the primary while pinned."""
+        pin_to_primary()
+        with reading_from_replica():
+            self.assertIsNone(get_read_database())
+
+    def test_write(self):
+        """Saving a Route pins reads to the primary."""
+        ChildRouteFactory.create()
+        with reading_from_replica():
+            self.assertIsNone(get_read_database())
+        self.assertTrue(replicas.pop_write())
+
+    def test_router(self):
+        """ReplicaRouter sends reads where `get_read_database` says."""
+        with reading_from_replica():
+            self.assertEqual(ReplicaRouter().db_for_read(None), 'replica')
+
+    def test_router_write(self):
+        """Test that ReplicaRouter sends writes of replica instances to the primary."""
+        route = Route(pk=1)
+        self.assertIsNone(ReplicaRouter().db_for_write(Route, instance=route))
+
+        route._state.db = 'replica'
+        self.assertEqual(ReplicaRouter().db_for_write(Route, instance=route), 'default')
+        self.assertIsNone(ReplicaRouter().db_for_write(Route))
+
+
+@override_settings(**REPLICA_SETTINGS)
+class ReplicaRoutingTest(ReplicaTestCase):
+    """Test which database Routes are read from."""
+    def test_request(self):
+        """Test that Routes are read from the replica while serving requests."""
+        page = PageFactory.create()
+        pin_to_primary(False)
+
+        with self.assertRaises(ConnectionDoesNotExist):
+            self.client.get(page.url)
+
+    def test_save(self):
+        """Saving Routes reads from the primary, even while serving requests."""
+        redirect = ChildRouteRedirectFactory.create()
+        pin_to_primary(False)
+
+        with reading_from_replica():
+            redirect.slug = 'renamed'
+            redirect.save()
+
+        self.assertEqual(redirect.url, '/renamed/')
+
+    def test_save_from_replica(self):
+        """Test that Routes read from the replica are saved to the primary."""
+        page = PageFactory.create()
+        page._state.db = 'replica'
+        page.content = 'Changed'
+
+        page.save()
+
+        self.assertEqual(page._state.db, 'default')
+        self.assertEqual(Page.objects.get(pk=page.pk).content, 'Changed')
+
+    def test_pinned(self):
+        """Test that requests pinned to the primary read from it."""
+        page = PageFactory.create(content='Content')
+
+        response = self.client.get(page.url)
+
+        self.assertContains(response, 'Content')
+
+
+@override_settings(
+    CONMAN_ROUTE_INDEX=True,
+    CONMAN_RESPONSE_CACHE=True,
+    **REPLICA_SETTINGS
+)
+class ReplicaCachesTest(ReplicaTestCase):
+    """Test that what is cached for a generation is read from the primary."""
+    def setUp(self):
+        """Clear the index and cached responses of other tests."""
+        cache.clear()
+        route_generation.bump()
+
+    def test_index(self):
+        """The Route index is built from the primary."""
+        page = PageFactory.create()
+        pin_to_primary(False)
+
+        with reading_from_replica():
+            record = Route.objects.best_record_for_path('/')
+
+        self.assertEqual(record.pk, page.pk)
+
+    def test_route_read_again(self):
+        """A Route read from the replica is read again from the primary."""
+        page = PageFactory.create(content='Old')
+        Page.objects.filter(pk=page.pk).update(content='New')
+        # As if the Page had been read from the replica.
+        page._state.db = 'replica'
+        pin_to_primary(False)
+
+        with reading_from_replica():
+            handler = page.get_handler()
+            request = RequestFactory().get('/')
+            response = response_cache.handle(handler, page, request, '/')
+        response.render()
+
+        self.assertContains(response, 'New')
+
+
+@override_settings(CONMAN_REPLICA_PIN_SECONDS=5)
+class PinPrimaryMiddlewareTest(ReplicaTestCase):
+    """Test PinPrimaryMiddleware keeps editors on the primary after writes."""
+    def setUp(self):
+        """Create the middleware and a request."""
+        self.middleware = PinPrimaryMiddleware()
+        self.request = RequestFactory().get('/')
+
+    def test_write(self):
+        """A cookie is set on responses to requests that write Routes."""
+        self.middleware.process_request(self.request)
+        ChildRouteFactory.create()
+        response = self.middleware.process_response(self.request, HttpResponse())
+
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+
+    def test_no_write(self):
+        """No cookie is set if no Routes were written."""
+        self.middleware.process_request(self.request)
+        response = self.middleware.process_response(self.request, HttpResponse())
+
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_cookie(self):
+        """Test that requests with the cookie stay on the primary until the response."""
+        self.request.COOKIES[replicas.PIN_COOKIE] = '1'
+
+        self.middleware.process_request(self.request)
+        with override_settings(CONMAN_READ_DATABASE='replica'):
+            with reading_from_replica():
+                self.assertIsNone(get_read_database())
+                self.middleware.process_response(self.request, HttpResponse())
+                self.assertEqual(get_read_database(), 'replica')
+
+    def test_earlier_write(self):
+        """Test that writes before the request don't set the cookie."""
+        ChildRouteFactory.create()
+        self.middleware.process_request(self.request)
+        response = self.middleware.process_response(self.request, HttpResponse())
+
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
@@ -0,0 +1,285 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.response import SimpleTemplateResponse
+from django.test import override_settings, RequestFactory, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from conman.tests.factories import UserFactory
+from .. import response_cache as response_cache_module
+from ..handlers import BaseHandler
+from ..response_cache import response_cache, ResponseCache
+from ..transactions import run_on_commit
+
+
+class CacheableHandler(BaseHandler):
+    """A handler whose responses can be cached."""
+    cacheable = True
+    cache_vary = ('Accept',)
+
+    def build_resolver(self):
+        """No resolver is needed, as `handle` is mocked in these tests."""
+
+
+@override_settings(CONMAN_RESPONSE_CACHE=True)
+class TestResponseCache(TestCase):
+    """Test ResponseCache.handle caches the responses of handlers."""
+    def setUp(self):
+        """Create a handler, route and request."""
+        cache.clear()
+        self.cache = ResponseCache()
+        self.handler = CacheableHandler()
+        self.handler.handle = mock.Mock(return_value=HttpResponse('content'))
+        self.route = mock.Mock(pk=42)
+        self.route.for_handler.return_value = self.route
+        self.request = RequestFactory().get('/')
+
+    def test_cached(self):
+        """The handler is only asked for a response once."""
+        first = self.cache.handle(self.handler, self.route, self.request, '/')
+        second = self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.handler.handle.assert_called_once_with(self.route, self.request, '/')
+        self.assertEqual(second.content, first.content)
+
+    def test_path(self):
+        """Test that responses for different paths are cached separately."""
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/other/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_vary(self):
+        """Test that responses vary on the values of `cache_vary` headers."""
+        other_request = RequestFactory().get('/', HTTP_ACCEPT='application/json')
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        response = self.cache.handle(self.handler, self.route, other_request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+        self.assertEqual(response['Vary'], 'Accept')
+
+    def test_response_vary(self):
+        """Test that responses vary on the headers in their own `Vary` header too."""
+        self.handler.handle.return_value['Vary'] = 'Cookie'
+        other_request = RequestFactory().get('/', HTTP_COOKIE='name=value')
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, other_request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_query_string(self):
+        """Test that responses to different query strings are cached separately."""
+        other_request = RequestFactory().get('/?page=2')
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, other_request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_csrf_used(self):
+        """Test that responses that used a CSRF token are not cached."""
+        def handle(route, request, path):
+            get_token(request)
+            return HttpResponse('content')
+        self.handler.handle.side_effect = handle
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_session_accessed(self):
+        """Test that responses that used the session are not cached."""
+        self.request.session = SessionStore()
+
+        def handle(route, request, path):
+            request.session.get('name')
+            return HttpResponse('content')
+        self.handler.handle.side_effect = handle
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_session_not_accessed(self):
+        """Test that responses that left the session alone are cached."""
+        self.request.session = SessionStore()
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 1)
+
+    def test_new_version(self):
+        """Cached responses are not used once the Route has a new version."""
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.cache.bump_version(self.route.pk)
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_bump_missing_version(self):
+        """Bumping a version missing from the cache starts a new one."""
+        self.cache.bump_version(self.route.pk)
+
+        key = response_cache_module.VERSION_KEY.format(self.route.pk)
+        self.assertIsNotNone(cache.get(key))
+
+    def test_not_ok(self):
+        """Unsuccessful responses are not cached."""
+        self.handler.handle.return_value = HttpResponse(status=500)
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_cookies(self):
+        """Test that responses that set cookies are not cached."""
+        self.handler.handle.return_value.set_cookie('name', 'value')
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+    def test_timeout(self):
+        """Test that responses are cached for the handler's `cache_timeout`."""
+        self.handler.cache_timeout = 10
+        with mock.patch.object(cache, 'set') as cache_set:
+            self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(cache_set.call_args[0][2], 10)
+
+    @override_settings(CONMAN_RESPONSE_CACHE_TIMEOUT=20)
+    def test_default_timeout(self):
+        """Test that responses get the default timeout if the handler has none."""
+        with mock.patch.object(cache, 'set') as cache_set:
+            self.cache.handle(self.handler, self.route, self.request, '/')
+
+        self.assertEqual(cache_set.call_args[0][2], 20)
+
+    def test_render_later(self):
+        """Test that responses that are rendered later are cached once rendered."""
+        response = SimpleTemplateResponse('pages/page_detail.html', {})
+        self.handler.handle.return_value = response
+
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+        response.render()
+        self.cache.handle(self.handler, self.route, self.request, '/')
+        self.assertEqual(self.handler.handle.call_count, 2)
+
+
+class TestResponseCacheCanCache(TestCase):
+    """Test ResponseCache.can_cache."""
+    def setUp(self):
+        """Create a handler and request."""
+        self.handler = CacheableHandler()
+        self.request = RequestFactory().get('/')
+
+    def test_disabled(self):
+        """Nothing is cached unless CONMAN_RESPONSE_CACHE is enabled."""
+        self.assertFalse(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_enabled(self):
+        """GET requests to cacheable handlers can be cached."""
+        self.assertTrue(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_not_cacheable(self):
+        """Test that handlers that are not `cacheable` are not cached."""
+        self.handler.cacheable = False
+        self.assertFalse(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_conditional(self):
+        """Conditional GETs are left to `conditional` handlers."""
+        self.handler.conditional = True
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH='"etag"')
+        self.assertFalse(response_cache.can_cache(self.handler, request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_not_conditional(self):
+        """Conditional GETs to other handlers can be cached."""
+        request = RequestFactory().get('/', HTTP_IF_NONE_MATCH='"etag"')
+        self.assertTrue(response_cache.can_cache(self.handler, request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_session(self):
+        """Test that requests from people with a session are not cached."""
+        self.request.COOKIES[settings.SESSION_COOKIE_NAME] = 'key'
+        self.assertFalse(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_authenticated(self):
+        """Test that requests from people who are logged in are not cached."""
+        self.request.user = UserFactory.build()
+        self.assertFalse(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_anonymous(self):
+        """Test that requests from anonymous users can be cached."""
+        self.request.user = AnonymousUser()
+        self.assertTrue(response_cache.can_cache(self.handler, self.request))
+
+    @override_settings(CONMAN_RESPONSE_CACHE=True)
+    def test_post(self):
+        """POST requests are not cached."""
+        request = RequestFactory().post('/')
+        self.assertFalse(response_cache.can_cache(self.handler, request))
+
+
+@override_settings(CONMAN_RESPONSE_CACHE=True)
+class TestResponseCacheIntegration(TestCase):
+    """Pages are served from the response cache."""
+    def setUp(self):
+        """Start with an empty cache."""
+        cache.clear()
+
+    def test_page_cached(self):
+        """A Page is only rendered once."""
+        page = PageFactory.create(content='Cached')
+        # As if the test's transaction had committed. See `transactions`.
+        run_on_commit()
+        self.client.get(page.url)
+
+        render_path = 'conman.pages.views.PageDetail.render_to_response'
+        with mock.patch(render_path) as render:
+            response = self.client.get(page.url)
+
+        self.assertFalse(render.called)
+        self.assertIn(page.content, response.content.decode())
+
+    def test_page_saved(self):
+        """A Page is rendered again once it has been saved."""
+        page = PageFactory.create(content='Old')
+        self.client.get(page.url)
+
+        page.content = 'New'
+        page.save()
+        response = self.client.get(page.url)
+
+        self.assertIn('New', response.content.decode())
+
+    def test_redirect_not_cached(self):
+        """Test that RouteRedirects are not cached."""
+        redirect = ChildRouteRedirectFactory.create()
+
+        with mock.patch.object(response_cache, 'handle') as handle:
+            self.client.get(redirect.url)
+
+        self.assertFalse(handle.called)
@@ -0,0 +1,356 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings, TestCase
+
+from .factories import ChildRouteFactory, RootRouteFactory, RouteFactory
+from .. import rewrites, signals, transactions
+from ..models import Route, UrlRewrite
+from ..transactions import run_on_commit
+from ..utils import url_hash
+
+
+# Runs rewrites as soon as they are submitted.
+RUN_INLINE = 'conman.routes.rewrites.run_pending_rewrites'
+
+
+def get_url(route):
+    """Get the url of a Route as it is in the database."""
+    return Route.objects.get(pk=route.pk).url
+
+
+class RewriteTestCase(TestCase):
+    """Build a branch with descendants, and forget any scheduled rewrites after."""
+    def setUp(self):
+        """Create the branch."""
+        self.branch = ChildRouteFactory.create(slug='foo')
+        self.twig = RouteFactory.create(slug='twig', parent=self.branch)
+        self.leaf = RouteFactory.create(slug='leaf', parent=self.twig)
+
+    def tearDown(self):
+        """Forget rewrites scheduled within the test's transaction."""
+        transactions._local.__dict__.pop('pending', None)
+
+    def rename(self, route, slug):
+        """Give a Route a new slug, and save it."""
+        route = Route.objects.get(pk=route.pk)
+        route.slug = slug
+        route.save()
+        return route
+
+
+@override_settings(CONMAN_DEFER_URL_REWRITES=True)
+class DeferredSaveTest(RewriteTestCase):
+    """Test saving Routes with CONMAN_DEFER_URL_REWRITES."""
+    def test_deferred(self):
+        """The Route is saved with its new url, but its descendants are not."""
+        self.rename(self.branch, 'bar')
+
+        self.assertEqual(get_url(self.branch), '/bar/')
+        self.assertEqual(get_url(self.leaf), '/foo/twig/leaf/')
+        rewrite = UrlRewrite.objects.get()
+        self.assertEqual(rewrite.route_id, self.branch.pk)
+        self.assertEqual((rewrite.old_url, rewrite.new_url), ('/foo/', '/bar/'))
+        self.assertEqual(rewrite.total, 2)
+        self.assertIn(rewrites.submit_rewrites, transactions._local.pending)
+
+    def test_run(self):
+        """Running the rewrite brings the descendants up to date."""
+        branch = self.rename(self.branch, 'bar')
+
+        rewrites.run_pending_rewrites()
+
+        leaf = Route.objects.get(pk=self.leaf.pk)
+        self.assertEqual(leaf.url, '/bar/twig/leaf/')
+        self.assertEqual(leaf.url_hash, url_hash('/bar/twig/leaf/'))
+        self.assertEqual(leaf.modified, branch.modified)
+        self.assertEqual(UrlRewrite.objects.get().progress, 1)
+
+    def test_leaf(self):
+        """Test that Routes without descendants have nothing to rewrite."""
+        self.rename(self.leaf, 'renamed')
+
+        self.assertFalse(UrlRewrite.objects.exists())
+        self.assertEqual(get_url(self.leaf), '/foo/twig/renamed/')
+
+    def test_renamed_again(self):
+        """A Route renamed twice before its rewrite runs ends up with the last name."""
+        self.rename(self.branch, 'bar')
+        self.rename(self.branch, 'baz')
+
+        self.assertEqual(rewrites.run_pending_rewrites(), 2)
+
+        self.assertEqual(get_url(self.leaf), '/baz/twig/leaf/')
+
+    def test_descendant_renamed(self):
+        """Renaming a descendant waiting on a rewrite builds on that rewrite."""
+        self.rename(self.branch, 'bar')
+        self.rename(self.twig, 'stick')
+
+        second = UrlRewrite.objects.last()
+        self.assertEqual((second.old_url, second.new_url), ('/bar/twig/', '/bar/stick/'))
+
+        rewrites.run_pending_rewrites()
+
+        self.assertEqual(get_url(self.twig), '/bar/stick/')
+        self.assertEqual(get_url(self.leaf), '/bar/stick/leaf/')
+
+    def test_other_host(self):
+        """Test that rewrites pending on other hosts are no help to a rename."""
+        other_root = RootRouteFactory.create(host='example.com')
+        other = RouteFactory.create(slug='foo', parent=other_root)
+        RouteFactory.create(slug='twig', parent=other)
+        self.rename(other, 'bar')
+
+        self.rename(self.branch, 'baz')
+
+        rewrite = UrlRewrite.objects.last()
+        self.assertEqual((rewrite.old_url, rewrite.new_url), ('/foo/', '/baz/'))
+
+    def test_moved_host(self):
+        """Test that descendants are moved to the Route's host along with their urls."""
+        other_root = RootRouteFactory.create(host='example.com')
+        branch = Route.objects.get(pk=self.branch.pk)
+        branch.parent = other_root
+        branch.slug = 'moved'
+        branch.save()
+
+        rewrites.run_pending_rewrites()
+
+        leaf = Route.objects.get(pk=self.leaf.pk)
+        self.assertEqual((leaf.host, leaf.url), ('example.com', '/moved/twig/leaf/'))
+
+    def test_same_as_slugs(self):
+        """Rewritten urls match those built from the Routes' slugs."""
+        self.rename(self.twig, 'stick')
+        new_branch = ChildRouteFactory.create(slug='new-branch')
+        twig = Route.objects.get(pk=self.twig.pk)
+        twig.parent = new_branch
+        twig.save()
+        self.rename(new_branch, 'renamed')
+
+        rewrites.run_pending_rewrites()
+
+        for route in Route.objects.exclude(parent=None):
+            expected = '{}{}/'.format(route.parent.url, route.slug)
+            self.assertEqual(route.url, expected)
+
+
+@override_settings(CONMAN_DEFER_URL_REWRITES=True)
+class RunRewriteTest(RewriteTestCase):
+    """Test rewrite_chunk and run_rewrite."""
+    def setUp(self):
+        """Add another leaf, and rename the branch."""
+        super().setUp()
+        RouteFactory.create(slug='other-leaf', parent=self.twig)
+        self.rename(self.branch, 'bar')
+        self.rewrite = UrlRewrite.objects.get()
+
+    def test_chunks(self):
+        """Test that descendants are rewritten `chunk_size` at a time."""
+        with self.assertNumQueries(7):
+            # Seven queries:
+            # * Create a savepoint.
+            # * Get the Route.
+            # * Get (and lock) the descendants to rewrite.
+            # * Update their urls and url hashes.
+            # * Update the RouteRedirects to them (see `urls_rewritten`).
+            # * Update the rewrite's progress.
+            # * Release the savepoint.
+            self.assertEqual(rewrites.rewrite_chunk(self.rewrite, chunk_size=2), 2)
+
+        self.assertEqual(self.rewrite.progress, 2 / 3)
+        self.assertEqual(UrlRewrite.objects.get().done, 2)
+        self.assertEqual(rewrites.rewrite_chunk(self.rewrite, chunk_size=2), 1)
+        self.assertEqual(rewrites.rewrite_chunk(self.rewrite, chunk_size=2), 0)
+
+    def test_resume(self):
+        """A rewrite stopped part way through can be run again to finish it."""
+        rewrites.rewrite_chunk(self.rewrite, chunk_size=1)
+
+        rewrites.run_rewrite(UrlRewrite.objects.get())
+
+        rewrite = UrlRewrite.objects.get()
+        self.assertIsNotNone(rewrite.finished)
+        self.assertEqual(rewrite.done, 3)
+        self.assertEqual(get_url(self.leaf), '/bar/twig/leaf/')
+
+    def test_idempotent(self):
+        """Running a finished rewrite again changes nothing."""
+        rewrites.run_rewrite(self.rewrite)
+
+        self.assertEqual(rewrites.rewrite_chunk(self.rewrite), 0)
+        self.assertEqual(get_url(self.leaf), '/bar/twig/leaf/')
+
+    def test_leaves_others(self):
+        """Test that Routes outside the branch are left alone, even if urls match."""
+        other = ChildRouteFactory.create(slug='foo')
+
+        rewrites.run_rewrite(self.rewrite)
+
+        self.assertEqual(get_url(other), '/foo/')
+
+    def test_count(self):
+        """Progress counts the descendants rewritten, not those found."""
+        with mock.patch.object(Route.objects, 'rewrite_urls', return_value=1):
+            self.assertEqual(rewrites.rewrite_chunk(self.rewrite, chunk_size=2), 1)
+
+        self.assertEqual(UrlRewrite.objects.get().done, 1)
+
+    def test_urls_rewritten(self):
+        """`urls_rewritten` is sent with the old urls of each chunk."""
+        receiver = mock.Mock()
+        signals.urls_rewritten.connect(receiver)
+        self.addCleanup(signals.urls_rewritten.disconnect, receiver)
+
+        rewrites.rewrite_chunk(self.rewrite, chunk_size=1)
+
+        receiver.assert_called_once_with(
+            signal=signals.urls_rewritten,
+            sender=Route,
+            route=mock.ANY,
+            old_url='/foo/',
+            new_url='/bar/',
+            urls=['/foo/twig/'],
+        )
+
+    def test_url_changed(self):
+        """`url_changed` is sent for the Route once the rewrite has finished."""
+        receiver = mock.Mock()
+        signals.url_changed.connect(receiver)
+        self.addCleanup(signals.url_changed.disconnect, receiver)
+
+        rewrites.run_rewrite(self.rewrite)
+
+        receiver.assert_called_once_with(
+            signal=signals.url_changed,
+            sender=Route,
+            route=self.branch,
+            old_url='/foo/',
+        )
+
+    def test_deleted(self):
+        """A rewrite of the descendants of a deleted Route is dropped."""
+        # As if the Route was deleted after the rewrite was fetched. (Deleting it
+        # here would cascade to test models that have no tables.)
+        self.rewrite.route_id = 0
+
+        rewrites.run_rewrite(self.rewrite)
+
+        self.assertFalse(UrlRewrite.objects.exists())
+        self.assertIsNone(self.rewrite.finished)
+
+
+class UrlRewriteTest(TestCase):
+    """Test the UrlRewrite model."""
+    def setUp(self):
+        """Create a rewrite that is part done."""
+        self.rewrite = UrlRewrite(old_url='/foo/', new_url='/bar/', total=4, done=1)
+
+    def test_progress(self):
+        """Progress is the share of descendants rewritten."""
+        self.assertEqual(self.rewrite.progress, 0.25)
+
+    def test_progress_past_total(self):
+        """Progress stops at 1, even if descendants were added meanwhile."""
+        self.rewrite.done = 5
+        self.assertEqual(self.rewrite.progress, 1)
+
+    def test_progress_no_descendants(self):
+        """A rewrite with nothing to do is complete."""
+        self.rewrite.total = 0
+        self.assertEqual(self.rewrite.progress, 1)
+
+    def test_str(self):
+        """A rewrite is displayed with its urls and progress."""
+        self.assertEqual(str(self.rewrite), '/foo/ -> /bar/ (25%)')
+
+    def test_rewrite_url(self):
+        """Test that urls starting with the old url get the new url instead."""
+        self.assertEqual(self.rewrite.rewrite_url('/foo/baz/'), '/bar/baz/')
+        self.assertEqual(self.rewrite.rewrite_url('/foobar/'), '/foobar/')
+
+
+@override_settings(CONMAN_DEFER_URL_REWRITES=True)
+class ScheduleRewritesTest(RewriteTestCase):
+    """Test how rewrites are scheduled and submitted."""
+    @override_settings(CONMAN_REWRITE_EXECUTOR=RUN_INLINE)
+    def test_executor(self):
+        """Test that rewrites are passed to the `CONMAN_REWRITE_EXECUTOR`."""
+        self.rename(self.branch, 'bar')
+
+        rewrites.submit_rewrites()
+
+        self.assertEqual(get_url(self.leaf), '/bar/twig/leaf/')
+
+    def test_thread_pool(self):
+        """Without an executor, rewrites run in this process's thread pool."""
+        with mock.patch.object(rewrites, 'get_thread_pool') as get_thread_pool:
+            rewrites.submit_rewrites()
+
+        get_thread_pool().submit.assert_called_once_with(
+            rewrites.call_in_thread,
+            rewrites.run_pending_rewrites,
+        )
+
+    def test_get_thread_pool(self):
+        """The thread pool is created once, with a single thread."""
+        with mock.patch.object(rewrites, '_thread_pool', None):
+            thread_pool = rewrites.get_thread_pool()
+            self.assertIs(rewrites.get_thread_pool(), thread_pool)
+        thread_pool.shutdown()
+        self.assertEqual(thread_pool._max_workers, 1)
+
+    def test_outside_transaction(self):
+        """Outside a transaction, rewrites are submitted straight away."""
+        connection = transaction.get_connection()
+        with mock.patch.object(rewrites, 'submit_rewrites') as submit_rewrites:
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                rewrites.schedule_rewrites()
+
+        submit_rewrites.assert_called_once_with()
+
+    def test_committed(self):
+        """Test that rewrites scheduled in a transaction wait until it commits."""
+        with mock.patch.object(rewrites, 'submit_rewrites') as submit_rewrites:
+            self.rename(self.branch, 'bar')
+            self.rename(self.twig, 'stick')
+            self.assertFalse(submit_rewrites.called)
+
+            run_on_commit()
+
+        submit_rewrites.assert_called_once_with()
+
+
+@override_settings(CONMAN_DEFER_URL_REWRITES=True)
+class RewriteUrlsCommandTest(RewriteTestCase):
+    """Test the conman_rewrite_urls management command."""
+    def test_run(self):
+        """Unfinished rewrites are run."""
+        self.rename(self.branch, 'bar')
+        stdout = StringIO()
+
+        call_command('conman_rewrite_urls', stdout=stdout)
+
+        self.assertEqual(stdout.getvalue(), 'Rewrote 2 urls: /foo/ -> /bar/\n')
+        self.assertEqual(get_url(self.leaf), '/bar/twig/leaf/')
+
+    def test_status(self):
+        """With `--status`, the progress of unfinished rewrites is reported."""
+        self.rename(self.branch, 'bar')
+        stdout = StringIO()
+
+        call_command('conman_rewrite_urls', status=True, stdout=stdout)
+
+        self.assertEqual(stdout.getvalue(), '/foo/ -> /bar/ (0%)\n')
+        self.assertEqual(get_url(self.leaf), '/foo/twig/leaf/')
+
+    def test_none(self):
+        """The command says when there is nothing to do."""
+        stdout = StringIO()
+
+        call_command('conman_rewrite_urls', stdout=stdout)
+
+        self.assertEqual(stdout.getvalue(), 'No url rewrites to run.\n')
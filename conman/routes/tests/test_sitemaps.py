@@ -0,0 +1,171 @@
+import datetime
+import gzip
+import os
+import tempfile
+from io import StringIO
+from xml.etree import ElementTree
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command, CommandError
+from django.test import override_settings, TestCase
+
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from ..models import Route
+from ..sitemaps import iter_entries, SitemapWriter, URLS_PER_SITEMAP, XMLNS
+
+
+def locations(path, compressed=False):
+    """Get the text of each `loc` element in an XML file."""
+    opener = gzip.open if compressed else open
+    with opener(path) as f:
+        tree = ElementTree.parse(f)
+    return [loc.text for loc in tree.iter('{{{}}}loc'.format(XMLNS))]
+
+
+class SitemapTestCase(TestCase):
+    """Build a tree of Pages, with a RouteRedirect, and a directory to write to."""
+    def setUp(self):
+        """Create the tree and the output directory."""
+        root = PageFactory.create()
+        self.pages = [root] + [
+            PageFactory.create(parent=root, slug='page-{}'.format(i))
+            for i in range(4)
+        ]
+        ChildRouteRedirectFactory.create(parent=root, slug='redirect', target=root)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp.name
+
+    def tearDown(self):
+        """Remove the output directory."""
+        self.tmp.cleanup()
+
+    def path(self, name):
+        """Get a path in the output directory."""
+        return os.path.join(self.output_dir, name)
+
+
+class IterEntriesTest(SitemapTestCase):
+    """Test iter_entries."""
+    def test_entries(self):
+        """The url and modified time of each Route are listed, without redirects."""
+        entries = list(iter_entries())
+
+        expected = [(page.url, page.modified) for page in self.pages]
+        self.assertEqual(entries, expected)
+
+    def test_chunks(self):
+        """Test that Routes are read in chunks, with one query per chunk."""
+        ContentType.objects.clear_cache()
+        with self.assertNumQueries(5):
+            # Five queries:
+            # * Get the content types to leave out.
+            # * Get the first two Routes.
+            # * Get the next two.
+            # * Get the last one.
+            # * Check for more.
+            entries = list(iter_entries(chunk_size=2))
+
+        self.assertEqual(len(entries), 5)
+
+
+class SitemapWriterTest(SitemapTestCase):
+    """Test SitemapWriter."""
+    def test_split(self):
+        """Test that urls are split into sitemaps of `limit` urls, in the index."""
+        counts = SitemapWriter(self.output_dir, 'http://example.com/', limit=2).run()
+
+        self.assertEqual(counts, {'urls': 5, 'sitemaps': 3})
+        self.assertEqual(locations(self.path('sitemap.xml')), [
+            'http://example.com/sitemap-1.xml',
+            'http://example.com/sitemap-2.xml',
+            'http://example.com/sitemap-3.xml',
+        ])
+        self.assertEqual(locations(self.path('sitemap-1.xml')), [
+            'http://example.com/',
+            'http://example.com/page-0/',
+        ])
+        self.assertEqual(locations(self.path('sitemap-3.xml')), [
+            'http://example.com/page-3/',
+        ])
+
+    def test_limit(self):
+        """Test that limits below 1, or above the protocol's maximum, are refused."""
+        for limit in (-1, 0, URLS_PER_SITEMAP + 1):
+            with self.subTest(limit=limit):
+                with self.assertRaises(ValueError):
+                    SitemapWriter(self.output_dir, 'http://example.com', limit=limit)
+
+    def test_gzip(self):
+        """Test that sitemaps can be compressed, though the index is not."""
+        SitemapWriter(self.output_dir, 'http://example.com', compress=True).run()
+
+        self.assertEqual(locations(self.path('sitemap.xml')), [
+            'http://example.com/sitemap-1.xml.gz',
+        ])
+        urls = locations(self.path('sitemap-1.xml.gz'), compressed=True)
+        self.assertEqual(len(urls), 5)
+
+    def test_lastmod(self):
+        """Each sitemap in the index was last modified when its newest Route was."""
+        modified = datetime.datetime(2015, 7, 1, 12)
+        Route.objects.filter(pk=self.pages[1].pk).update(modified=modified)
+        SitemapWriter(self.output_dir, 'http://example.com', limit=2).run()
+
+        with open(self.path('sitemap.xml')) as f:
+            index = f.read()
+        lastmod = '<lastmod>{:%Y-%m-%d}</lastmod>'.format(self.pages[0].modified)
+        self.assertIn(lastmod, index)
+        self.assertNotIn('2015-07-01', index)
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_host(self):
+        """With CONMAN_MULTIPLE_HOSTS, only Routes on the base url's host are listed."""
+        root = PageFactory.create(host='example.org')
+        PageFactory.create(parent=root, slug='other')
+
+        SitemapWriter(self.output_dir, 'http://example.org:8000').run()
+
+        self.assertEqual(locations(self.path('sitemap-1.xml')), [
+            'http://example.org:8000/',
+            'http://example.org:8000/other/',
+        ])
+
+    def test_empty(self):
+        """With no Routes, the index lists no sitemaps."""
+        Route.objects.all().delete()
+
+        counts = SitemapWriter(self.output_dir, 'http://example.com').run()
+
+        self.assertEqual(counts, {'urls': 0, 'sitemaps': 0})
+        self.assertEqual(locations(self.path('sitemap.xml')), [])
+
+    def test_stale(self):
+        """Test that sitemaps left by an earlier run and no longer listed are removed."""
+        SitemapWriter(self.output_dir, 'http://example.com', limit=2).run()
+        other = self.path('robots.txt')
+        open(other, 'w').close()
+
+        SitemapWriter(self.output_dir, 'http://example.com', compress=True).run()
+
+        names = sorted(os.listdir(self.output_dir))
+        self.assertEqual(names, ['robots.txt', 'sitemap-1.xml.gz', 'sitemap.xml'])
+
+
+class SitemapCommandTest(SitemapTestCase):
+    """Test the conman_sitemap management command."""
+    def test_command(self):
+        """Test that sitemaps are written, and the number of urls reported."""
+        stdout = StringIO()
+        call_command(
+            'conman_sitemap', self.output_dir, 'http://example.com',
+            gzip=True, limit=3, stdout=stdout,
+        )
+
+        self.assertEqual(stdout.getvalue(), 'Wrote 5 urls to 2 sitemaps.\n')
+        self.assertTrue(os.path.exists(self.path('sitemap-2.xml.gz')))
+
+    def test_bad_limit(self):
+        """Test that a limit of 0 is reported as an error."""
+        with self.assertRaises(CommandError):
+            call_command('conman_sitemap', self.output_dir, 'http://example.com', limit=0)
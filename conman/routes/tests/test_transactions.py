@@ -0,0 +1,183 @@
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from conman.pages.models import Page
+from conman.pages.tests.factories import PageFactory
+from conman.redirects.tests.factories import ChildRouteRedirectFactory
+from .. import receivers, transactions
+from ..generation import route_generation
+from ..navigation import navigation_generation
+from ..transactions import atomic, on_commit, run_on_commit
+
+
+class OnCommitTest(TestCase):
+    """Test on_commit and run_on_commit."""
+    def setUp(self):
+        """Forget anything left waiting by earlier tests."""
+        run_on_commit()
+        self.func = mock.Mock()
+
+    def tearDown(self):
+        """Forget anything left waiting by the test."""
+        transactions._local.__dict__.pop('pending', None)
+        transactions._local.in_request = False
+
+    def test_no_transaction(self):
+        """Outside a transaction, functions are called straight away."""
+        connection = transaction.get_connection()
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            on_commit(self.func)
+
+        self.func.assert_called_once_with()
+
+    def test_transaction(self):
+        """Within a transaction, functions wait until `run_on_commit`."""
+        on_commit(self.func)
+        self.assertFalse(self.func.called)
+
+        run_on_commit()
+
+        self.func.assert_called_once_with()
+
+    def test_once(self):
+        """Test that functions already waiting are only called once."""
+        on_commit(self.func)
+        on_commit(self.func)
+
+        run_on_commit()
+
+        self.func.assert_called_once_with()
+
+    def test_order(self):
+        """Test that functions are called in the order they were added."""
+        calls = []
+        on_commit(lambda: calls.append('first'))
+        on_commit(lambda: calls.append('second'))
+
+        run_on_commit()
+
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_request_finished(self):
+        """Test that functions left waiting by a request are called when it finishes."""
+        receivers.note_request_started(sender=None)
+        on_commit(self.func)
+
+        receivers.run_on_commit(sender=None)
+
+        self.func.assert_called_once_with()
+        self.assertFalse(transactions._local.in_request)
+
+    @mock.patch.object(transactions._local, 'warned', False, create=True)
+    def test_warning(self):
+        """Leaving functions waiting outside a request is warned of, once."""
+        with self.assertLogs('conman.routes.transactions', 'WARNING') as logs:
+            on_commit(self.func)
+            on_commit(mock.Mock())
+            run_on_commit()
+            on_commit(mock.Mock())
+
+        self.assertEqual(len(logs.output), 1)
+
+    @mock.patch.object(transactions._local, 'warned', False, create=True)
+    def test_no_warning_in_request(self):
+        """Leaving functions waiting within a request is expected."""
+        receivers.note_request_started(sender=None)
+        with mock.patch.object(transactions.logger, 'warning') as warning:
+            on_commit(self.func)
+
+        self.assertFalse(warning.called)
+
+
+class AtomicTest(TransactionTestCase):
+    """Test atomic, outside the transaction of a TestCase."""
+    def setUp(self):
+        """Forget anything left waiting by earlier tests."""
+        run_on_commit()
+        self.func = mock.Mock()
+
+    def test_commit(self):
+        """Test that functions waiting on the transaction run once it commits."""
+        with atomic():
+            on_commit(self.func)
+            on_commit(self.func)
+            self.assertFalse(self.func.called)
+
+        self.func.assert_called_once_with()
+        self.assertNotIn('pending', transactions._local.__dict__)
+
+    def test_rollback(self):
+        """Test that functions waiting on a rolled back transaction are dropped."""
+        with self.assertRaises(ValueError):
+            with atomic():
+                on_commit(self.func)
+                raise ValueError
+
+        self.assertFalse(self.func.called)
+        self.assertNotIn('pending', transactions._local.__dict__)
+
+    def test_nested(self):
+        """Test that functions wait for the outermost block to commit."""
+        with atomic():
+            with atomic():
+                on_commit(self.func)
+            self.assertFalse(self.func.called)
+
+        self.func.assert_called_once_with()
+
+    def test_outer_transaction(self):
+        """Within the caller's own transaction, functions wait as usual."""
+        with transaction.atomic():
+            with atomic():
+                on_commit(self.func)
+        self.assertFalse(self.func.called)
+
+        run_on_commit()
+
+        self.func.assert_called_once_with()
+
+
+@mock.patch.object(transactions._local, 'warned', False, create=True)
+class AutocommitTest(TransactionTestCase):
+    """Test saving and deleting Routes outside a transaction."""
+    def setUp(self):
+        """Forget anything left waiting by earlier tests."""
+        run_on_commit()
+
+    def assertNothingWaiting(self):
+        """Assert that nothing is left waiting, or warned of."""
+        self.assertNotIn('pending', transactions._local.__dict__)
+        self.assertFalse(transactions._local.warned)
+
+    def test_save(self):
+        """Test that post-save bumps happen again once the save commits."""
+        with mock.patch.object(navigation_generation, 'bump') as bump:
+            PageFactory.create()
+
+        self.assertEqual(bump.call_count, 2)
+        self.assertNothingWaiting()
+
+    def test_update_or_create(self):
+        """Test that Routes made by update_or_create leave nothing waiting."""
+        Page.objects.update_or_create(slug='', host='', defaults={'content': 'x'})
+
+        self.assertNothingWaiting()
+
+    def test_save_redirect(self):
+        """Test that RouteRedirects leave nothing waiting either."""
+        ChildRouteRedirectFactory.create()
+
+        self.assertNothingWaiting()
+
+    def test_delete(self):
+        """Test that the generation is bumped again once a delete commits."""
+        page = PageFactory.create()
+
+        with mock.patch.object(route_generation, 'bump') as bump:
+            Page.objects.get(pk=page.pk).delete()
+
+        # Once for each of the Page's rows as they are deleted, then again.
+        self.assertEqual(bump.call_count, 3)
+        self.assertNothingWaiting()
@@ -1,6 +1,12 @@
-from django.test import TestCase
+from unittest import mock
 
-from .. import utils
+from django.db import connection
+from django.db.models import Value
+from django.test import override_settings, RequestFactory, TestCase
+
+from .factories import ChildRouteFactory
+from .. import receivers, utils
+from ..models import Route
 
 
 class TestSplitPath(TestCase):
@@ -70,3 +76,94 @@ class TestImportFromDottedPath(TestCase):
         this_test = 'conman.routes.tests.test_utils.TestImportFromDottedPath'
         result = utils.import_from_dotted_path(this_test)
         self.assertEqual(result, self.__class__)
+
+
+class TestReplaceURLPrefix(TestCase):
+    """Test replace_url_prefix."""
+    def test_replace(self):
+        """The old prefix of the field is replaced with the new one."""
+        route = ChildRouteFactory.create(slug='old')
+        new_url = utils.replace_url_prefix('url', '/old/', '/new/path/')
+
+        Route.objects.filter(pk=route.pk).update(url=new_url)
+
+        self.assertEqual(Route.objects.get(pk=route.pk).url, '/new/path/')
+
+
+class TestURLHash(TestCase):
+    """Test url_hash."""
+    def test_size(self):
+        """Test that hashes fit in a signed 64 bit integer."""
+        for url in ('/', '/url/', '/url/split/'):
+            self.assertTrue(-2 ** 63 <= utils.url_hash(url) < 2 ** 63)
+
+    def test_stable(self):
+        """The same url always has the same hash, and different urls differ."""
+        self.assertEqual(utils.url_hash('/url/'), utils.url_hash('/url/'))
+        self.assertNotEqual(utils.url_hash('/url/'), utils.url_hash('/url/split/'))
+
+
+class TestUrlHashExpression(TestCase):
+    """Test UrlHash, and can_hash_urls."""
+    def compile(self, vendor):
+        """Compile the hash of a url, as if on a database of `vendor`."""
+        query = Route.objects.all().query
+        expression = utils.UrlHash(Value('/url/')).resolve_expression(query)
+        compiler = query.get_compiler(connection=connection)
+        with mock.patch.object(connection, 'vendor', vendor):
+            return getattr(expression, 'as_' + vendor, expression.as_sql)(
+                compiler,
+                connection,
+            )
+
+    def test_same_as_python(self):
+        """The database computes the same hash as `url_hash`."""
+        route = ChildRouteFactory.create(slug='url')
+
+        hashed = Route.objects.filter(pk=route.pk).annotate(
+            hashed=utils.UrlHash('url'),
+        ).values_list('hashed', flat=True).get()
+
+        self.assertEqual(hashed, utils.url_hash('/url/'))
+
+    def test_postgresql(self):
+        """PostgreSQL hashes with its own MD5."""
+        sql, params = self.compile('postgresql')
+
+        self.assertEqual(sql, "('x' || SUBSTR(MD5(%s), 1, 16))::bit(64)::bigint")
+        self.assertEqual(params, ['/url/'])
+
+    def test_unsupported(self):
+        """Other databases can't hash urls."""
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            self.assertFalse(utils.can_hash_urls(connection))
+        with self.assertRaises(NotImplementedError):
+            self.compile('mysql')
+
+    def test_supported(self):
+        """PostgreSQL and SQLite can hash urls."""
+        for vendor in ('postgresql', 'sqlite'):
+            with mock.patch.object(connection, 'vendor', vendor):
+                self.assertTrue(utils.can_hash_urls(connection))
+
+    def test_registered_on_sqlite(self):
+        """The hash function is only registered on SQLite connections."""
+        other = mock.Mock(vendor='postgresql')
+
+        receivers.register_url_hash(sender=None, connection=other)
+
+        self.assertFalse(other.connection.create_function.called)
+
+
+class TestRequestHost(TestCase):
+    """Test request_host."""
+    def test_any_host(self):
+        """Test that Routes are found on any host by default."""
+        request = RequestFactory().get('/', HTTP_HOST='example.com')
+        self.assertIsNone(utils.request_host(request))
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_multiple_hosts(self):
+        """With CONMAN_MULTIPLE_HOSTS, the hostname is used, without its port."""
+        request = RequestFactory().get('/', HTTP_HOST='Example.com:8000')
+        self.assertEqual(utils.request_host(request), 'example.com')
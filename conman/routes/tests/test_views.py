@@ -1,10 +1,18 @@
+import asyncio
 from unittest import mock
 
+from django.core.urlresolvers import Resolver404
 from django.http import HttpResponse
-from django.test import TestCase
+from django.test import override_settings, RequestFactory, TestCase
 
+from conman.pages.tests.factories import PageFactory
 from . import factories
+from .test_coroutines import CoroutineTestCase
 from .. import views
+from ..generation import route_generation
+from ..models import Route
+from ..not_found import not_found_cache
+from ..replicas import pin_to_primary
 
 
 class RouterTest(TestCase):
@@ -34,6 +42,40 @@ class RouterTest(TestCase):
         self.assertEqual(response, handle(request, '/' + url))
 
 
+@override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=10, CONMAN_READ_DATABASE='replica')
+class RouterReplicaNotFoundTest(TestCase):
+    """Test paths not found on the replica are looked up again on the primary."""
+    def setUp(self):
+        """Forget paths remembered by other tests, and mock a Route."""
+        route_generation.bump()
+        pin_to_primary(False)
+        self.request = RequestFactory().get('/junk/')
+        self.route = mock.Mock()
+
+    def route_router(self):
+        """Route the request, with `find_route` finding the mock Route."""
+        with mock.patch.object(views, 'find_route', return_value=self.route) as find:
+            try:
+                return views.route_router(self.request, 'junk/')
+            finally:
+                self.assertEqual(find.call_count, 2)
+
+    def test_found_on_primary(self):
+        """Test that paths the primary finds are not remembered."""
+        self.route.handle.side_effect = [Resolver404(), 'response']
+
+        self.assertEqual(self.route_router(), 'response')
+        self.assertNotIn((None, '/junk/'), not_found_cache)
+
+    def test_not_found_on_primary(self):
+        """Test that paths the primary doesn't find either are remembered."""
+        self.route.handle.side_effect = Resolver404
+
+        with self.assertRaises(Resolver404):
+            self.route_router()
+        self.assertIn((None, '/junk/'), not_found_cache)
+
+
 class RouterIntegrationTest(TestCase):
     """Test that `route_router` is correctly handed urls."""
     def test_root_url(self):
@@ -57,3 +99,114 @@ class RouterIntegrationTest(TestCase):
             response = self.client.get(url)
 
         handle.assert_called_with(response.wsgi_request, url)
+
+
+class AsyncRouterTest(CoroutineTestCase):
+    """Test `route_router_async` routes requests like `route_router`."""
+    def test_complex_url(self):
+        """route_router_async finds the url's best match and delegates to it."""
+        url = 'slug/42/foo/bar/'
+        factories.RouteFactory.create()
+        request = mock.MagicMock()
+        handle_path = 'conman.routes.models.Route.handle_async'
+        with mock.patch(handle_path) as handle:
+            handle.return_value = asyncio.sleep(0, 'response')
+            response = self.run_until_complete(views.route_router_async(request, url))
+
+        handle.assert_called_with(request, '/' + url)
+        self.assertEqual(response, 'response')
+
+    def test_page(self):
+        """A Page is rendered through the whole coroutine pipeline."""
+        page = PageFactory.create(content='Content')
+        request = RequestFactory().get(page.url)
+
+        response = self.run_until_complete(views.route_router_async(request, ''))
+
+        self.assertContains(response, 'Content')
+
+    @override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=10)
+    def test_not_found(self):
+        """Unresolvable paths are remembered, and not looked up again."""
+        route_generation.bump()
+        PageFactory.create()
+        request = RequestFactory().get('/junk/')
+        with self.assertRaises(Resolver404):
+            self.run_until_complete(views.route_router_async(request, 'junk/'))
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(Resolver404):
+                self.run_until_complete(views.route_router_async(request, 'junk/'))
+
+    @override_settings(CONMAN_NOT_FOUND_CACHE_SIZE=10, CONMAN_READ_DATABASE='replica')
+    def test_not_found_on_replica(self):
+        """Test that paths not found on the replica are looked up again on the primary."""
+        route_generation.bump()
+        request = RequestFactory().get('/junk/')
+        route = mock.Mock()
+        route.handle_async.side_effect = [
+            asyncio.coroutine(mock.Mock(side_effect=Resolver404))(),
+            asyncio.sleep(0, 'response'),
+        ]
+
+        with mock.patch.object(views, 'find_route', return_value=route) as find:
+            response = self.run_until_complete(views.route_router_async(request, 'junk/'))
+
+        self.assertEqual(response, 'response')
+        self.assertEqual(find.call_count, 2)
+        self.assertNotIn((None, '/junk/'), not_found_cache)
+
+    @override_settings(CONMAN_MULTIPLE_HOSTS=True)
+    def test_host(self):
+        """With CONMAN_MULTIPLE_HOSTS, Routes are found on the request's host."""
+        PageFactory.create(host='example.com', content='Home of example.com')
+        PageFactory.create(host='example.org', content='Home of example.org')
+        request = RequestFactory().get('/', HTTP_HOST='example.org')
+
+        response = self.run_until_complete(views.route_router_async(request, ''))
+
+        self.assertContains(response, 'Home of example.org')
+
+    @override_settings(CONMAN_ROUTE_INDEX=True)
+    def test_index(self):
+        """With CONMAN_ROUTE_INDEX, Routes are looked up in the index."""
+        route_generation.bump()
+        page = PageFactory.create(content='Content')
+        request = RequestFactory().get(page.url)
+        record_path = 'conman.routes.models.RouteManager.best_record_for_path'
+
+        with mock.patch(record_path, wraps=Route.objects.best_record_for_path) as find:
+            response = self.run_until_complete(views.route_router_async(request, ''))
+
+        find.assert_called_once_with('/', None)
+        self.assertContains(response, 'Content')
+
+
+@override_settings(CONMAN_MULTIPLE_HOSTS=True)
+class MultipleHostsRouterTest(TestCase):
+    """Test requests are routed to the tree of Routes on their host."""
+    def setUp(self):
+        """Create a tree of Pages on each of two hosts."""
+        route_generation.bump()
+        for host in ('example.com', 'example.org'):
+            root = PageFactory.create(host=host, content='Home of ' + host)
+            PageFactory.create(parent=root, slug='about', content='About ' + host)
+
+    def test_host(self):
+        """The Page at the path on the request's host is rendered."""
+        response = self.client.get('/about/', HTTP_HOST='example.org')
+
+        self.assertContains(response, 'About example.org')
+
+    def test_port(self):
+        """The request's port is ignored."""
+        response = self.client.get('/', HTTP_HOST='example.com:8000')
+
+        self.assertContains(response, 'Home of example.com')
+
+    @override_settings(CONMAN_ROUTE_INDEX=True)
+    def test_index(self):
+        """The index finds the Page on the request's host too."""
+        response = self.client.get('/about/', HTTP_HOST='example.com')
+
+        self.assertContains(response, 'About example.com')
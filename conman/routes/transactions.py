@@ -0,0 +1,104 @@
+"""
+Run functions once the current transaction has committed.
+
+Django 1.8 has no `transaction.on_commit`. Instead, functions passed to
+`on_commit` within a transaction wait until the end of the request (see
+`finish_request`), by when the transactions of `ATOMIC_REQUESTS` and
+the admin have committed. Outside a transaction, they are run straight away.
+
+Conman opens its own transactions with `atomic`. When the caller wasn't
+already in one, its transaction commits as the block exits, so functions
+passed to `on_commit` within it are called then.
+
+Outside a request (in a shell or a management command, say) nothing can tell
+when the transaction commits, so call `run_on_commit()` once it has. A warning
+is logged the first time a thread leaves functions waiting like this.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+logger = logging.getLogger('conman.routes.transactions')
+
+_local = threading.local()
+
+
+def on_commit(func, using=None):
+    """
+    Call `func` once the transaction on the `using` database has committed.
+
+    A function already waiting on this thread is not added again.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        func()
+        return
+
+    block = _local.__dict__.get('blocks', {}).get(connection.alias)
+    if block is not None:
+        # The transaction is one of conman's own. See `atomic`.
+        if func not in block:
+            block.append(func)
+        return
+
+    pending = _local.__dict__.setdefault('pending', [])
+    if func in pending:
+        return
+    if not getattr(_local, 'in_request', False) and not getattr(_local, 'warned', False):
+        # Once is enough: a thread that leaves functions waiting once, such
+        # as a shell's, will usually go on doing so.
+        _local.warned = True
+        logger.warning(
+            'Waiting to call %r until the transaction commits. Outside a '
+            'request, call conman.routes.transactions.run_on_commit() once it '
+            'has.',
+            func,
+        )
+    pending.append(func)
+
+
+@contextmanager
+def atomic(using=None):
+    """
+    Run the block in a transaction on the `using` database.
+
+    Unless the caller is already in a transaction, the functions passed to
+    `on_commit` within the block are called once it has committed, rather
+    than left waiting for the end of a request. If the block raises, the
+    transaction is rolled back, and they are dropped.
+    """
+    connection = transaction.get_connection(using)
+    blocks = _local.__dict__.setdefault('blocks', {})
+    if connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    block = blocks[connection.alias] = []
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        del blocks[connection.alias]
+    for func in block:
+        func()
+
+
+def start_request():
+    """Note that this thread is handling a request, which will run `on_commit`."""
+    _local.in_request = True
+
+
+def finish_request():
+    """Call the functions left waiting by the request, now it has finished."""
+    _local.in_request = False
+    run_on_commit()
+
+
+def run_on_commit():
+    """Call the functions waiting on this thread, in the order they were added."""
+    for func in _local.__dict__.pop('pending', []):
+        func()
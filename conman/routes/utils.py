@@ -1,6 +1,13 @@
+import hashlib
 import importlib
 import os
 
+from django.db.models import BigIntegerField, Func, TextField, Value
+from django.db.models.functions import Concat, Substr
+from django.http.request import split_domain_port
+
+from .conf import get_setting
+
 
 def split_path(path):
     """
@@ -20,6 +27,69 @@ def split_path(path):
     return paths
 
 
+def request_host(request):
+    """
+    Get the host to find Routes for `request` on, or None for any host.
+
+    With `CONMAN_MULTIPLE_HOSTS`, this is the request's hostname, without its
+    port. Otherwise, Routes are found whatever their host.
+    """
+    if not get_setting('MULTIPLE_HOSTS'):
+        return None
+    domain, port = split_domain_port(request.get_host())
+    return domain
+
+
+def url_hash(url):
+    """
+    Hash a url to a signed 64 bit integer, small enough for a `BigIntegerField`.
+
+    Different urls can (very rarely) have the same hash, so anything looked up
+    by hash should have its url checked too.
+    """
+    digest = hashlib.md5(url.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+def can_hash_urls(connection):
+    """
+    Check if the database of `connection` can compute `url_hash` itself.
+
+    PostgreSQL can, with its own MD5. SQLite can call `url_hash` from Python,
+    once it is registered on the connection. See `receivers.register_url_hash`.
+    """
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+class UrlHash(Func):
+    """
+    Compute the `url_hash` of a text expression in the database.
+
+    Only supported where `can_hash_urls` allows.
+    """
+    function = 'conman_url_hash'
+    template = '%(function)s(%(expressions)s)'
+    # The first 8 bytes of the MD5, as a signed big-endian integer.
+    postgresql_template = "('x' || SUBSTR(MD5(%(expressions)s), 1, 16))::bit(64)::bigint"
+
+    def __init__(self, expression):
+        """Hash `expression`, to an integer like `url_hash` gives."""
+        super().__init__(expression, output_field=BigIntegerField())
+
+    def as_sql(self, compiler, connection):
+        """Refuse to compute the hash where the database can't."""
+        message = 'Url hashes cannot be computed on {}.'.format(connection.vendor)
+        raise NotImplementedError(message)
+
+    def as_sqlite(self, compiler, connection):
+        """Call `url_hash`, as registered by `receivers.register_url_hash`."""
+        return super().as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        """Hash with PostgreSQL's MD5."""
+        return super().as_sql(compiler, connection, template=self.postgresql_template)
+
+
 def import_from_dotted_path(path):
     """
     Import an object (class/module/etc) from a python path string.
@@ -34,3 +104,17 @@ def import_from_dotted_path(path):
 
     module = importlib.import_module(module_path)
     return getattr(module, attr)
+
+
+def replace_url_prefix(field, old_url, new_url):
+    """
+    Build an expression that replaces `old_url` with `new_url` in `field`.
+
+    Only correct for values of `field` that start with `old_url`, so use it to
+    update a QuerySet filtered to those.
+    """
+    return Concat(
+        Value(new_url),
+        Substr(field, len(old_url) + 1),
+        output_field=TextField(),
+    )
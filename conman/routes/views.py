@@ -1,10 +1,98 @@
+import asyncio
+
+from django.core.urlresolvers import Resolver404
+
+from .conf import get_setting
+from .coroutines import run_sync
 from .models import Route
+from .not_found import not_found_cache
+from .replicas import get_read_database, reading_from_replica
+from .utils import request_host
+
+
+def find_route(url, host):
+    """
+    Find the best Route for `url` on `host`.
+
+    With `CONMAN_ROUTE_INDEX`, a RouteRecord is found in the index instead, so
+    the Route is only created if its handler needs it.
+    """
+    if get_setting('ROUTE_INDEX'):
+        return Route.objects.best_record_for_path(url, host)
+    return Route.objects.best_match_for_path(url, host)
 
 
 def route_router(request, url):
-    """Catch-all view that delegates view handling to the best Route match."""
+    """
+    Catch-all view that delegates view handling to the best Route match.
+
+    Paths that no Route's handler could resolve are remembered, and answered
+    with a 404 straight away next time. See `NotFoundCache`.
+
+    With `CONMAN_MULTIPLE_HOSTS`, only Routes on the request's host are
+    matched, and paths are remembered for each host. See `request_host`.
+
+    Reads go to the `CONMAN_READ_DATABASE` replica, if set. See `replicas`.
+    As the replica may be behind the primary, paths not found there are only
+    remembered once they aren't found on the primary either.
+    """
     # Django strips the leading / when resolving urls, so we'll just go ahead
     # and add it again. This allows us to use it for resolving later.
     url = '/' + url
-    route = Route.objects.best_match_for_path(url)
-    return route.handle(request, url)
+    host = request_host(request)
+    if (host, url) in not_found_cache:
+        raise Resolver404({'path': url})
+    with reading_from_replica():
+        if get_read_database() is None:
+            return route_request(request, url, host)
+        try:
+            return find_route(url, host).handle(request, url)
+        except Resolver404:
+            pass
+    return route_request(request, url, host)
+
+
+def route_request(request, url, host):
+    """Have the best Route handle the request, remembering the path if not found."""
+    route = find_route(url, host)
+    try:
+        return route.handle(request, url)
+    except Resolver404:
+        not_found_cache.add((host, url))
+        raise
+
+
+@asyncio.coroutine
+def route_router_async(request, url):
+    """
+    Coroutine version of `route_router`, for servers that run an event loop.
+
+    The Route is looked up, and sync views called, in a thread pool, so the
+    event loop is free to serve other requests while they block. Like
+    `route_router`, it looks up Routes in the index with `CONMAN_ROUTE_INDEX`,
+    and reads them from the replica. (The handler, in its own thread, doesn't.)
+    Paths not found are looked up again on the primary before they are
+    remembered, as `route_router` does.
+    """
+    url = '/' + url
+    host = request_host(request)
+    if (host, url) in not_found_cache:
+        raise Resolver404({'path': url})
+    if get_setting('READ_DATABASE'):
+        route = yield from run_sync(reading_from_replica()(find_route), url, host)
+        try:
+            return (yield from route.handle_async(request, url))
+        except Resolver404:
+            pass
+    return (yield from route_request_async(request, url, host))
+
+
+@asyncio.coroutine
+def route_request_async(request, url, host):
+    """Coroutine version of `route_request`."""
+    route = yield from run_sync(find_route, url, host)
+    try:
+        return (yield from route.handle_async(request, url))
+    except Resolver404:
+        not_found_cache.add((host, url))
+        raise